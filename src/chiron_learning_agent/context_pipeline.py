@@ -0,0 +1,187 @@
+"""
+Streaming ingestion of large contexts (books, course notes) into the context storage.
+
+The context is chunked one window at a time, and the chunks are embedded in batches on a
+small thread pool while the next window is being chunked. The vectors are appended to the
+context's vector store as soon as they arrive, so the memory used stays bounded by the
+window size and the batches in flight, whatever the size of the context.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from chiron_learning_agent.context_storage import ContextStorage
+from chiron_learning_agent.near_duplicates import NearDuplicateFilter
+
+
+# Characters of context chunked at a time
+CHUNK_WINDOW_CHARS = int(os.getenv("CHIRON_CHUNK_WINDOW_CHARS", "20000"))
+# Embedding requests in flight at the same time
+EMBED_CONCURRENCY = int(os.getenv("CHIRON_EMBED_CONCURRENCY", "4"))
+# Bounds of the number of chunks per embedding request
+EMBED_MIN_BATCH = int(os.getenv("CHIRON_EMBED_MIN_BATCH", "8"))
+EMBED_MAX_BATCH = int(os.getenv("CHIRON_EMBED_MAX_BATCH", "100"))
+# Batches embedded faster than this grow, slower ones shrink
+EMBED_TARGET_SECONDS = float(os.getenv("CHIRON_EMBED_TARGET_SECONDS", "2"))
+
+
+def iter_windows(text: str, window_chars: int = CHUNK_WINDOW_CHARS) -> Iterator[str]:
+    """Yield consecutive windows of about `window_chars` characters, cut at a paragraph or
+    sentence boundary when there is one in the second half of the window."""
+    start = 0
+    while start < len(text):
+        end = min(start + window_chars, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for boundary in ("\n\n", ". ", "\n", " "):
+                cut = window.rfind(boundary)
+                if cut > window_chars // 2:
+                    end = start + cut + len(boundary)
+                    break
+        yield text[start:end]
+        start = end
+
+
+def iter_chunks(text: str, chunker: Callable, window_chars: int = CHUNK_WINDOW_CHARS) -> Iterator[str]:
+    """Chunk a context one window at a time.
+
+    The last chunk of a window was cut by the window boundary rather than by the chunker,
+    so it is chunked again at the start of the next window.
+    """
+    carry, separator = "", ""
+    for window in iter_windows(text, window_chars):
+        chunks = [chunk.content for chunk in chunker([carry + separator + window if carry else window])[0]]
+        carry = chunks.pop() if chunks else ""
+        # Chunk contents are stripped: put back the whitespace the window was cut after
+        # (e.g. a paragraph break), or nothing if it was cut within a word
+        separator = window[len(window.rstrip()):]
+        yield from chunks
+    if carry:
+        yield carry
+
+
+class AdaptiveBatchSize:
+    """Size of the embedding batches, grown while requests are fast and shrunk when they are
+    slow or fail.
+
+    Args:
+        minimum: The smallest batch size.
+        maximum: The largest batch size.
+        target_seconds: The request latency aimed for.
+    """
+
+    def __init__(
+        self,
+        minimum: int = EMBED_MIN_BATCH,
+        maximum: int = EMBED_MAX_BATCH,
+        target_seconds: float = EMBED_TARGET_SECONDS,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.size = minimum
+
+    def success(self, seconds: float):
+        if seconds < self.target_seconds / 2:
+            self.size = min(self.size * 2, self.maximum)
+        elif seconds > self.target_seconds:
+            self.size = max(self.size // 2, self.minimum)
+
+    def failure(self):
+        self.size = max(self.size // 2, self.minimum)
+
+
+def _embed_batch(embeddings: Embeddings, batch: List[str], batch_size: AdaptiveBatchSize) -> List[List[float]]:
+    """Embed a batch, splitting it in halves when the request fails (e.g. too large a payload)."""
+    started = time.monotonic()
+    try:
+        vectors = embeddings.embed_documents(batch)
+    except Exception:
+        batch_size.failure()
+        if len(batch) <= 1:
+            raise
+        middle = len(batch) // 2
+        return _embed_batch(embeddings, batch[:middle], batch_size) + _embed_batch(embeddings, batch[middle:], batch_size)
+    batch_size.success(time.monotonic() - started)
+    return vectors
+
+
+def embed_into_storage(
+    chunks: Iterable[str],
+    embeddings: Embeddings,
+    storage: ContextStorage,
+    key: str,
+    concurrency: int = EMBED_CONCURRENCY,
+    batch_size: Optional[AdaptiveBatchSize] = None,
+) -> int:
+    """Embed chunks as they are produced and append them to the context of `key`.
+
+    At most `concurrency` batches are embedded at a time; the chunks iterator is paused
+    until one of them is stored.
+
+    Returns:
+        int: The number of chunks stored.
+    """
+    batch_size = batch_size or AdaptiveBatchSize()
+    in_flight = deque()
+    stored = 0
+
+    def store_oldest():
+        nonlocal stored
+        batch, future = in_flight.popleft()
+        storage.add_to_context(batch, future.result(), key=key)
+        stored += len(batch)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="chiron-embed") as executor:
+        try:
+            batch = []
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) < batch_size.size:
+                    continue
+                if len(in_flight) >= concurrency:
+                    store_oldest()
+                in_flight.append((batch, executor.submit(_embed_batch, embeddings, batch, batch_size)))
+                batch = []
+            if batch:
+                in_flight.append((batch, executor.submit(_embed_batch, embeddings, batch, batch_size)))
+            while in_flight:
+                store_oldest()
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+    return stored
+
+
+def ingest_context(
+    text: str,
+    chunker: Callable,
+    embeddings: Embeddings,
+    storage: ContextStorage,
+    key: str,
+    window_chars: int = CHUNK_WINDOW_CHARS,
+    near_duplicates: Optional[NearDuplicateFilter] = None,
+) -> int:
+    """Chunk, embed and store a context of any size, replacing the context of `key`.
+
+    Args:
+        near_duplicates: A filter dropping the chunks nearly identical to one seen before,
+            before they are embedded.
+
+    Returns:
+        int: The number of chunks stored.
+    """
+    storage.delete_context(key)
+    chunks = iter_chunks(text, chunker, window_chars)
+    if near_duplicates is not None:
+        chunks = near_duplicates.filter(chunks)
+    stored = embed_into_storage(chunks, embeddings, storage, key)
+    if stored == 0:
+        # Keep an empty context so the key can be searched
+        storage.save_context([], [], key=key)
+    return stored
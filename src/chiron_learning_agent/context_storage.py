@@ -1,28 +1,187 @@
-from langgraph.checkpoint.memory import InMemorySaver
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from chiron_learning_agent.vector_store import VectorStore
+
+
+# Memory kept for the contexts of the learning sessions before the least recently used are spilled to disk
+CONTEXT_MAX_BYTES = int(os.getenv("CHIRON_CONTEXT_MAX_BYTES", str(512 * 1024 * 1024)))
+# Seconds a context stays in memory without being used
+CONTEXT_TTL = float(os.getenv("CHIRON_CONTEXT_TTL", str(60 * 60)))
+# Seconds a spilled context stays on disk without being used
+CONTEXT_DISK_TTL = float(os.getenv("CHIRON_CONTEXT_DISK_TTL", str(24 * 60 * 60)))
+# Each store spills into a directory of its own in there, named after its process
+CONTEXT_SPILL_DIR = os.getenv("CHIRON_CONTEXT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "chiron_context"))
+
+
+def _process_alive(pid: int) -> Optional[bool]:
+    """Whether a process is running, or None where it cannot be checked without side effects."""
+    if os.name != "posix":
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
 class ContextStorage:
-    """Store for managing context chunks and their embeddings in memory
+    """Store for managing context chunks and their embeddings
+
+    Each context key holds a VectorStore, searchable by cosine similarity. The contexts are
+    kept in memory within a budget: the least recently used ones, and those unused for
+    `ttl_seconds`, are written to disk and transparently read back (memory-mapped) when
+    used again. Spilled contexts unused for `disk_ttl_seconds` are deleted, and so are the
+    spills left in `spill_dir` by the processes that are no longer running.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_bytes: int = CONTEXT_MAX_BYTES,
+        ttl_seconds: float = CONTEXT_TTL,
+        disk_ttl_seconds: float = CONTEXT_DISK_TTL,
+        spill_dir: str = CONTEXT_SPILL_DIR,
+    ):
         """Initialize ContextStore with an empty in-memory store"""
-        self.store = InMemorySaver()
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self.spill_root = Path(spill_dir)
+        self.spill_dir = self.spill_root / f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # key -> (vector store, last used), least recently used first
+        self.store: "OrderedDict[str, tuple]" = OrderedDict()
+        # key -> last used, for the contexts spilled to disk
+        self.spilled: dict = {}
+        # Keys whose spill files exist, including the resident contexts memory-mapped from them
+        self.on_disk: set = set()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.expirations = 0
+        self.reloads = 0
+        self._remove_stale_spills()
+
+    def _remove_stale_spills(self):
+        """Delete the spill directories of the stores of earlier processes, never read again."""
+        if not self.spill_root.is_dir():
+            return
+        for path in self.spill_root.iterdir():
+            pid = path.name.split("-", 1)[0]
+            # Written before the spills were kept per process
+            alive = _process_alive(int(pid)) if pid.isdigit() else False
+            if alive is None:
+                alive = time.time() - path.stat().st_mtime <= self.disk_ttl_seconds
+            if not alive:
+                shutil.rmtree(path, ignore_errors=True)
         
+    def _spill_path(self, key: str) -> Path:
+        return self.spill_dir / hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _spill(self, key: str):
+        """Move a context from memory to disk. Call with the lock held."""
+        vector_store, last_used = self.store.pop(key)
+        # Memory-mapped stores were not modified since they were read from disk
+        if not (vector_store.memory_mapped and key in self.on_disk):
+            path = self._spill_path(key)
+            # Unlink the previous spill rather than overwrite it, it may still be memory-mapped
+            shutil.rmtree(path, ignore_errors=True)
+            vector_store.save(path)
+            self.on_disk.add(key)
+        self.spilled[key] = last_used
+
+    def _enforce_limits(self):
+        """Spill the idle contexts and those over the memory budget, delete the expired spills. Call with the lock held."""
+        now = time.monotonic()
+        for key in [k for k, (_, last_used) in self.store.items() if now - last_used > self.ttl_seconds]:
+            self._spill(key)
+            self.expirations += 1
+        while len(self.store) > 1 and self.resident_bytes() > self.max_bytes:
+            self._spill(next(iter(self.store)))
+            self.evictions += 1
+        for key in [k for k, last_used in self.spilled.items() if now - last_used > self.disk_ttl_seconds]:
+            self.delete_context(key)
+
+    def resident_bytes(self) -> int:
+        """Memory used by the contexts held in memory"""
+        with self._lock:
+            return sum(vector_store.resident_nbytes for vector_store, _ in self.store.values())
+
     def save_context(self, context_chunks: list, embeddings: list, key: str = None):
-        """Save context chunks and their embeddings to the store"""
-        namespace = ("context")
+        """Save context chunks and their embeddings to the store, replacing those of the key"""
         if key is None:
             key = str(uuid.uuid4())    
         
-        value = {
-            "chunks": context_chunks,
-            "embeddings": embeddings,
-        }    
-        self.store.put(namespace, key, value)
+        vector_store = VectorStore()
+        vector_store.add(context_chunks, embeddings)
+        with self._lock:
+            self.delete_context(key)
+            self.store[key] = (vector_store, time.monotonic())
+            self._enforce_limits()
         return key
-    
-    def get_context(self, context_key: str):
-        """Retrieve context data from the store using a key"""
-        namespace = ("context")
-        memory = self.store.get(namespace, context_key)
-        return memory.value
\ No newline at end of file
+
+    def add_to_context(self, context_chunks: list, embeddings: list, key: str) -> range:
+        """Append context chunks and their embeddings to the context of a key, creating it if needed
+
+        Returns:
+            range: The indices of the added chunks in the context's vector store.
+        """
+        with self._lock:
+            if key in self.store or key in self.spilled:
+                vector_store = self.get_context(key)
+            else:
+                vector_store = VectorStore()
+                self.store[key] = (vector_store, time.monotonic())
+            added = vector_store.add(context_chunks, embeddings)
+            self._enforce_limits()
+            return added
+
+    def get_context(self, context_key: str) -> VectorStore:
+        """Retrieve the vector store of a context key, reading it back from disk if it was spilled
+
+        Raises:
+            KeyError: If the context key is unknown or its spill expired.
+        """
+        with self._lock:
+            if context_key in self.store:
+                vector_store, _ = self.store.pop(context_key)
+            elif context_key in self.spilled:
+                vector_store = VectorStore.load(self._spill_path(context_key), mmap=True)
+                del self.spilled[context_key]
+                self.reloads += 1
+            else:
+                raise KeyError(f"Unknown context key: {context_key}")
+            self.store[context_key] = (vector_store, time.monotonic())
+            self._enforce_limits()
+            return vector_store
+
+    def delete_context(self, context_key: str):
+        """Remove a context from memory and disk"""
+        with self._lock:
+            # Drop the memory-mapped store, if any, before its files
+            self.store.pop(context_key, None)
+            self.spilled.pop(context_key, None)
+            if context_key in self.on_disk:
+                self.on_disk.discard(context_key)
+                shutil.rmtree(self._spill_path(context_key), ignore_errors=True)
+
+    def stats(self) -> dict:
+        """Resident size and eviction counters of the store"""
+        with self._lock:
+            return {
+                "resident_contexts": len(self.store),
+                "resident_bytes": self.resident_bytes(),
+                "max_bytes": self.max_bytes,
+                "spilled_contexts": len(self.spilled),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "reloads": self.reloads,
+            }
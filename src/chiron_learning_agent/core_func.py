@@ -1,7 +1,8 @@
 import os
+import uuid
 import warnings
 import logging
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Suppress ALTS and gRPC warnings from Google libraries
@@ -29,25 +30,59 @@ from chiron_learning_agent.prompts import (
     checkpoint_based_query_generator,
     learning_checkpoints_generator,
     question_generator,
-    validate_context,
 )
-from chiron_learning_agent.context_storage import ContextStorage
+from chiron_learning_agent.context_storage import ContextStorage, CONTEXT_DISK_TTL
+from chiron_learning_agent.near_duplicates import NearDuplicateFilter
+from chiron_learning_agent.context_pipeline import ingest_context
+from chiron_learning_agent.embedding_cache import CachedEmbeddings
+from chiron_learning_agent.web_search import dedupe_search_docs, search_all
+from chiron_learning_agent.validation import find_uncovered_checkpoints
+from utils.cache import TTLCache
 
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from semantic_chunkers import StatisticalChunker
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.utils.math import cosine_similarity
 
 os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 os.environ["TAVILY_API_KEY"] = os.getenv("TAVILY_API_KEY")
 
 llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
-embeddings_model = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+# Texts already embedded, by any process, are read from the persistent cache
+embeddings_model = CachedEmbeddings(GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001"))
 context_storage = ContextStorage()
 
 tavily_search = TavilySearchResults()
 
+# Near-duplicate filters of the contexts, remembering their chunks as long as the contexts are kept
+near_duplicate_filters = TTLCache(max_entries=256, ttl_seconds=CONTEXT_DISK_TTL)
+
+
+def get_near_duplicate_filter(context_key: str, reset: bool = False) -> NearDuplicateFilter:
+    """Return the near-duplicate filter of a context, a new one if it has none or `reset` is set"""
+    near_duplicates = None if reset else near_duplicate_filters.get(context_key)
+    if near_duplicates is None:
+        near_duplicates = NearDuplicateFilter()
+    # Setting it again keeps it alive while the context is used
+    near_duplicate_filters.set(context_key, near_duplicates)
+    return near_duplicates
+
+
+def report_near_duplicates(near_duplicates: NearDuplicateFilter, context_key: str, since: Optional[dict] = None):
+    """Print the embeddings and storage saved by dropping near-duplicate chunks
+
+    Args:
+        since: The filter's stats before the current step, to report the chunks of that step
+            only. The totals of the context are printed after them.
+    """
+    dim = context_storage.get_context(context_key).dim
+    stats, total = near_duplicates.stats(dim=dim, since=since), near_duplicates.stats()
+    print(
+        f"Near-duplicates: {stats['duplicates']} of {stats['chunks_seen']} chunks dropped, "
+        f"saving {stats['embeddings_saved']} embeddings and {stats.get('bytes_saved', stats['chars_saved'])} bytes "
+        f"({total['duplicates']} of {total['chunks_seen']} for the whole context)"
+    )
+
 
 # Step 1: Generate checkpoints
 def generate_checkpoints(state: LearningState):
@@ -109,14 +144,14 @@ def chunk_context(state: LearningState):
     encoder = embeddings_model
     chunker = StatisticalChunker(encoder, min_split_tokens=128, max_split_tokens=512)
 
-    chunks = chunker([state["context"]])
-    content = []
-    for chunk in chunks:
-        content.append(chunk.content)
-    embeddings = encoder.embed_documents(content)
-    context_key = context_storage.save_context(
-        chunks, embeddings, key=state.get("context_key")
+    # Chunked and embedded window by window, so large contexts fit in memory
+    context_key = state.get("context_key") or str(uuid.uuid4())
+    near_duplicates = get_near_duplicate_filter(context_key, reset=True)
+    chunk_count = ingest_context(
+        state["context"], chunker, encoder, context_storage, key=context_key, near_duplicates=near_duplicates
     )
+    print(f"Context: {len(state['context'])} characters stored as {chunk_count} chunks")
+    report_near_duplicates(near_duplicates, context_key)
     return {"context_key": context_key}
 
 
@@ -124,21 +159,27 @@ def chunk_context(state: LearningState):
 def search_web(state: LearningState):
     """Retrieves and processes web search results"""
     search_queries = state["search_queries"].search_queries
-    all_search_docs = []
-    for query in search_queries:
-        search_docs = tavily_search.invoke(query)
-        all_search_docs.extend(search_docs)
-
+    # The queries are independent, run them concurrently
+    all_search_docs = search_all(tavily_search, search_queries)
+    unique_search_docs = dedupe_search_docs(all_search_docs)
+    print(f"Web search: {len(all_search_docs)} results, {len(unique_search_docs)} after removing duplicates")
+
+    # The filter remembers the chunks of the previous searches, so pages repeating them are
+    # neither embedded nor added to the accumulated context chunks again
+    context_key = state.get("context_key") or str(uuid.uuid4())
+    near_duplicates = get_near_duplicate_filter(context_key)
+    before = near_duplicates.stats()
     formatted_search_docs = []
-    for doc in all_search_docs:
+    for doc in unique_search_docs:
+        if near_duplicates.is_duplicate(doc.get("content", "")):
+            continue
         formatted_search_docs.append(
-            f"Context: {doc.get('context', 'N/A')}\n Source: {doc.get('url', 'N/A')}\n"
+            f"Context: {doc.get('content', 'N/A')}\n Source: {doc.get('url', 'N/A')}\n"
         )
     chunk_embeddings = embeddings_model.embed_documents(formatted_search_docs)
-    context_key = context_storage.save_context(
-        formatted_search_docs, chunk_embeddings, key=state.get("context_key")
-    )
-    return {"context_chunks": formatted_search_docs}
+    context_storage.add_to_context(formatted_search_docs, chunk_embeddings, key=context_key)
+    report_near_duplicates(near_duplicates, context_key, since=before)
+    return {"context_chunks": formatted_search_docs, "context_key": context_key}
 
 
 # Step 4: Generate questions
@@ -166,38 +207,19 @@ def generate_questions(state: LearningState):
 # Step 2.2.2: Verify checkpoint
 def context_validation(state: LearningState):
     """Validate context coverage against checkpoint criteria using stored embeddings"""
-    context = context_storage.get_context(state["context_key"])
-    chunks = context["chunks"]
-    chunk_embeddings = context["embeddings"]
+    vector_store = context_storage.get_context(state["context_key"])
 
-    checks = []
+    checkpoints = state["checkpoints"].checkpoints
     structured_llm = llm.with_structured_output(InContext)
 
-    for checkpoint in state["checkpoints"].checkpoints:
-        query = embeddings_model.embed_query(checkpoint.verification)
-        similarity = cosine_similarity([query], chunk_embeddings)[0]
-        top_3_indices = sorted(
-            range(len(similarity)), key=lambda i: similarity[i], reverse=True
-        )[:3]
-        relevant_chunks = [chunks[i] for i in top_3_indices]
-
-        messages = [
-            SystemMessage(content=validate_context),
-            HumanMessage(
-                context=f"""
-                Criteria:
-                {chr(10).join(f"- {c}" for c in checkpoint.criteria)}
-                
-                Context:
-                {chr(10).join(relevant_chunks)}
-                """
-            ),
-        ]
-        
-        response = structured_llm.invoke(messages)
-        if response.is_in_context.lower() == "no":
-            checks.append(checkpoint)
-            
+    # One embedding request for all the checkpoints, searched together
+    query_embeddings = embeddings_model.embed_documents(
+        [checkpoint.verification for checkpoint in checkpoints], task_type="RETRIEVAL_QUERY"
+    )
+    relevant_chunks = vector_store.search_chunks(query_embeddings, k=3)
+
+    # The validations are independent, run them concurrently
+    checks = find_uncovered_checkpoints(structured_llm, checkpoints, relevant_chunks)
         
     if checks:
         structured_llm = llm.with_structured_output(SearchQuery)
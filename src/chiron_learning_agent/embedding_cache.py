@@ -0,0 +1,161 @@
+"""
+Persistent cache of text embeddings, shared by all processes on the machine.
+
+Vectors are keyed by (model, task type and other arguments of the call, sha256 of the text) and stored as compact
+float16/float32 blobs in SQLite, so the same context or web page is only embedded once,
+whichever learner or process asked first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+EMBEDDING_CACHE_DB = os.getenv("CHIRON_EMBEDDING_CACHE_DB", "chiron_embeddings.db")
+# float16 halves the storage for a negligible change of the cosine similarities
+EMBEDDING_CACHE_DTYPE = os.getenv("CHIRON_EMBEDDING_CACHE_DTYPE", "float16")
+# Texts sent to the embedding API per request on cache misses
+EMBEDDING_BATCH_SIZE = int(os.getenv("CHIRON_EMBEDDING_BATCH_SIZE", "100"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    -- See cache_variant
+    task_type TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY (model, task_type, text_hash)
+);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_variant(kwargs: Dict[str, Any], default_task_type: str) -> str:
+    """The part of the cache key standing for the keyword arguments of an embedding call:
+    the task type, followed by a hash of the other arguments if there are any."""
+    task_type = kwargs.get("task_type") or default_task_type
+    others = {name: value for name, value in kwargs.items() if name != "task_type"}
+    if not others:
+        return task_type
+    return f"{task_type}:{text_hash(json.dumps(others, sort_keys=True, default=repr))[:16]}"
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings model answering from a persistent cache, embedding only the cache misses.
+
+    Args:
+        embeddings: The embeddings model called on cache misses.
+        path: The SQLite database shared by the processes.
+        dtype: "float16" or "float32", the precision of the stored vectors.
+        batch_size: Texts per embedding request on cache misses.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: str = EMBEDDING_CACHE_DB,
+        dtype: str = EMBEDDING_CACHE_DTYPE,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.path = str(path)
+        self.dtype = np.dtype(dtype)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _lookup(self, variant: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._connect() as conn:
+            # Stay below SQLite's limit on the number of query parameters
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND task_type = ? "
+                    f"AND text_hash IN ({', '.join('?' * len(batch))})",
+                    (self.model, variant, *batch),
+                ).fetchall()
+                for hash_, blob in rows:
+                    found[hash_] = np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+        return found
+
+    def _store(self, variant: str, vectors: Dict[str, List[float]]):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model, variant, hash_, np.asarray(vector, dtype=self.dtype).tobytes())
+                    for hash_, vector in vectors.items()
+                ],
+            )
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """Embed texts, calling the model only for those not in the cache, in batches.
+
+        Keyword arguments (e.g. `task_type`, `output_dimensionality`) are passed to the model
+        with every batch and are all part of the cache key.
+        """
+        variant = cache_variant(kwargs, "default")
+        hashes = [text_hash(text) for text in texts]
+        cached = self._lookup(variant, list(set(hashes)))
+
+        # Each missing text is embedded once, even if it appears several times
+        missing = {}
+        for hash_, text in zip(hashes, texts):
+            if hash_ not in cached:
+                missing.setdefault(hash_, text)
+        missing_hashes = list(missing)
+        for start in range(0, len(missing_hashes), self.batch_size):
+            batch = missing_hashes[start:start + self.batch_size]
+            vectors = self.embeddings.embed_documents([missing[h] for h in batch], **kwargs)
+            new_vectors = dict(zip(batch, vectors))
+            self._store(variant, new_vectors)
+            cached.update({h: np.asarray(v, dtype=np.float32) for h, v in new_vectors.items()})
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return [cached[hash_].tolist() for hash_ in hashes]
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        """Embed a query through the cache. Keyword arguments are part of the cache key, as in `embed_documents`."""
+        variant = cache_variant(kwargs, "query")
+        hash_ = text_hash(text)
+        cached = self._lookup(variant, [hash_])
+        if hash_ in cached:
+            with self._lock:
+                self.hits += 1
+            return cached[hash_].tolist()
+        vector = self.embeddings.embed_query(text, **kwargs)
+        self._store(variant, {hash_: vector})
+        with self._lock:
+            self.misses += 1
+        return list(vector)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"model": self.model, "hits": self.hits, "misses": self.misses}
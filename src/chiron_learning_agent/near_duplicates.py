@@ -0,0 +1,128 @@
+"""
+Near-duplicate detection for the chunks ingested into a learning context.
+
+Each chunk is summarized by a MinHash signature of its word shingles, whose agreement
+estimates the Jaccard similarity of two chunks. Signatures are indexed by bands
+(locality-sensitive hashing), so a new chunk is only compared with the few chunks sharing
+a band with it rather than with every chunk seen.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+# Estimated Jaccard similarity of the word shingles above which a chunk is a duplicate
+DEDUP_THRESHOLD = float(os.getenv("CHIRON_DEDUP_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = int(os.getenv("CHIRON_DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_WORDS = int(os.getenv("CHIRON_DEDUP_SHINGLE_WORDS", "5"))
+
+_PRIME = (1 << 31) - 1
+
+
+def _lsh_bands(num_perm: int, threshold: float) -> int:
+    """Number of bands whose detection threshold (1/b)^(1/r) is closest below `threshold`."""
+    candidates = [b for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [b for b in candidates if (1 / b) ** (b / num_perm) <= threshold]
+    if not below:
+        return num_perm
+    return min(below, key=lambda b: threshold - (1 / b) ** (b / num_perm))
+
+
+class NearDuplicateFilter:
+    """Drops the chunks nearly identical to a chunk seen before.
+
+    Args:
+        threshold: Estimated Jaccard similarity of the shingles from which a chunk is dropped.
+        num_perm: The number of hash permutations of the MinHash signatures.
+        shingle_words: The number of words per shingle.
+        seed: The seed of the hash permutations.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        shingle_words: int = DEDUP_SHINGLE_WORDS,
+        seed: int = 1,
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.bands = _lsh_bands(num_perm, threshold)
+        self.rows = num_perm // self.bands
+        self._buckets: List[dict] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.chunks_seen = 0
+        self.duplicates = 0
+        self.chars_saved = 0
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        n = self.shingle_words
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        return np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the word shingles of a text."""
+        shingles = self._shingles(text) % _PRIME
+        # (shingles x permutations) hashes, minimum per permutation
+        return ((shingles[:, None] * self._a + self._b) % _PRIME).min(axis=0)
+
+    def is_duplicate(self, text: str) -> bool:
+        """Check a chunk against the chunks seen before, and remember it if it is new."""
+        signature = self.signature(text)
+        bands = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        with self._lock:
+            self.chunks_seen += 1
+            candidates = set()
+            for buckets, band in zip(self._buckets, bands):
+                candidates.update(buckets.get(band, ()))
+            for index in candidates:
+                if np.mean(self._signatures[index] == signature) >= self.threshold:
+                    self.duplicates += 1
+                    self.chars_saved += len(text)
+                    return True
+            index = len(self._signatures)
+            self._signatures.append(signature)
+            for buckets, band in zip(self._buckets, bands):
+                buckets.setdefault(band, []).append(index)
+            return False
+
+    def filter(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Yield the chunks that are not near-duplicates of a chunk seen before."""
+        for chunk in chunks:
+            if not self.is_duplicate(chunk):
+                yield chunk
+
+    def stats(self, dim: Optional[int] = None, since: Optional[dict] = None) -> dict:
+        """Chunks dropped and the storage they would have used, since the filter was created.
+
+        Args:
+            dim: The embedding dimension, to count the float32 vectors not stored.
+            since: An earlier result of `stats`, to count only the chunks checked after it.
+        """
+        with self._lock:
+            counts = {"chunks_seen": self.chunks_seen, "duplicates": self.duplicates, "chars_saved": self.chars_saved}
+        if since:
+            counts = {name: value - since.get(name, 0) for name, value in counts.items()}
+        stats = {
+            "chunks_seen": counts["chunks_seen"],
+            "duplicates": counts["duplicates"],
+            "embeddings_saved": counts["duplicates"],
+            "chars_saved": counts["chars_saved"],
+        }
+        if dim:
+            stats["bytes_saved"] = stats["chars_saved"] + stats["duplicates"] * dim * 4
+        return stats
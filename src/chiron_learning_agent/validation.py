@@ -0,0 +1,59 @@
+"""
+Validation of the checkpoints against the chunks of their context.
+
+Each checkpoint is validated by its own LLM call, the calls run concurrently.
+"""
+
+import os
+from typing import List
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from chiron_learning_agent.prompts import validate_context
+
+
+# Checkpoint validations sent to the LLM at the same time
+VALIDATION_CONCURRENCY = int(os.getenv("CHIRON_VALIDATION_CONCURRENCY", "8"))
+
+
+def validation_messages(checkpoint, chunks: List[str]) -> list:
+    """Messages asking whether the chunks cover the criteria of the checkpoint"""
+    return [
+        SystemMessage(content=validate_context),
+        HumanMessage(
+            content=f"""
+            Criteria:
+            {chr(10).join(f"- {c}" for c in checkpoint.criteria)}
+
+            Context:
+            {chr(10).join(chunks)}
+            """
+        ),
+    ]
+
+
+def find_uncovered_checkpoints(structured_llm, checkpoints: list, relevant_chunks: List[List[str]]) -> list:
+    """Validate the checkpoints concurrently and return those missing from the context, in their order
+
+    Args:
+        structured_llm: LLM answering with InContext
+        checkpoints: Checkpoints to validate
+        relevant_chunks: Chunks retrieved for each checkpoint
+
+    Returns:
+        The checkpoints not covered by the context. A checkpoint whose validation failed
+        is returned too, so its context is searched for rather than the batch failing.
+    """
+    responses = structured_llm.batch(
+        [validation_messages(checkpoint, chunks) for checkpoint, chunks in zip(checkpoints, relevant_chunks)],
+        config={"max_concurrency": VALIDATION_CONCURRENCY},
+        return_exceptions=True,
+    )
+    uncovered = []
+    for checkpoint, response in zip(checkpoints, responses):
+        if isinstance(response, Exception):
+            print(f"Error validating checkpoint {checkpoint.description!r}: {response}")
+            uncovered.append(checkpoint)
+        elif response.is_in_context.lower() == "no":
+            uncovered.append(checkpoint)
+    return uncovered
@@ -0,0 +1,158 @@
+"""
+Array-backed vector store for the context chunks of a learning session.
+
+Embeddings are kept in one contiguous float32 matrix with L2-normalized rows, so cosine
+similarity is a single matrix product, and the top-k chunks are selected with
+`argpartition` instead of sorting every score.
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return the rows of a float32 matrix scaled to unit L2 norm (zero rows are left as is)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorStore:
+    """Chunks and their normalized embeddings, searchable by cosine similarity.
+
+    Args:
+        dim: The embedding dimension, or None to take it from the first embeddings added.
+        initial_capacity: Rows allocated up front; the matrix doubles when full.
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 256):
+        self.dim = dim
+        self.chunks: List[str] = []
+        self._vectors = np.empty((initial_capacity, dim or 0), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The normalized embeddings, one row per chunk."""
+        return self._vectors[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the embeddings and the chunk texts."""
+        return self._vectors.nbytes + sum(len(chunk) for chunk in self.chunks)
+
+    @property
+    def memory_mapped(self) -> bool:
+        """Whether the embeddings are read from disk rather than held in memory."""
+        return isinstance(self._vectors, np.memmap)
+
+    @property
+    def resident_nbytes(self) -> int:
+        """Memory used by the store, leaving out memory-mapped embeddings."""
+        vectors = 0 if self.memory_mapped else self._vectors.nbytes
+        return vectors + sum(len(chunk) for chunk in self.chunks)
+
+    def _reserve(self, rows: int):
+        needed = self._size + rows
+        if needed <= self._vectors.shape[0] and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * self._vectors.shape[0], 256)
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        grown[:self._size] = self._vectors[:self._size]
+        self._vectors = grown
+
+    def add(self, chunks: Sequence[str], embeddings) -> range:
+        """Add chunks with their embeddings.
+
+        Returns:
+            range: The indices of the added chunks.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(chunks) == 0:
+            return range(self._size, self._size)
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(chunks):
+            raise ValueError(f"Expected {len(chunks)} embeddings, got an array of shape {embeddings.shape}")
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of dimension {self.dim}, got {embeddings.shape[1]}")
+        if self._vectors.shape[1] != self.dim:
+            # Allocated before the dimension was known
+            self._vectors = np.empty((max(self._vectors.shape[0], len(chunks)), self.dim), dtype=np.float32)
+
+        self._reserve(len(chunks))
+        start = self._size
+        self._vectors[start:start + len(chunks)] = normalize_rows(embeddings)
+        self._size += len(chunks)
+        self.chunks.extend(chunks)
+        return range(start, self._size)
+
+    def search(self, query_embeddings, k: int = 3) -> List[List[Tuple[int, float]]]:
+        """Find the `k` chunks most similar to each query embedding.
+
+        Args:
+            query_embeddings: One embedding, or a batch of embeddings searched at once.
+            k: The number of chunks returned per query.
+
+        Returns:
+            For each query, the (chunk index, cosine similarity) pairs, most similar first.
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        k = min(k, self._size)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        # (chunks x dim) @ (dim x queries) walks the matrix row by row, faster than the transposed product
+        scores = (self.vectors @ normalize_rows(queries).T).T
+        if k < self._size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(self._size), (len(queries), self._size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(int(i), float(s)) for i, s in zip(row_indices, row_scores)]
+            for row_indices, row_scores in zip(top, top_scores)
+        ]
+
+    def search_chunks(self, query_embeddings, k: int = 3) -> List[List[str]]:
+        """Like `search`, returning the texts of the chunks found for each query."""
+        return [[self.chunks[i] for i, _ in results] for results in self.search(query_embeddings, k)]
+
+    def save(self, directory) -> Path:
+        """Write the store to a directory: the embeddings as .npy, the chunks as JSON."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "vectors.npy", self.vectors)
+        (directory / "chunks.json").write_text(json.dumps(self.chunks), encoding="utf-8")
+        return directory
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True) -> "VectorStore":
+        """Read a store written by `save`.
+
+        Args:
+            mmap: Memory-map the embeddings instead of reading them into memory. They are
+                copied into memory the first time chunks are added.
+        """
+        directory = Path(directory)
+        vectors = np.load(directory / "vectors.npy", mmap_mode="r" if mmap else None)
+        if vectors.shape[0] == 0:
+            # Saved before any embeddings were added, the dimension is still unknown
+            return cls()
+        store = cls(dim=vectors.shape[1], initial_capacity=0)
+        store._vectors = vectors
+        store._size = vectors.shape[0]
+        store.chunks = json.loads((directory / "chunks.json").read_text(encoding="utf-8"))
+        return store
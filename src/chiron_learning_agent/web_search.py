@@ -0,0 +1,64 @@
+"""
+Concurrent, cached web searches for the learning contexts.
+
+The queries of a step run on a small thread pool, their results are reused for a while,
+and results returned by several queries are kept once.
+"""
+
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+from urllib.parse import urlsplit, urlunsplit
+
+from utils.cache import TTLCache
+
+
+# Web searches run at the same time, and how long their results are reused
+SEARCH_CONCURRENCY = int(os.getenv("CHIRON_SEARCH_CONCURRENCY", "4"))
+search_cache = TTLCache(max_entries=256, ttl_seconds=float(os.getenv("CHIRON_SEARCH_CACHE_TTL", str(60 * 60))))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY, thread_name_prefix="chiron-search")
+
+
+def cached_web_search(search_tool, query: str) -> list:
+    """Search the web with a search tool (Tavily), reusing the results of the same query for a while"""
+    key = " ".join(query.lower().split())
+    search_docs = search_cache.get(key)
+    if search_docs is None:
+        search_docs = search_tool.invoke(query)
+        if not isinstance(search_docs, list):
+            # Tavily returns an error message instead of results
+            print(f"Web search failed for {query!r}: {search_docs}")
+            return []
+        search_cache.set(key, search_docs)
+    return search_docs
+
+
+def search_all(search_tool, queries: Iterable[str]) -> list:
+    """Run the queries concurrently and return all their results, in the order of the queries"""
+    all_search_docs = []
+    for search_docs in search_executor.map(lambda query: cached_web_search(search_tool, query), queries):
+        all_search_docs.extend(search_docs)
+    return all_search_docs
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+def dedupe_search_docs(search_docs: list) -> list:
+    """Drop the search results whose URL or content was already returned by another query"""
+    seen_urls, seen_contents = set(), set()
+    unique_docs = []
+    for doc in search_docs:
+        url = _normalize_url(doc.get("url", ""))
+        content = re.sub(r"\s+", " ", doc.get("content", "")).strip().lower()
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest() if content else None
+        if (url and url in seen_urls) or (content_hash and content_hash in seen_contents):
+            continue
+        seen_urls.add(url)
+        seen_contents.add(content_hash)
+        unique_docs.append(doc)
+    return unique_docs
@@ -0,0 +1,171 @@
+"""
+Worker processes executing the agent runs of the job queue.
+
+Run it next to the frontends, with one process per core by default:
+
+    python src/job_worker.py --workers 4
+
+Each worker claims a job, records the events of the run as progress, and stores the
+final answer as the job result. Stopping the workers (Ctrl+C or SIGTERM) lets them
+finish their current job.
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import warnings
+import logging
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Suppress ALTS and gRPC warnings from Google libraries
+os.environ["GRPC_VERBOSITY"] = "ERROR"
+os.environ["GRPC_TRACE"] = ""
+warnings.filterwarnings("ignore", message=".*ALTS creds ignored.*")
+logging.getLogger("grpc").setLevel(logging.ERROR)
+logging.getLogger("google").setLevel(logging.ERROR)
+
+# Ensure local imports work when running the workers from the project root
+CURRENT_DIR = Path(__file__).resolve().parent
+if str(CURRENT_DIR) not in sys.path:
+    sys.path.insert(0, str(CURRENT_DIR))
+
+from utils.job_queue import DEFAULT_JOB_DB, JobQueue
+
+
+POLL_INTERVAL = float(os.getenv("RESEARCH_AGENT_JOB_POLL_INTERVAL", "1"))
+# Running jobs without a heartbeat for this long are considered lost and queued again
+HEARTBEAT_TIMEOUT = float(os.getenv("RESEARCH_AGENT_JOB_HEARTBEAT_TIMEOUT", "600"))
+# Seconds between the heartbeats sent while a job runs, also during long silent LLM calls
+HEARTBEAT_INTERVAL = float(os.getenv("RESEARCH_AGENT_JOB_HEARTBEAT_INTERVAL", "30"))
+# Finished jobs and their events are deleted after this many seconds
+JOB_RETENTION = float(os.getenv("RESEARCH_AGENT_JOB_RETENTION", str(7 * 24 * 60 * 60)))
+PRUNE_INTERVAL = 60 * 60
+
+
+def load_agents() -> dict:
+    """Import the agents in the worker process. Each agent is a generator function taking
+    the query and a `session_id` keyword, and yielding progress events, ending with a "done" event.
+    The Chiron learning agent is added here once its graph is complete."""
+    from scientific_research_agent.workflow import stream_research_workflow
+
+    return {"research": stream_research_workflow}
+
+
+def send_heartbeats(queue: JobQueue, job: dict, stop: threading.Event, lost: threading.Event):
+    """Send heartbeats for a running job until `stop` is set. Sets `lost` when the job is no
+    longer ours (cancelled or queued again for another worker)."""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            if not queue.heartbeat(job["id"], job["lease"]):
+                lost.set()
+                return
+        except Exception as e:
+            print(f"Heartbeat of job {job['id']} failed: {e}")
+
+
+def run_job(queue: JobQueue, job: dict, agents: dict):
+    """Execute a claimed job, recording its events, and store its result."""
+    agent = agents.get(job["agent"])
+    if agent is None:
+        queue.fail(job["id"], f"Unknown agent: {job['agent']}", lease=job["lease"])
+        return
+
+    stop_heartbeats, lost = threading.Event(), threading.Event()
+    heartbeats = threading.Thread(
+        target=send_heartbeats, args=(queue, job, stop_heartbeats, lost), name=f"heartbeat-{job['id']}", daemon=True
+    )
+    heartbeats.start()
+    # The queries of a conversation share their tool results
+    events = agent(job["query"], session_id=job["session_id"] or job["user_id"])
+    answer = ""
+    try:
+        for event in events:
+            # Cancelled from a frontend or queued again: stop the run at its next step
+            if lost.is_set() or not queue.add_event(job["id"], event, lease=job["lease"]):
+                print(f"Job {job['id']} cancelled or taken over, stopping")
+                return
+            if event["type"] == "done":
+                answer = event["content"]
+        queue.complete(job["id"], answer, lease=job["lease"])
+    except Exception as e:
+        print(f"Error in job {job['id']}: {e}")
+        traceback.print_exc()
+        queue.fail(job["id"], str(e), lease=job["lease"])
+    finally:
+        stop_heartbeats.set()
+        events.close()
+
+
+def worker_loop(db_path: str, worker_id: str):
+    """Claim and execute jobs until the process is asked to stop."""
+    load_dotenv()
+    try:
+        from utils.secrets_loader import load_secrets_simple
+        load_secrets_simple()
+    except Exception as e:
+        print(f"Secrets file not loaded, using the environment only: {e}")
+    stopping = {"value": False}
+
+    def request_stop(signum, frame):
+        stopping["value"] = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    queue = JobQueue(db_path)
+    agents = load_agents()
+    print(f"Worker {worker_id} started")
+    last_prune = 0.0
+    while not stopping["value"]:
+        if time.monotonic() - last_prune > PRUNE_INTERVAL:
+            queue.prune(JOB_RETENTION)
+            last_prune = time.monotonic()
+        queue.requeue_stale(HEARTBEAT_TIMEOUT)
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        print(f"Worker {worker_id} running job {job['id']}")
+        run_job(queue, job, agents)
+    print(f"Worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the agent job workers.")
+    parser.add_argument("--db", default=DEFAULT_JOB_DB, help="The job queue database file")
+    parser.add_argument(
+        "--workers", type=int,
+        default=int(os.getenv("RESEARCH_AGENT_JOB_WORKERS", str(os.cpu_count() or 1))),
+        help="Worker processes",
+    )
+    args = parser.parse_args()
+
+    # Create the schema once before the workers start
+    JobQueue(args.db)
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(args.db, f"{os.getpid()}-{i}"), name=f"job-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward_stop)
+    signal.signal(signal.SIGINT, forward_stop)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
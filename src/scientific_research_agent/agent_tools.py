@@ -1,16 +1,64 @@
 import io
-import time
-import ssl
+import os
+import re
+import threading
 import urllib3
-from urllib3.util.ssl_ import create_urllib3_context
+from urllib.parse import urlsplit
+from urllib3.util.request import ACCEPT_ENCODING
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
 from langchain_core.tools import BaseTool, tool
 from scientific_research_agent.pydantic_models import SearchPapersInput
-from scientific_research_agent.core_api_wrapper import CoreAPIWrapper
-import pdfplumber
+from scientific_research_agent.core_api_wrapper import CoreAPIWrapper, SEARCH_RESULTS_SEPARATOR
+from scientific_research_agent.cache import SingleFlight
+from utils.cache import TTLCache
+from scientific_research_agent.http_client import CircuitOpenError, download_client
 
 # Suppress SSL warnings for scientific paper downloads
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# CORE search results keyed by (normalized query, max_papers)
+search_cache = TTLCache(max_entries=256, ttl_seconds=15 * 60)
+# Identical concurrent searches and downloads, from any session, share one request
+search_flight = SingleFlight(max_workers=8, name="search-flight")
+paper_flight = SingleFlight(max_workers=8, name="paper-flight")
+
+# How long a single caller waits for a shared search/download before giving up
+SEARCH_TIMEOUT = float(os.getenv("RESEARCH_AGENT_SEARCH_TIMEOUT", "90"))
+DOWNLOAD_TIMEOUT = float(os.getenv("RESEARCH_AGENT_DOWNLOAD_TIMEOUT", "120"))
+
+
+def normalize_search_query(query: str) -> str:
+    """Normalize a search query so that trivial variants share the same cache entry."""
+    query = re.sub(r"[\"'`]", "", query.lower())
+    return re.sub(r"\s+", " ", query).strip(" ?.!")
+
+
+def truncate_search_results(papers: str, max_papers: int) -> str:
+    """Keep only the first `max_papers` results of a formatted CORE search output."""
+    return SEARCH_RESULTS_SEPARATOR.join(papers.split(SEARCH_RESULTS_SEPARATOR)[:max_papers])
+
+
+def _search_and_cache(key: tuple, query: str, max_papers: int) -> str:
+    papers = CoreAPIWrapper(top_k_results=max_papers).search(query)
+    search_cache.set(key, papers)
+    return papers
+
+
+def cached_search(query: str, max_papers: int = 1, timeout: Optional[float] = SEARCH_TIMEOUT) -> str:
+    """Search CORE, serving repeated queries from the search cache and joining identical searches in flight.
+
+    Raises:
+        concurrent.futures.TimeoutError: If the search takes longer than `timeout` for this caller.
+        Exception: Any error raised by the CORE API. Errors are not cached.
+    """
+    key = (normalize_search_query(query), max_papers)
+    papers = search_cache.get(key)
+    if papers is None:
+        papers = search_flight.do(key, _search_and_cache, key, query, max_papers, timeout=timeout)
+    return papers
+
+
 @tool("search-paper", args_schema=SearchPapersInput)
 def search_paper(query: str, max_papers: int = 1) -> str:
     """Search for scientific papers using the CORE API.
@@ -21,112 +69,185 @@ def search_paper(query: str, max_papers: int = 1) -> str:
         A list of the relevant papers found with the corresponding relevant information.
     """
     try:
-        papers = CoreAPIWrapper(top_k_results=max_papers).search(query)
+        papers = cached_search(query, max_papers)
         print("Search paper tool output:", papers)
         return papers
+    except CircuitOpenError as e:
+        return f"Error searching for papers: {e}. Do not retry the search now, answer with the information already gathered or use suggest-alternative-sources."
     except Exception as e:
         return f"Error searching for papers: {e}"
     
-@tool("download-paper")
-def download_paper(url: str) -> str:
-    """Download a specific scientific paper from a given URL.
-    Example:
-     { "url": "https://www.example.com/paper.pdf" }
-     
-     Returns:
-         the paper content
-    
+class PaperDownloadError(Exception):
+    """Raised when a paper cannot be downloaded or processed. The message is meant for the agent."""
+
+
+class DownloadAborted(PaperDownloadError):
+    """Raised when a download is cancelled or exceeds its byte budget."""
+
+
+# Extracted paper text keyed by URL. Background prefetches publish here too.
+paper_cache = TTLCache(max_entries=64, ttl_seconds=60 * 60)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _read_body(response, max_bytes: Optional[int] = None, cancel_event: Optional[threading.Event] = None) -> bytes:
+    """Read a streamed response body, aborting on cancellation or when it exceeds `max_bytes`."""
+    try:
+        content_length = int(response.headers.get('content-length') or 0)
+        if max_bytes is not None and content_length > max_bytes:
+            raise DownloadAborted(f"Error: Paper is larger than the allowed {max_bytes} bytes.")
+        body = bytearray()
+        for chunk in response.stream(DOWNLOAD_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadAborted("Error: Download was cancelled.")
+            body.extend(chunk)
+            if max_bytes is not None and len(body) > max_bytes:
+                raise DownloadAborted(f"Error: Paper is larger than the allowed {max_bytes} bytes.")
+        return bytes(body)
+    finally:
+        response.release_conn()
+
+
+def _looks_like_pdf(url: str) -> bool:
+    path = urlsplit(url).path.lower()
+    return path.endswith('.pdf') or '/pdf/' in path
+
+
+def _extract_pdf_text(data: bytes, url: str) -> str:
+    """Extract the text of a PDF document."""
+    # Imported on first download, pdfplumber is slow to import and not needed to start the app
+    import pdfplumber
+
+    try:
+        pdf_file = io.BytesIO(data)
+        with pdfplumber.open(pdf_file) as pdf:
+            if len(pdf.pages) == 0:
+                raise PaperDownloadError("Error: PDF file appears to be empty or corrupted (no pages found).")
+
+            text = ""
+            for page_num, page in enumerate(pdf.pages, 1):
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n"
+                else:
+                    text += f"[Page {page_num}: No text content found]\n"
+
+            if not text.strip():
+                raise PaperDownloadError("Error: PDF file could not be processed - no text content could be extracted.")
+
+            return text
+
+    except PaperDownloadError:
+        raise
+    except Exception as pdf_error:
+        # Check if the response is actually HTML (common with redirects)
+        response_text = data.decode('utf-8', errors='ignore')
+        if response_text.strip().startswith('<'):
+            raise PaperDownloadError(f"Error: URL redirected to HTML page instead of PDF. This often happens with paywalled or restricted papers. URL: {url}")
+        else:
+            raise PaperDownloadError(f"Error: Failed to process PDF file. The file may be corrupted or not a valid PDF. Error: {str(pdf_error)}")
+
+
+def fetch_paper(url: str, max_bytes: Optional[int] = None, cancel_event: Optional[threading.Event] = None) -> Tuple[str, int]:
+    """Download a paper and extract its text.
+
+    Args:
+        url: The URL of the paper.
+        max_bytes: Abort the download if the body is larger than this.
+        cancel_event: Abort the download as soon as this event is set.
+
+    Returns:
+        Tuple[str, int]: The paper text and the number of bytes downloaded.
+
+    Raises:
+        PaperDownloadError: If the paper cannot be downloaded or processed.
     """
     # Validate URL format
     if not url.startswith(('http://', 'https://')):
-        return f"Error: Invalid URL format. URL must start with http:// or https://. Got: {url}"
-    
-    # Create SSL context that's more permissive for scientific repositories
-    ssl_context = create_urllib3_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    
-    # Create HTTP pool manager with custom SSL context
-    http = urllib3.PoolManager(
-        ssl_context=ssl_context,
-        cert_reqs='CERT_NONE',
-        assert_hostname=False
-    )
+        raise PaperDownloadError(f"Error: Invalid URL format. URL must start with http:// or https://. Got: {url}")
     
     # Mock browser headers to avoid 403 errors
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'application/pdf,text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
+        # PDFs are already compressed, only ask for gzip/deflate on other bodies
+        'Accept-Encoding': 'identity' if _looks_like_pdf(url) else ACCEPT_ENCODING,
         'Connection': 'keep-alive',
     }
     
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = http.request('GET', url, headers=headers)
-            
-            # Check HTTP status
-            if response.status == 200:
-                # Check content type
-                content_type = response.headers.get('content-type', '').lower()
-                
-                # Check if response is actually a PDF
-                if 'application/pdf' in content_type or url.lower().endswith('.pdf'):
-                    try:
-                        pdf_file = io.BytesIO(response.data)
-                        with pdfplumber.open(pdf_file) as pdf:
-                            if len(pdf.pages) == 0:
-                                return "Error: PDF file appears to be empty or corrupted (no pages found)."
-                            
-                            text = ""
-                            for page_num, page in enumerate(pdf.pages, 1):
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text += page_text + "\n"
-                                else:
-                                    text += f"[Page {page_num}: No text content found]\n"
-                            
-                            if not text.strip():
-                                return "Error: PDF file could not be processed - no text content could be extracted."
-                            
-                            return text
-                            
-                    except Exception as pdf_error:
-                        # Check if the response is actually HTML (common with redirects)
-                        response_text = response.data.decode('utf-8', errors='ignore')
-                        if response_text.strip().startswith('<'):
-                            return f"Error: URL redirected to HTML page instead of PDF. This often happens with paywalled or restricted papers. URL: {url}"
-                        else:
-                            return f"Error: Failed to process PDF file. The file may be corrupted or not a valid PDF. Error: {str(pdf_error)}"
-                
-                else:
-                    # Check if response is HTML (common with redirects or error pages)
-                    response_text = response.data.decode('utf-8', errors='ignore')
-                    if response_text.strip().startswith('<'):
-                        return f"Error: URL returned HTML content instead of PDF. Content-Type: {content_type}. This often indicates the paper is behind a paywall or requires authentication. URL: {url}"
-                    else:
-                        return f"Error: URL did not return a PDF file. Content-Type: {content_type}. URL: {url}"
-            
-            elif response.status == 403:
-                return f"Error: Access forbidden (HTTP 403). The paper may be behind a paywall or require authentication. URL: {url}"
-            
-            elif response.status == 404:
-                return f"Error: Paper not found (HTTP 404). The URL may be incorrect or the paper may have been moved. URL: {url}"
-            
-            elif response.status == 429:
-                return f"Error: Too many requests (HTTP 429). Please try again later. URL: {url}"
-            
-            else:
-                return f"Error: HTTP {response.status} - {response.reason}. URL: {url}"
-                
-        except Exception as e:
-            if attempt == max_retries - 1:
-                return f"Error downloading paper after {max_retries} attempts: {str(e)}. URL: {url}"
-            time.sleep(2**attempt)
+    try:
+        response = download_client.request('GET', url, headers=headers, preload_content=False)
+        data = _read_body(response, max_bytes, cancel_event)
+    except DownloadAborted:
+        raise
+    except CircuitOpenError as e:
+        raise PaperDownloadError(f"Error: {e}. Do not retry this URL, use suggest-alternative-sources to find another copy of the paper. URL: {url}")
+    except Exception as e:
+        raise PaperDownloadError(f"Error downloading paper after {download_client.retries + 1} attempts: {str(e)}. URL: {url}")
+
+    # Check HTTP status
+    if response.status == 200:
+        # Check content type
+        content_type = response.headers.get('content-type', '').lower()
+        
+        # Check if response is actually a PDF
+        if 'application/pdf' in content_type or url.lower().endswith('.pdf'):
+            return _extract_pdf_text(data, url), len(data)
+        
+        # Check if response is HTML (common with redirects or error pages)
+        response_text = data.decode('utf-8', errors='ignore')
+        if response_text.strip().startswith('<'):
+            raise PaperDownloadError(f"Error: URL returned HTML content instead of PDF. Content-Type: {content_type}. This often indicates the paper is behind a paywall or requires authentication. URL: {url}")
+        else:
+            raise PaperDownloadError(f"Error: URL did not return a PDF file. Content-Type: {content_type}. URL: {url}")
+    
+    elif response.status == 403:
+        raise PaperDownloadError(f"Error: Access forbidden (HTTP 403). The paper may be behind a paywall or require authentication. URL: {url}")
     
-    return f"Error: Failed to download paper after {max_retries} attempts. URL: {url}"
+    elif response.status == 404:
+        raise PaperDownloadError(f"Error: Paper not found (HTTP 404). The URL may be incorrect or the paper may have been moved. URL: {url}")
+    
+    elif response.status == 429:
+        raise PaperDownloadError(f"Error: Too many requests (HTTP 429). Please try again later. URL: {url}")
+    
+    else:
+        raise PaperDownloadError(f"Error: HTTP {response.status} - {response.reason}. URL: {url}")
+
+
+@tool("download-paper")
+def download_paper(url: str) -> str:
+    """Download a specific scientific paper from a given URL.
+    Example:
+     { "url": "https://www.example.com/paper.pdf" }
+     
+     Returns:
+         the paper content
+    
+    """
+    text = paper_cache.get(url)
+    if text is not None:
+        return text
+
+    # Identical downloads in flight (other sessions, background prefetches) are joined
+    for attempt in range(2):
+        try:
+            return paper_flight.do(url, _download_and_cache, url, timeout=DOWNLOAD_TIMEOUT)
+        except (DownloadAborted, CancelledError):
+            # The joined prefetch was cancelled, download it ourselves
+            continue
+        except PaperDownloadError as e:
+            return str(e)
+        except FutureTimeoutError:
+            return f"Error: Timed out after {DOWNLOAD_TIMEOUT:g} seconds waiting for the paper download. URL: {url}"
+    return f"Error: Download of the paper was cancelled. URL: {url}"
+
+
+def _download_and_cache(url: str) -> str:
+    text, _ = fetch_paper(url)
+    paper_cache.set(url, text)
+    return text
 
 @tool("ask-human-feedback")
 def ask_human_feedback(question: str) -> str:
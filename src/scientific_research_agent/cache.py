@@ -0,0 +1,63 @@
+"""
+Request coalescing shared by the research tools. Their caches are `utils.cache.TTLCache`.
+"""
+
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """Process-wide coalescing of identical concurrent calls.
+
+    Calls sharing a key while one is in flight wait for the same underlying result instead
+    of repeating the work. The work runs on an executor, so a caller giving up after its own
+    timeout does not cancel it for the other callers.
+
+    Args:
+        max_workers: Size of the default executor running the calls.
+        name: Prefix of the executor thread names.
+    """
+
+    def __init__(self, max_workers: int = 16, name: str = "single-flight"):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def submit(self, key: Hashable, fn: Callable, *args, executor: Optional[Executor] = None, **kwargs) -> Future:
+        """Start `fn(*args, **kwargs)` under `key`, or return the future of the identical call in flight."""
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None and not future.done():
+                self.shared += 1
+                return future
+            future = (executor or self._executor).submit(fn, *args, **kwargs)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def do(self, key: Hashable, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` once for all concurrent callers of `key` and return its result.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the result is not ready within this caller's timeout.
+        """
+        return self.submit(key, fn, *args, **kwargs).result(timeout=timeout)
+
+    def get(self, key: Hashable) -> Optional[Future]:
+        """Return the future of the call in flight under `key`, if any."""
+        with self._lock:
+            future = self._inflight.get(key)
+        return future if future is not None and not future.done() else None
+
+    def _forget(self, key: Hashable, future: Future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inflight": len(self._inflight), "calls": self.calls, "shared": self.shared}
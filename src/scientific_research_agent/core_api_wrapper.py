@@ -1,12 +1,16 @@
-import time
 import os
 import json
 from dotenv import load_dotenv
-import requests
 import urllib3
 
+from scientific_research_agent.http_client import core_client
+
 CORE_API_KEY = os.getenv("CORE_API_KEY")
+SEARCH_RESULTS_SEPARATOR = "\n-----\n"
+
 
+class CoreAPIError(Exception):
+    """Raised when the CORE API answers with an error status."""
 
 
 class CoreAPIWrapper:
@@ -14,24 +18,19 @@ class CoreAPIWrapper:
     def __init__(self, top_k_results: int = 10):
         self.base_url = "https://api.core.ac.uk/v3"
         self.api_key = CORE_API_KEY
-        self.http = urllib3.PoolManager()
+        self.http = core_client
         self.top_k_results = top_k_results
     def _make_request(self,  query: str) -> dict:
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                response = self.http.request(
-                'GET',
-                f"{self.base_url}/search/outputs", 
-                headers={"Authorization": f"Bearer {self.api_key}"}, 
-                fields={"q": query, "limit": self.top_k_results}
-            )
-                return response.json()
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                time.sleep(2**(attempt+2))
-        
+        # Timeouts, retries and circuit breaking are handled by the shared client
+        response = self.http.request(
+            'GET',
+            f"{self.base_url}/search/outputs", 
+            headers={"Authorization": f"Bearer {self.api_key}"}, 
+            fields={"q": query, "limit": self.top_k_results}
+        )
+        # Raise rather than parse an error body, so that failures are never cached as "no results"
+        if not 200 <= response.status < 300:
+            raise CoreAPIError(f"CORE API returned HTTP {response.status}: {response.data[:200].decode('utf-8', 'replace')}")
         return response.json()
     
     def search(self, query: str) -> str:
@@ -65,6 +64,6 @@ class CoreAPIWrapper:
                 f"* Abstract: {result.get('abstract', '')},\n"
                 f"* Paper URLs: {result.get('sourceFulltextUrls') or result.get('downloadUrl', '')}"
             ))
-        return "\n-----\n".join(docs)
+        return SEARCH_RESULTS_SEPARATOR.join(docs)
 
 
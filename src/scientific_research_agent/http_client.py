@@ -0,0 +1,416 @@
+"""
+Shared outbound HTTP layer for the research tools.
+
+Requests get bounded timeouts and retries, are hedged to alternate mirrors when the
+primary host is slow, and go through a per-host circuit breaker that fails fast while
+a host is down. Connections are kept alive in per-host pools shared by all sessions.
+"""
+
+import os
+import ssl
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
+
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.ssl_ import create_urllib3_context
+
+
+# Seconds to wait for the primary host before sending a hedged request to a mirror
+HEDGE_AFTER = float(os.getenv("RESEARCH_AGENT_HEDGE_AFTER", "3"))
+# Consecutive failed requests (not attempts) opening a host's circuit, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("RESEARCH_AGENT_CIRCUIT_FAILURES", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("RESEARCH_AGENT_CIRCUIT_RESET", "60"))
+# Longest Retry-After honoured before retrying a 429/503; longer waits return the error response
+MAX_RETRY_AFTER = float(os.getenv("RESEARCH_AGENT_MAX_RETRY_AFTER", "30"))
+# Statuses meaning the server is overloaded or temporarily down, retried like connection errors
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Redirects are still followed, retries are handled by HttpClient
+FOLLOW_REDIRECTS_ONLY = urllib3.Retry(total=None, connect=0, read=0, redirect=5, status=0, other=0)
+
+# Keep-alive connections per host, which is also the number of concurrent requests to it
+DEFAULT_POOL_SIZE = 2
+HOST_POOL_SIZES: Dict[str, int] = {
+    "arxiv.org": 4,
+    "export.arxiv.org": 4,
+    "core.ac.uk": 4,
+    "api.core.ac.uk": 8,
+}
+# Seconds a request waits for a free connection to a host that is at its cap
+POOL_TIMEOUT = float(os.getenv("RESEARCH_AGENT_POOL_TIMEOUT", "60"))
+
+# Hosts serving the same content under the same path
+MIRRORS: Dict[str, List[str]] = {
+    "arxiv.org": ["export.arxiv.org"],
+    "export.arxiv.org": ["arxiv.org"],
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting a host whose circuit breaker is open."""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"{host} is temporarily unavailable after repeated failures (retrying in {retry_in:.0f}s)")
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests fail
+    immediately. After `reset_seconds` a single trial request is let through (half open):
+    success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_request(self):
+        """Raise CircuitOpenError if the host should not be contacted right now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(self.host, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker of a host."""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def circuit_status() -> Dict[str, dict]:
+    """Return the circuit state and consecutive failures of every host contacted so far."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: {"state": breaker.state, "failures": breaker.failures} for breaker in breakers}
+
+
+def is_host_available(url: str) -> bool:
+    """Whether the host of `url` (or one of its mirrors) can currently be contacted."""
+    host = urlsplit(url).hostname or ""
+    return any(get_circuit_breaker(h).state != "open" for h in [host] + MIRRORS.get(host, []))
+
+
+def alternate_urls(url: str) -> List[str]:
+    """Return `url` rewritten to each known mirror of its host."""
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    alternates = []
+    for mirror in MIRRORS.get(host, []):
+        netloc = parts.netloc.replace(host, mirror, 1)
+        alternates.append(urlunsplit(parts._replace(netloc=netloc)))
+    return alternates
+
+
+def _is_failure(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds to wait before retrying according to the Retry-After header, if there is one."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _release(response):
+    """Return the connection of a response that will not be read to its pool."""
+    response.drain_conn()
+    response.release_conn()
+
+
+def _discard(future: Future):
+    """Close the response of a hedged request that lost the race."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    response = future.result()
+    response.close()
+    response.release_conn()
+
+
+class HttpClient:
+    """HTTP client with timeouts, bounded retries, hedging to mirrors and circuit breaking.
+
+    Args:
+        pool_manager: The urllib3 pool manager used to send requests.
+        timeout: Connect/read timeout of each attempt.
+        retries: Number of additional attempts after a connection error, a timeout or a
+            429/5xx response in RETRY_STATUSES.
+        backoff: Base delay in seconds between retries, doubled on each retry. A
+            Retry-After header of up to MAX_RETRY_AFTER seconds is honoured instead.
+        hedge_after: Seconds to wait for a response before also trying a mirror. None disables hedging.
+    """
+
+    def __init__(
+        self,
+        pool_manager: urllib3.PoolManager,
+        timeout: urllib3.Timeout = urllib3.Timeout(connect=5.0, read=30.0),
+        retries: int = 2,
+        backoff: float = 0.5,
+        hedge_after: Optional[float] = HEDGE_AFTER,
+    ):
+        self.pool_manager = pool_manager
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="http-hedge")
+
+    def request(self, method: str, url: str, **kwargs) -> urllib3.BaseHTTPResponse:
+        """Send a request, retrying connection errors and overload responses and hedging slow GETs to mirrors.
+
+        Extra keyword arguments are passed to `urllib3.PoolManager.request`. Each host's
+        circuit breaker counts at most one failure per call, however many attempts it took.
+
+        Returns:
+            The response, which may be an error response once the retries are exhausted.
+
+        Raises:
+            CircuitOpenError: If the host and all of its mirrors are failing.
+            urllib3.exceptions.HTTPError: If every attempt failed.
+        """
+        urls = [url] + (alternate_urls(url) if method == "GET" else [])
+        failed_hosts: Set[str] = set()
+        for attempt in range(self.retries + 1):
+            try:
+                if len(urls) == 1 or self.hedge_after is None:
+                    response = self._attempt(method, url, failed_hosts, **kwargs)
+                else:
+                    response = self._hedged(method, urls, failed_hosts, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+                continue
+
+            if response.status not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            delay = _retry_after(response)
+            if delay is not None and delay > MAX_RETRY_AFTER:
+                return response
+            _release(response)
+            time.sleep(self.backoff * 2**attempt if delay is None else delay)
+
+    def _attempt(self, method: str, url: str, failed_hosts: Set[str], **kwargs) -> urllib3.BaseHTTPResponse:
+        """Send one attempt, recording the host's first failure of the call in its circuit breaker."""
+        host = urlsplit(url).hostname or ""
+        breaker = get_circuit_breaker(host)
+        breaker.before_request()
+
+        def record_failure():
+            if host not in failed_hosts:
+                failed_hosts.add(host)
+                breaker.record_failure()
+
+        try:
+            response = self.pool_manager.request(
+                method, url, timeout=self.timeout, retries=FOLLOW_REDIRECTS_ONLY, pool_timeout=POOL_TIMEOUT, **kwargs
+            )
+        except Exception:
+            record_failure()
+            raise
+        if _is_failure(response.status):
+            record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _hedged(self, method: str, urls: List[str], failed_hosts: Set[str], **kwargs) -> urllib3.BaseHTTPResponse:
+        """Send the request to the first URL, and to the next mirror whenever the running ones are slow or failed."""
+        remaining = list(urls)
+        running: Dict[Future, str] = {}
+        last_error: Optional[Exception] = None
+
+        while remaining or running:
+            if remaining and not running:
+                # Nothing in flight: start the next URL right away
+                url = remaining.pop(0)
+                running[self._executor.submit(self._attempt, method, url, failed_hosts, **kwargs)] = url
+                continue
+
+            done, _ = wait(running, timeout=self.hedge_after if remaining else None, return_when=FIRST_COMPLETED)
+            if not done:
+                url = remaining.pop(0)
+                running[self._executor.submit(self._attempt, method, url, failed_hosts, **kwargs)] = url
+                continue
+
+            for future in done:
+                running.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if _is_failure(response.status) and (running or remaining):
+                    # Give the mirrors a chance before returning a server error
+                    last_error = urllib3.exceptions.HTTPError(f"HTTP {response.status} from {response.geturl()}")
+                    _discard(future)
+                    continue
+                for loser in running:
+                    loser.add_done_callback(_discard)
+                return response
+
+        raise last_error
+
+
+class ConnectionStats:
+    """Thread-safe counters of connections opened and requests sent per host."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._opened: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+
+    def record_open(self, host: str):
+        with self._lock:
+            self._opened[host] = self._opened.get(host, 0) + 1
+
+    def record_request(self, host: str):
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Return the connections opened, requests sent and requests served on a reused connection per host."""
+        with self._lock:
+            hosts = set(self._opened) | set(self._requests)
+            return {
+                host: {
+                    "opened": self._opened.get(host, 0),
+                    "requests": self._requests.get(host, 0),
+                    "reused": max(0, self._requests.get(host, 0) - self._opened.get(host, 0)),
+                }
+                for host in hosts
+            }
+
+    def reset(self):
+        with self._lock:
+            self._opened.clear()
+            self._requests.clear()
+
+
+connection_stats = ConnectionStats()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        connection_stats.record_open(self.host)
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        connection_stats.record_request(self.host)
+        super().request(*args, **kwargs)
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        connection_stats.record_open(self.host)
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        connection_stats.record_request(self.host)
+        super().request(*args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class KeepAlivePoolManager(urllib3.PoolManager):
+    """Pool manager sizing each host's keep-alive pool from HOST_POOL_SIZES.
+
+    Pools block when all connections to a host are in use, which caps the concurrency
+    per host; connections go back to the pool once a response is released.
+    """
+
+    def __init__(self, num_pools: int = 50, **connection_pool_kw):
+        connection_pool_kw.setdefault("maxsize", DEFAULT_POOL_SIZE)
+        connection_pool_kw.setdefault("block", True)
+        super().__init__(num_pools=num_pools, **connection_pool_kw)
+        self.pool_classes_by_scheme = {"http": _CountingHTTPConnectionPool, "https": _CountingHTTPSConnectionPool}
+
+    def connection_from_host(self, host, port=None, scheme="http", pool_kwargs=None):
+        pool_kwargs = {"maxsize": HOST_POOL_SIZES.get(host, DEFAULT_POOL_SIZE), **(pool_kwargs or {})}
+        return super().connection_from_host(host, port, scheme, pool_kwargs)
+
+
+def _permissive_pool_manager() -> urllib3.PoolManager:
+    # Create SSL context that's more permissive for scientific repositories
+    ssl_context = create_urllib3_context()
+    ssl_context.check_hostname = False
+    ssl_context.verify_mode = ssl.CERT_NONE
+    return KeepAlivePoolManager(
+        ssl_context=ssl_context,
+        cert_reqs='CERT_NONE',
+        assert_hostname=False
+    )
+
+
+# Paper downloads: permissive SSL and hedging to mirrors
+download_client = HttpClient(_permissive_pool_manager(), retries=2, backoff=1.0)
+# CORE API: no mirrors, short backoff instead of waiting up to a minute
+core_client = HttpClient(KeepAlivePoolManager(), retries=2, backoff=1.0, hedge_after=None)
@@ -0,0 +1,106 @@
+"""
+Lightweight judging of the agent's final answer.
+
+Instead of the whole conversation, the judge only sees the user query, the final answer
+and a compact digest of the evidence gathered, within a token budget. Cheap local checks
+can accept an answer without calling the LLM at all.
+"""
+
+import os
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# "light" judges from the query, answer and evidence digest, "full" from the whole conversation
+JUDGE_MODE = os.getenv("RESEARCH_AGENT_JUDGE_MODE", "light")
+JUDGE_EARLY_ACCEPT = os.getenv("RESEARCH_AGENT_JUDGE_EARLY_ACCEPT", "1") != "0"
+JUDGE_MAX_INPUT_TOKENS = int(os.getenv("RESEARCH_AGENT_JUDGE_MAX_INPUT_TOKENS", "4000"))
+# Rough conversion used to enforce the token budget without a tokenizer
+CHARS_PER_TOKEN = 4
+
+MIN_ANSWER_CHARS = 300
+MIN_QUERY_TERM_COVERAGE = 0.6
+
+_URL_PATTERN = re.compile(r"https?://[^\s'\"<>()\[\]]+")
+# DOIs and arXiv identifiers
+_ID_PATTERN = re.compile(r"\b10\.\d{4,9}/[^\s'\"<>()\[\]]+|\b\d{4}\.\d{4,5}\b")
+_STOPWORDS = {
+    "about", "after", "also", "and", "are", "can", "could", "does", "download", "find", "findings",
+    "for", "from", "have", "how", "into", "latest", "paper", "papers", "please", "recent", "research",
+    "should", "summarize", "tell", "that", "the", "their", "there", "these", "this", "what", "when",
+    "where", "which", "while", "who", "why", "with", "would", "you", "your",
+}
+
+
+def query_terms(query: str) -> set:
+    """Return the content words of a query."""
+    query = re.sub(r"https?://\S+", " ", query.lower())
+    return {word for word in re.findall(r"[a-z][a-z0-9\-]{2,}", query) if word not in _STOPWORDS}
+
+
+def cited_references(text: str) -> List[str]:
+    """Return the URLs, DOIs and arXiv ids cited in a text."""
+    references = [url.rstrip(".,;:") for url in _URL_PATTERN.findall(text)]
+    references += [ref.rstrip(".,;:") for ref in _ID_PATTERN.findall(_URL_PATTERN.sub(" ", text))]
+    return references
+
+
+def reference_keys(reference: str) -> set:
+    """Keys matching a reference to the same source: the URL without scheme and trailing slash,
+    and the DOIs and arXiv ids it contains (so an arXiv abstract and PDF URL match)."""
+    keys = {re.sub(r"^https?://(www\.)?", "", reference.lower()).rstrip("/")}
+    keys.update(ref.lower().rstrip(".,;:") for ref in _ID_PATTERN.findall(reference))
+    return keys
+
+
+def local_answer_checks(query: str, answer: str, evidence: Iterable[str] = ()) -> Tuple[Optional[bool], Optional[str]]:
+    """Run cheap checks on the final answer.
+
+    An answer is only accepted without the LLM judge if it is long enough, covers the
+    content words of the query, and cites sources that all come from the tool results.
+
+    Args:
+        query: The user query.
+        answer: The final answer.
+        evidence: The URLs and ids of the sources retrieved by successful tool calls.
+
+    Returns:
+        (True, None) if the answer can be accepted without the LLM judge,
+        (False, feedback) if it must be rejected, and (None, None) if the LLM judge must decide.
+    """
+    if not answer or not answer.strip():
+        return False, "The answer is empty. Provide a complete answer to the user query."
+    if not JUDGE_EARLY_ACCEPT:
+        return None, None
+
+    terms = query_terms(query)
+    citations = cited_references(answer)
+    # Without content words in the query, an answer merely echoing its URL would pass
+    if len(answer.strip()) < MIN_ANSWER_CHARS or not terms or not citations:
+        return None, None
+    known_sources = set().union(*(reference_keys(source) for source in evidence))
+    if not all(reference_keys(citation) & known_sources for citation in citations):
+        return None, None
+    answer_lower = answer.lower()
+    coverage = sum(term in answer_lower for term in terms) / len(terms)
+    if coverage < MIN_QUERY_TERM_COVERAGE:
+        return None, None
+    return True, None
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "\n[... truncated ...]"
+
+
+def build_judge_input(query: str, answer: str, evidence_digest: str, max_tokens: int = JUDGE_MAX_INPUT_TOKENS) -> str:
+    """Build the judge input from the query, the answer and the evidence digest, within `max_tokens`."""
+    budget = max_tokens * CHARS_PER_TOKEN
+    query = _truncate(query, budget // 8)
+    evidence_digest = _truncate(evidence_digest or "No tool was used.", budget // 4)
+    answer = _truncate(answer, budget - len(query) - len(evidence_digest))
+    return (
+        f"# USER QUERY\n{query}\n\n"
+        f"# EVIDENCE GATHERED\n{evidence_digest}\n\n"
+        f"# FINAL ANSWER\n{answer}"
+    )
@@ -0,0 +1,133 @@
+"""
+Per-node model configuration for the research workflow.
+
+Every node of the workflow (decision making, planning, agent and judge) can use
+its own model, temperature and output token limit. The defaults below can be
+overridden with environment variables, e.g.:
+
+    RESEARCH_AGENT_JUDGE_MODEL=gemini-2.0-flash-lite
+    RESEARCH_AGENT_JUDGE_TEMPERATURE=0
+    RESEARCH_AGENT_JUDGE_MAX_OUTPUT_TOKENS=512
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.language_models import BaseChatModel
+
+from scientific_research_agent.metrics import latency_metrics
+from scientific_research_agent.pydantic_models import NodeModelConfig
+
+
+# Cheap, latency-sensitive calls (routing and judging) use the smaller tier,
+# the planning and tool calling nodes keep the stronger model.
+DEFAULT_NODE_MODELS: Dict[str, NodeModelConfig] = {
+    "decision_making": NodeModelConfig(model="gemini-2.0-flash-lite", temperature=0.0, max_output_tokens=512),
+    "planning": NodeModelConfig(model="gemini-2.0-flash", temperature=0.7, max_output_tokens=2048),
+    "structured_planning": NodeModelConfig(model="gemini-2.0-flash", temperature=0.7, max_output_tokens=2048),
+    "agent": NodeModelConfig(model="gemini-2.0-flash", temperature=0.7),
+    "judge": NodeModelConfig(model="gemini-2.0-flash-lite", temperature=0.0, max_output_tokens=512),
+    "summarize_paper": NodeModelConfig(model="gemini-2.0-flash-lite", temperature=0.2, max_output_tokens=1024),
+    "synthesize_summaries": NodeModelConfig(model="gemini-2.0-flash", temperature=0.2, max_output_tokens=2048),
+}
+
+ENV_PREFIX = "RESEARCH_AGENT"
+
+
+def load_node_config(node: str) -> NodeModelConfig:
+    """Load the model configuration of a node, applying environment overrides to the defaults.
+
+    Args:
+        node: The name of the workflow node.
+
+    Returns:
+        NodeModelConfig: The configuration to use for the node.
+    """
+    default = DEFAULT_NODE_MODELS.get(node, DEFAULT_NODE_MODELS["agent"])
+    prefix = f"{ENV_PREFIX}_{node.upper()}"
+
+    values = default.model_dump()
+    if os.getenv(f"{prefix}_MODEL"):
+        values["model"] = os.getenv(f"{prefix}_MODEL")
+    if os.getenv(f"{prefix}_TEMPERATURE"):
+        values["temperature"] = float(os.getenv(f"{prefix}_TEMPERATURE"))
+    max_tokens = os.getenv(f"{prefix}_MAX_OUTPUT_TOKENS")
+    if max_tokens:
+        # "0" or "none" removes the output cap
+        values["max_output_tokens"] = None if max_tokens.lower() in ("0", "none") else int(max_tokens)
+    return NodeModelConfig(**values)
+
+
+def gemini_llm_factory(config: NodeModelConfig) -> BaseChatModel:
+    """Default factory building a Gemini chat model from a node configuration."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    kwargs = {"model": config.model, "temperature": config.temperature}
+    if config.max_output_tokens is not None:
+        kwargs["max_output_tokens"] = config.max_output_tokens
+    return ChatGoogleGenerativeAI(**kwargs)
+
+
+class NodeLLMRegistry:
+    """Lazily builds, caches and times the LLM used by each workflow node.
+
+    Args:
+        bindings: Mapping from node name to a function wrapping the base chat model,
+            e.g. to add structured output or bind tools.
+        factory: Function building a chat model from a NodeModelConfig. Swap it for
+            a local fake model in tests.
+    """
+
+    def __init__(
+        self,
+        bindings: Dict[str, Callable[[BaseChatModel], Any]],
+        factory: Optional[Callable[[NodeModelConfig], BaseChatModel]] = None,
+    ):
+        self.bindings = bindings
+        self.factory = factory or gemini_llm_factory
+        self.configs: Dict[str, NodeModelConfig] = {}
+        self._llms: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        factory: Optional[Callable[[NodeModelConfig], BaseChatModel]] = None,
+        configs: Optional[Dict[str, NodeModelConfig]] = None,
+    ):
+        """Replace the model factory and/or node configurations and drop cached models.
+
+        Args:
+            factory: New factory, or None to restore the default Gemini factory.
+            configs: Per-node configurations overriding the environment/defaults.
+        """
+        with self._lock:
+            self.factory = factory or gemini_llm_factory
+            self.configs = dict(configs or {})
+            self._llms.clear()
+
+    def get_config(self, node: str) -> NodeModelConfig:
+        """Return the model configuration used by a node."""
+        return self.configs.get(node) or load_node_config(node)
+
+    def get(self, node: str) -> Any:
+        """Return the (bound) LLM of a node, building it on first use."""
+        llm = self._llms.get(node)
+        if llm is not None:
+            return llm
+        with self._lock:
+            if node not in self._llms:
+                base_llm = self.factory(self.get_config(node))
+                bind = self.bindings.get(node)
+                self._llms[node] = bind(base_llm) if bind else base_llm
+            return self._llms[node]
+
+    def invoke(self, node: str, messages: list) -> Any:
+        """Invoke the LLM of a node and record its latency under the node's model tier."""
+        llm = self.get(node)
+        start = time.perf_counter()
+        try:
+            return llm.invoke(messages)
+        finally:
+            latency_metrics.record(node, self.get_config(node).model, time.perf_counter() - start)
@@ -0,0 +1,60 @@
+"""
+In-process metrics for the research workflow.
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Tuple
+
+
+class LatencyMetrics:
+    """Thread-safe latency recorder keyed by workflow node and model tier."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._samples: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def record(self, node: str, model: str, seconds: float):
+        """Record the latency of a single call made by `node` using `model`."""
+        with self._lock:
+            self._samples[(node, model)].append(seconds)
+
+    def summary(self, group_by: str = "model") -> Dict[str, dict]:
+        """Summarize recorded latencies.
+
+        Args:
+            group_by: "model" to compare model tiers, "node" to compare workflow nodes.
+
+        Returns:
+            A dictionary mapping each group to its count, mean, p50, p95 and max latency in seconds.
+        """
+        if group_by not in ("model", "node"):
+            raise ValueError(f"group_by must be 'model' or 'node', got: {group_by}")
+        index = 1 if group_by == "model" else 0
+
+        grouped = defaultdict(list)
+        with self._lock:
+            for key, samples in self._samples.items():
+                grouped[key[index]].extend(samples)
+
+        summary = {}
+        for group, samples in grouped.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            summary[group] = {
+                "count": len(ordered),
+                "mean_s": sum(ordered) / len(ordered),
+                "p50_s": ordered[int(0.50 * (len(ordered) - 1))],
+                "p95_s": ordered[int(0.95 * (len(ordered) - 1))],
+                "max_s": ordered[-1],
+            }
+        return summary
+
+    def reset(self):
+        """Drop all recorded samples."""
+        with self._lock:
+            self._samples.clear()
+
+
+latency_metrics = LatencyMetrics()
@@ -0,0 +1,223 @@
+"""
+Speculative work started ahead of the agent to take network hops off the critical path.
+"""
+
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from scientific_research_agent.agent_tools import (
+    DownloadAborted,
+    cached_search,
+    fetch_paper,
+    normalize_search_query,
+    paper_cache,
+    paper_flight,
+    truncate_search_results,
+)
+from scientific_research_agent.core_api_wrapper import SEARCH_RESULTS_SEPARATOR
+from scientific_research_agent.http_client import is_host_available
+
+
+SPECULATIVE_SEARCH_ENABLED = os.getenv("RESEARCH_AGENT_SPECULATIVE_SEARCH", "1") != "0"
+# Fetch a few more papers than the agent's default so most first searches can be served by slicing
+SPECULATIVE_MAX_PAPERS = 5
+
+PAPER_PREFETCH_ENABLED = os.getenv("RESEARCH_AGENT_PAPER_PREFETCH", "0") == "1"
+PAPER_PREFETCH_TOP_N = int(os.getenv("RESEARCH_AGENT_PAPER_PREFETCH_TOP_N", "2"))
+PAPER_PREFETCH_CONCURRENCY = int(os.getenv("RESEARCH_AGENT_PAPER_PREFETCH_CONCURRENCY", "2"))
+PAPER_PREFETCH_BYTE_BUDGET = int(os.getenv("RESEARCH_AGENT_PAPER_PREFETCH_BYTE_BUDGET", str(50 * 1024 * 1024)))
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+_PAPER_URL_PATTERN = re.compile(r"https?://[^\s'\",\]]+")
+
+
+class SpeculativeSearch:
+    """Runs a CORE search for the user query while the planning node writes its plan.
+
+    The result is handed to the agent's first `search-paper` call if the queries match,
+    and otherwise discarded. Either way it warms the search cache.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-search")
+        self._pending: Dict[str, Tuple[str, Future]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, run_id: str, query: str) -> bool:
+        """Start a speculative search for a run.
+
+        Queries pointing to a specific URL are skipped since the agent will download rather than search.
+
+        Returns:
+            bool: Whether a speculative search was started.
+        """
+        if not SPECULATIVE_SEARCH_ENABLED or not query or _URL_PATTERN.search(query):
+            return False
+        with self._lock:
+            if run_id in self._pending:
+                return False
+            future = self._executor.submit(cached_search, query, SPECULATIVE_MAX_PAPERS)
+            self._pending[run_id] = (normalize_search_query(query), future)
+        return True
+
+    def claim(self, run_id: str, query: str, max_papers: int = 1, timeout: Optional[float] = None) -> Optional[str]:
+        """Return the speculative result for the agent's search, or None if it does not match.
+
+        The speculation of a run is consumed by the first claim, matching or not.
+        """
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return None
+
+        speculative_query, future = pending
+        if speculative_query != normalize_search_query(query) or max_papers > SPECULATIVE_MAX_PAPERS:
+            future.cancel()
+            self.misses += 1
+            return None
+
+        try:
+            papers = future.result(timeout=timeout)
+        except Exception as e:
+            print(f"Speculative search failed, falling back to a regular search: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return truncate_search_results(papers, max_papers)
+
+    def discard(self, run_id: str):
+        """Drop the speculation of a run. Searches that already started finish in the background."""
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is not None:
+            pending[1].cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "hits": self.hits, "misses": self.misses}
+
+
+speculative_search = SpeculativeSearch()
+
+
+def extract_candidate_urls(papers: str, top_n: int) -> List[str]:
+    """Extract the first paper URL of each of the top `top_n` results of a CORE search output."""
+    urls = []
+    for doc in papers.split(SEARCH_RESULTS_SEPARATOR):
+        for line in doc.splitlines():
+            if line.startswith("* Paper URLs:"):
+                match = _PAPER_URL_PATTERN.search(line)
+                if match and match.group(0) not in urls:
+                    urls.append(match.group(0))
+                break
+        if len(urls) >= top_n:
+            break
+    return urls
+
+
+class PaperPrefetcher:
+    """Downloads and extracts candidate papers from search results in the background.
+
+    Finished papers land in `paper_cache`, and in-flight downloads are registered in
+    `paper_flight` so that a `download-paper` call for the same URL joins them.
+
+    Args:
+        max_workers: Maximum number of concurrent prefetches across all runs.
+        byte_budget: Maximum number of bytes prefetched per run. Each download reserves
+            its share (`byte_budget / max_workers`) before starting, so concurrent
+            downloads cannot overrun the budget together.
+    """
+
+    def __init__(self, max_workers: int = PAPER_PREFETCH_CONCURRENCY, byte_budget: int = PAPER_PREFETCH_BYTE_BUDGET):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="paper-prefetch")
+        self.byte_budget = byte_budget
+        self.fetch_byte_limit = max(byte_budget // max_workers, 1)
+        self._runs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.aborted = 0
+        self.bytes_fetched = 0
+
+    def prefetch(self, run_id: str, papers: str, top_n: int = PAPER_PREFETCH_TOP_N) -> List[str]:
+        """Start prefetching the top candidates of a search output for a run.
+
+        Returns:
+            List[str]: The URLs whose prefetch was started.
+        """
+        if not PAPER_PREFETCH_ENABLED or not papers or papers.startswith("Error"):
+            return []
+
+        started = []
+        for url in extract_candidate_urls(papers, top_n):
+            with self._lock:
+                run = self._runs.setdefault(
+                    run_id, {"remaining": self.byte_budget, "cancel": threading.Event(), "futures": []}
+                )
+                if run["remaining"] <= 0 or run["cancel"].is_set():
+                    break
+            if url in paper_cache or paper_flight.get(url) is not None or not is_host_available(url):
+                continue
+            future = paper_flight.submit(url, self._fetch, run_id, url, executor=self._executor)
+            with self._lock:
+                run["futures"].append(future)
+            started.append(url)
+        return started
+
+    def _fetch(self, run_id: str, url: str) -> str:
+        with self._lock:
+            run = self._runs.get(run_id)
+            reserved = min(run["remaining"], self.fetch_byte_limit) if run else 0
+            if run is not None:
+                run["remaining"] -= reserved
+        # Bytes charged to the run: all of the reservation unless the download completes or fails early
+        used = reserved
+        try:
+            if run is None or reserved <= 0 or run["cancel"].is_set():
+                raise DownloadAborted("Error: Prefetch budget exhausted or run finished.")
+            text, used = fetch_paper(url, max_bytes=reserved, cancel_event=run["cancel"])
+            with self._lock:
+                self.bytes_fetched += used
+                self.completed += 1
+            paper_cache.set(url, text)
+            return text
+        except DownloadAborted:
+            with self._lock:
+                self.aborted += 1
+            raise
+        except Exception:
+            # The paper could not be downloaded or read, nothing large was received
+            used = 0
+            raise
+        finally:
+            if run is not None:
+                # Give back the part of the reservation the download did not use
+                with self._lock:
+                    run["remaining"] += reserved - used
+
+    def cancel_run(self, run_id: str):
+        """Cancel the queued prefetches of a run and abort its running downloads."""
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        run["cancel"].set()
+        for future in run["futures"]:
+            future.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_runs": len(self._runs),
+                "completed": self.completed,
+                "aborted": self.aborted,
+                "bytes_fetched": self.bytes_fetched,
+            }
+
+
+paper_prefetcher = PaperPrefetcher()
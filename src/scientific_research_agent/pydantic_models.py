@@ -1,4 +1,5 @@
-from typing import Annotated, Optional, Sequence, TypedDict, Dict
+import operator
+from typing import Annotated, List, Literal, Optional, Sequence, TypedDict, Dict
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
@@ -15,11 +16,36 @@ class JudgeOutput(BaseModel):
     is_good_answer: bool = Field(description="Whether the answer is good or not.")
     feedback: Optional[str] = Field(default=None, description="Detailed feedback about why the answer is not good. It should be None if the answer is good.")
 
+class PlannedStep(BaseModel):
+    tool: Literal["search-paper", "download-paper"] = Field(description="The tool to call.")
+    query: Optional[str] = Field(default=None, description="The CORE search query, for search-paper steps.")
+    max_papers: int = Field(default=1, description="The maximum number of papers to return, for search-paper steps.", ge=1, le=10)
+    url: Optional[str] = Field(default=None, description="The URL of the paper, for download-paper steps.")
+
+    def tool_args(self) -> dict:
+        """Return the arguments of the tool call."""
+        if self.tool == "search-paper":
+            return {"query": self.query or "", "max_papers": self.max_papers}
+        return {"url": self.url or ""}
+
+class StructuredPlan(BaseModel):
+    plan: str = Field(description="The step by step plan to answer the user query, in the plan format.")
+    steps: List[PlannedStep] = Field(default_factory=list, description="The search-paper and download-paper calls of the plan whose arguments are already fully known and that do not depend on each other. They are executed in parallel before the agent starts.")
+
+class NodeModelConfig(BaseModel):
+    model: str = Field(description="The name of the chat model used by the workflow node.")
+    temperature: float = Field(default=0.7, description="The sampling temperature of the model.", ge=0.0, le=2.0)
+    max_output_tokens: Optional[int] = Field(default=None, description="The maximum number of tokens the model may generate. None means no explicit limit.", ge=1)
+
 class AgentState(TypedDict):
     """The state of the agent during the paper research process"""
+    run_id: str  # Identifies the run for speculative/background work
+    session_id: Optional[str]  # Identifies the conversation, whose earlier tool results are reused
     requires_research: bool = False
     num_papers_searched: int = 0
     is_good_answer: bool = False
     num_planning_cycles: int = 0  # Track planning-agent-judge cycles
+    planned_steps: List[PlannedStep]  # Independent tool calls of the structured plan
+    tool_results: Annotated[Dict[str, dict], operator.or_]  # Index of the tool results of the run
     messages: Annotated[Sequence[BaseMessage], add_messages]
     
\ No newline at end of file
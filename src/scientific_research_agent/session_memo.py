@@ -0,0 +1,120 @@
+"""
+Memo of the tool results of a conversation, shared by its successive queries.
+
+Each query runs the workflow from a fresh state, so without the memo a follow-up question
+about the same paper downloads and parses it again. Results are kept per session (one
+conversation of a user), and evicted by age and by the total size of each session.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from scientific_research_agent.tool_index import describe_tool_result, tool_result_key
+
+
+SESSION_MEMO_TTL = float(os.getenv("RESEARCH_AGENT_SESSION_MEMO_TTL", str(2 * 60 * 60)))
+# Characters of tool results kept per session
+SESSION_MEMO_MAX_CHARS = int(os.getenv("RESEARCH_AGENT_SESSION_MEMO_MAX_CHARS", "2000000"))
+SESSION_MEMO_MAX_SESSIONS = int(os.getenv("RESEARCH_AGENT_SESSION_MEMO_MAX_SESSIONS", "128"))
+
+
+class SessionToolMemo:
+    """Thread-safe memo of successful tool results, per session.
+
+    Within a session, entries are kept in least recently used order: the oldest are evicted
+    when the session exceeds `max_chars`, and entries older than `ttl_seconds` expire. The
+    least recently used sessions are dropped beyond `max_sessions`.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = SESSION_MEMO_TTL,
+        max_chars: int = SESSION_MEMO_MAX_CHARS,
+        max_sessions: int = SESSION_MEMO_MAX_SESSIONS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _session(self, session_id: str) -> "OrderedDict":
+        """Return the live entries of a session, dropping the expired ones. Call with the lock held."""
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            return OrderedDict()
+        self._sessions.move_to_end(session_id)
+        expired_before = time.monotonic() - self.ttl_seconds
+        for key in [k for k, e in entries.items() if e["stored_at"] < expired_before]:
+            del entries[key]
+        return entries
+
+    def get(self, session_id: Optional[str], name: str, args: dict) -> Optional[str]:
+        """Return the result of an identical earlier tool call of the session, if any."""
+        key = tool_result_key(name, args)
+        if not session_id or key is None:
+            return None
+        with self._lock:
+            entries = self._session(session_id)
+            entry = entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, session_id: Optional[str], name: str, args: dict, result: str):
+        """Remember a successful tool result for the session."""
+        key = tool_result_key(name, args)
+        if not session_id or key is None or result.startswith("Error") or len(result) > self.max_chars:
+            return
+        with self._lock:
+            entries = self._sessions.setdefault(session_id, OrderedDict())
+            self._sessions.move_to_end(session_id)
+            entries[key] = {"tool": name, "args": args, "result": result, "stored_at": time.monotonic()}
+            entries.move_to_end(key)
+            size = sum(len(e["result"]) for e in entries.values())
+            while size > self.max_chars:
+                _, evicted = entries.popitem(last=False)
+                size -= len(evicted["result"])
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def digest(self, session_id: Optional[str]) -> str:
+        """Describe the tool results available in a session, one line per call."""
+        if not session_id:
+            return ""
+        with self._lock:
+            entries = list(self._session(session_id).values())
+        lines = []
+        for entry in entries:
+            args = ", ".join(f"{k}={v!r}" for k, v in entry["args"].items())
+            lines.append(f"- {entry['tool']}({args}): {describe_tool_result(entry['tool'], entry['result'])}")
+        return "\n".join(lines)
+
+    def clear(self, session_id: Optional[str] = None):
+        """Forget a session, or all of them."""
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "entries": sum(len(entries) for entries in self._sessions.values()),
+                "chars": sum(len(e["result"]) for entries in self._sessions.values() for e in entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+session_memo = SessionToolMemo()
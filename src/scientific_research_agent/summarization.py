@@ -0,0 +1,175 @@
+"""
+Map-reduce summarization of the papers downloaded during a research run.
+
+Each paper is summarized against the user query in parallel (map, using LangGraph's
+`Send` fan-out) from a bounded slice of its text, then the summaries are synthesized
+into a single overview (reduce). The agent then reasons over the summaries instead of
+the raw paper texts.
+"""
+
+import json
+import operator
+import os
+from typing import Annotated, List, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.constants import Send
+from langgraph.graph import StateGraph, START, END
+
+from scientific_research_agent.llm_config import NodeLLMRegistry
+from scientific_research_agent.prompts import paper_summary_prompt, summary_synthesis_prompt
+
+
+# Papers downloaded in a run before the agent switches to summaries
+SUMMARIZE_MIN_PAPERS = int(os.getenv("RESEARCH_AGENT_SUMMARIZE_MIN_PAPERS", "2"))
+# Characters of a paper sent to the map step: the beginning and the end (conclusions)
+MAX_PAPER_CHARS = int(os.getenv("RESEARCH_AGENT_SUMMARIZE_MAX_CHARS", "48000"))
+PAPER_TAIL_CHARS = MAX_PAPER_CHARS // 4
+
+SUMMARY_MARKER = "paper_summary"
+
+
+class PaperSummaryState(TypedDict):
+    """The state of the summarization subgraph"""
+    question: str
+    papers: List[dict]  # {"id", "source", "text"}
+    summaries: Annotated[list, operator.add]  # {"id", "source", "summary"}
+    synthesis: str
+
+
+def truncate_paper(text: str, max_chars: int = MAX_PAPER_CHARS) -> str:
+    """Bound the size of a paper by keeping its beginning and its end."""
+    if len(text) <= max_chars:
+        return text
+    head = max_chars - PAPER_TAIL_CHARS
+    return text[:head] + "\n[... truncated ...]\n" + text[-PAPER_TAIL_CHARS:]
+
+
+def build_summarization_graph(llms: NodeLLMRegistry):
+    """Build the map-reduce summarization subgraph.
+
+    Args:
+        llms: The registry providing the `summarize_paper` and `synthesize_summaries` models.
+
+    Returns:
+        The compiled subgraph, taking a PaperSummaryState as input.
+    """
+
+    def fan_out_papers(state: PaperSummaryState):
+        """Send each paper to its own summarization task."""
+        return [
+            Send("summarize_paper", {"question": state["question"], "paper": paper})
+            for paper in state["papers"]
+        ]
+
+    def summarize_paper(state: dict):
+        """Summarize one paper with respect to the user query."""
+        paper = state["paper"]
+        messages = [
+            SystemMessage(content=paper_summary_prompt),
+            HumanMessage(content=f"User query: {state['question']}\n\nSource: {paper['source']}\n\nPaper:\n{truncate_paper(paper['text'])}"),
+        ]
+        try:
+            summary = llms.invoke("summarize_paper", messages).content
+        except Exception as e:
+            print(f"Error in summarize_paper: {e}")
+            summary = f"The paper could not be summarized ({e}). Beginning of the paper:\n{paper['text'][:2000]}"
+        return {"summaries": [{"id": paper["id"], "source": paper["source"], "summary": summary}]}
+
+    def synthesize_summaries(state: PaperSummaryState):
+        """Combine all the paper summaries into one overview."""
+        summaries = "\n\n".join(f"Source: {s['source']}\n{s['summary']}" for s in state["summaries"])
+        messages = [
+            SystemMessage(content=summary_synthesis_prompt),
+            HumanMessage(content=f"User query: {state['question']}\n\nPaper summaries:\n\n{summaries}"),
+        ]
+        try:
+            return {"synthesis": llms.invoke("synthesize_summaries", messages).content}
+        except Exception as e:
+            print(f"Error in synthesize_summaries: {e}")
+            return {"synthesis": summaries}
+
+    graph = StateGraph(PaperSummaryState)
+    graph.add_node("summarize_paper", summarize_paper)
+    graph.add_node("synthesize_summaries", synthesize_summaries)
+    graph.add_conditional_edges(START, fan_out_papers, ["summarize_paper"])
+    graph.add_edge("summarize_paper", "synthesize_summaries")
+    graph.add_edge("synthesize_summaries", END)
+    return graph.compile()
+
+
+def _tool_text(message: ToolMessage) -> str:
+    """Return the text of a tool result, which the tools node stores JSON encoded."""
+    try:
+        return str(json.loads(message.content))
+    except (TypeError, ValueError):
+        return str(message.content)
+
+
+def _downloaded_papers(messages: List[BaseMessage]) -> List[ToolMessage]:
+    """Return the successful download-paper results of the conversation."""
+    return [
+        message for message in messages
+        if isinstance(message, ToolMessage)
+        and message.name == "download-paper"
+        and not _tool_text(message).startswith("Error")
+    ]
+
+
+def _paper_sources(messages: List[BaseMessage]) -> dict:
+    """Map each tool call id to the URL the agent asked to download."""
+    return {
+        tool_call["id"]: tool_call["args"].get("url", "unknown source")
+        for message in messages
+        if isinstance(message, AIMessage)
+        for tool_call in message.tool_calls
+    }
+
+
+def needs_summarization(messages: List[BaseMessage]) -> bool:
+    """Whether enough papers were downloaded and some of them are not summarized yet."""
+    papers = _downloaded_papers(messages)
+    return len(papers) >= SUMMARIZE_MIN_PAPERS and any(
+        not p.additional_kwargs.get(SUMMARY_MARKER) for p in papers
+    )
+
+
+def summarize_downloaded_papers(graph, messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Summarize the raw papers of a conversation with the summarization subgraph.
+
+    Returns:
+        The download results rewritten with their summary (same message ids, so they
+        replace the raw texts in the agent state), followed by the synthesis message.
+    """
+    question = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+    sources = _paper_sources(messages)
+    papers, previous_summaries = [], []
+    for message in _downloaded_papers(messages):
+        source = sources.get(message.tool_call_id, "unknown source")
+        if message.additional_kwargs.get(SUMMARY_MARKER):
+            summary = {"id": message.id, "source": source, "summary": _tool_text(message)}
+            # A repeated download reuses the summary of the first one
+            if not any(s["source"] == source and s["summary"] == summary["summary"] for s in previous_summaries):
+                previous_summaries.append(summary)
+        else:
+            papers.append({"id": message.id, "source": source, "text": _tool_text(message)})
+
+    result = graph.invoke({"question": question, "papers": papers, "summaries": previous_summaries})
+
+    new_ids = {paper["id"] for paper in papers}
+    outputs = []
+    for message in _downloaded_papers(messages):
+        if message.id not in new_ids:
+            continue
+        summary = next(s["summary"] for s in result["summaries"] if s["id"] == message.id)
+        outputs.append(
+            ToolMessage(
+                id=message.id,
+                content=json.dumps(summary),
+                name=message.name,
+                tool_call_id=message.tool_call_id,
+                additional_kwargs={SUMMARY_MARKER: True},
+            )
+        )
+    outputs.append(AIMessage(content=f"Synthesis of the papers downloaded so far:\n\n{result['synthesis']}"))
+    return outputs
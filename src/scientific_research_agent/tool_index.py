@@ -0,0 +1,97 @@
+"""
+Index of the tool results gathered during a research run.
+
+Results are keyed by tool name and normalized arguments, so that repeated calls in later
+planning cycles can be answered from the conversation, and the replanner can be given a
+compact digest of what was already retrieved instead of the full history.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from scientific_research_agent.agent_tools import normalize_search_query
+from scientific_research_agent.judge import cited_references
+
+
+# Tools whose results are indexed and reused
+INDEXED_TOOLS = ("search-paper", "download-paper")
+
+_TITLE_PATTERN = re.compile(r"^\* Title: (.*?),?$", re.MULTILINE)
+
+
+def tool_result_key(name: str, args: dict) -> Optional[str]:
+    """Return the index key of a tool call, or None if the tool is not indexed."""
+    if name not in INDEXED_TOOLS:
+        return None
+    if name == "search-paper":
+        args = {"query": normalize_search_query(args.get("query", "")), "max_papers": int(args.get("max_papers", 1))}
+    else:
+        args = {"url": args.get("url", "").strip()}
+    return f"{name}:{json.dumps(args, sort_keys=True)}"
+
+
+def describe_tool_result(name: str, result: str) -> str:
+    """Describe a tool result in one line for the digest."""
+    if result.startswith("Error"):
+        return f"failed: {result[:150]}"
+    if name == "search-paper":
+        titles = _TITLE_PATTERN.findall(result)
+        if not titles:
+            return "no relevant results"
+        return f"{len(titles)} result(s): " + "; ".join(t[:100] for t in titles)
+    first_line = next((line for line in result.splitlines() if line.strip()), "")
+    return f"downloaded ({len(result)} characters), starting with: {first_line[:100]}"
+
+
+def result_sources(name: str, args: dict, result: str) -> List[str]:
+    """The URLs and ids of the sources a successful tool result provides."""
+    if result.startswith("Error"):
+        return []
+    if name == "search-paper":
+        return sorted(set(cited_references(result)))
+    if name == "download-paper":
+        # Only the paper itself, not the references it cites
+        return [args.get("url", "").strip()]
+    return []
+
+
+def index_entry(name: str, args: dict, message_id: str, result: str) -> dict:
+    """Build the index entry of a tool result."""
+    return {
+        "tool": name,
+        "args": args,
+        "message_id": message_id,
+        "error": result.startswith("Error"),
+        "description": describe_tool_result(name, result),
+        "sources": result_sources(name, args, result),
+    }
+
+
+def lookup_tool_result(tool_results: dict, messages: List[BaseMessage], name: str, args: dict) -> Optional[BaseMessage]:
+    """Return the message of an earlier successful identical tool call, if it is still in the conversation.
+
+    The message may have been rewritten since (e.g. a paper replaced by its summary), its
+    `additional_kwargs` tell how.
+    """
+    key = tool_result_key(name, args)
+    entry = (tool_results or {}).get(key) if key else None
+    if entry is None or entry["error"]:
+        return None
+    return next((m for m in messages if m.id == entry["message_id"]), None)
+
+
+def evidence_sources(tool_results: dict) -> List[str]:
+    """The URLs and ids of the sources gathered by the successful tool calls so far."""
+    return [source for entry in (tool_results or {}).values() for source in entry.get("sources", [])]
+
+
+def format_tool_digest(tool_results: dict) -> str:
+    """Format a compact digest of the tool results gathered so far."""
+    lines = []
+    for entry in (tool_results or {}).values():
+        args = ", ".join(f"{k}={v!r}" for k, v in entry["args"].items())
+        lines.append(f"- {entry['tool']}({args}): {entry['description']}")
+    return "\n".join(lines)
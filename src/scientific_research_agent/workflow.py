@@ -1,6 +1,10 @@
 import json
 import re
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 import warnings
 import logging
 
@@ -16,29 +20,61 @@ warnings.filterwarnings("ignore", message=".*All log messages before absl::Initi
 logging.getLogger("grpc").setLevel(logging.ERROR)
 logging.getLogger("google").setLevel(logging.ERROR)
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, AIMessage, ToolMessage, HumanMessage
 from langgraph.graph import StateGraph, START, END
 
 from scientific_research_agent.prompts import (
     decision_making_prompt,
     judge_prompt,
+    light_judge_prompt,
     planning_prompt,
+    structured_planning_prompt,
+    replanning_context,
+    session_context,
     agent_prompt,
 )
-from scientific_research_agent.pydantic_models import DecisionMakingOutput, JudgeOutput
+from scientific_research_agent.pydantic_models import DecisionMakingOutput, JudgeOutput, StructuredPlan
 from scientific_research_agent.agent_tools import (
     tools,
     format_tool_description,
     tools_dict,
 )
 from scientific_research_agent.pydantic_models import AgentState
+from scientific_research_agent.llm_config import NodeLLMRegistry
+from scientific_research_agent.judge import JUDGE_MODE, build_judge_input, local_answer_checks
+from scientific_research_agent.metrics import latency_metrics
+from scientific_research_agent.prefetch import paper_prefetcher, speculative_search
+from scientific_research_agent.session_memo import session_memo
+from scientific_research_agent.tool_index import (
+    evidence_sources,
+    format_tool_digest,
+    index_entry,
+    lookup_tool_result,
+    tool_result_key,
+)
+from scientific_research_agent.summarization import (
+    build_summarization_graph,
+    needs_summarization,
+    summarize_downloaded_papers,
+)
 
 
-base_llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7)
-decision_making_llm = base_llm.with_structured_output(DecisionMakingOutput)
-agent_llm = base_llm.bind_tools(tools)
-judge_llm = base_llm.with_structured_output(JudgeOutput)
+# Each node gets its own model tier (see llm_config.py). Call
+# `node_llms.configure(factory=...)` to swap in a fake model for tests.
+node_llms = NodeLLMRegistry(
+    bindings={
+        "decision_making": lambda llm: llm.with_structured_output(DecisionMakingOutput),
+        "planning": lambda llm: llm,
+        "structured_planning": lambda llm: llm.with_structured_output(StructuredPlan),
+        "agent": lambda llm: llm.bind_tools(tools),
+        "judge": lambda llm: llm.with_structured_output(JudgeOutput),
+    }
+)
+summarization_graph = build_summarization_graph(node_llms)
+
+# Let the planner emit the independent tool calls of its plan, which run in parallel
+STRUCTURED_PLAN_ENABLED = os.getenv("RESEARCH_AGENT_STRUCTURED_PLAN", "1") != "0"
+tool_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="research-tools")
 
 
 # Decision making node
@@ -46,8 +82,6 @@ def decision_making_node(state: AgentState):
     """
     Enter point of the workflow. Based on the user query, the model can either respond directly or trigger the research workflow.
     """
-    #print("#" * 50)
-    #print("Decision making node input:", state["messages"][-1])
     
     # Validate input
     if not state["messages"] or not any(msg.content for msg in state["messages"] if hasattr(msg, 'content')):
@@ -58,11 +92,13 @@ def decision_making_node(state: AgentState):
     
     try:
         system_prompt = SystemMessage(content=decision_making_prompt)
-        response: DecisionMakingOutput = decision_making_llm.invoke(
-            [system_prompt] + state["messages"]
+        response: DecisionMakingOutput = node_llms.invoke(
+            "decision_making", [system_prompt] + state["messages"]
         )
         output = {"requires_research": response.requires_research}
-        #print("Decision making node output:", output)
+        if response.requires_research and state.get("run_id"):
+            # Search CORE for the user query while the planning node runs
+            speculative_search.start(state["run_id"], state["messages"][-1].content)
         if response.answer:
             # Ensure direct answers are placed in the conversation messages
             output["messages"] = [AIMessage(content=response.answer)]
@@ -77,8 +113,6 @@ def decision_making_node(state: AgentState):
 
 # Task router function
 def router(state: AgentState):
-    #print("#" * 50)
-    #print("Router node input:", state)
     """Router directing the user query to the appropriate branch of the workflow"""
     if state["requires_research"]:
         return "planning"
@@ -88,8 +122,6 @@ def router(state: AgentState):
 
 # Planning Node
 def planning_node(state: AgentState):
-    #print("#" * 50)
-    #print("Planning node input:", state["messages"][-1])
     """Planning node that creates a step by step plan to answer the user query."""
     # Increment planning cycle counter
     num_planning_cycles = state.get("num_planning_cycles", 0) + 1
@@ -103,11 +135,22 @@ def planning_node(state: AgentState):
         }
     
     try:
+        history = planning_history(state, num_planning_cycles)
+        if STRUCTURED_PLAN_ENABLED:
+            system_prompt = SystemMessage(
+                content=structured_planning_prompt.format(tools=format_tool_description(tools))
+            )
+            plan: StructuredPlan = node_llms.invoke("structured_planning", [system_prompt] + history)
+            return {
+                "messages": [AIMessage(content=plan.plan)],
+                "planned_steps": plan.steps[:6],
+                "num_planning_cycles": num_planning_cycles
+            }
+
         system_prompt = SystemMessage(
             content=planning_prompt.format(tools=format_tool_description(tools))
         )
-        response = base_llm.invoke([system_prompt] + state["messages"])
-        #print("Planning node output:", response)
+        response = node_llms.invoke("planning", [system_prompt] + history)
         return {
             "messages": [response],
             "num_planning_cycles": num_planning_cycles
@@ -121,31 +164,135 @@ def planning_node(state: AgentState):
         }
 
 
+def planning_history(state: AgentState, num_planning_cycles: int) -> list:
+    """Messages given to the planner.
+
+    The first cycle sees the whole conversation. Later cycles see the user query, a digest of
+    the tool results already gathered and the rejected answer with its feedback.
+    """
+    if num_planning_cycles <= 1 or not state.get("tool_results"):
+        return list(state["messages"])
+    query = next((m for m in state["messages"] if isinstance(m, HumanMessage)), state["messages"][0])
+    digest = SystemMessage(
+        content=replanning_context.format(cycle=num_planning_cycles, digest=format_tool_digest(state["tool_results"]))
+    )
+    feedback = [
+        m for m in state["messages"][-2:]
+        if isinstance(m, AIMessage) and not m.tool_calls
+    ]
+    return [query, digest] + feedback
+
+
+# Planning router function
+def planning_router(state: AgentState):
+    """Router running the independent steps of a structured plan before the agent."""
+    if state.get("planned_steps"):
+        return "research_fan_out"
+    return "agent"
+
+
+def execute_tool_call(state: AgentState, tool_call: dict) -> ToolMessage:
+    """Execute a single tool call and wrap its result in a ToolMessage.
+
+    Calls identical to an earlier successful call of the run are answered from the tool result index,
+    and calls made by earlier queries of the same session from the session memo.
+    """
+    previous = lookup_tool_result(state.get("tool_results"), state["messages"], tool_call["name"], tool_call["args"])
+    if previous is not None:
+        # Keep the markers of the earlier result, so a paper already summarized is not summarized again
+        return ToolMessage(
+            id=str(uuid.uuid4()),
+            content=previous.content,
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            additional_kwargs=dict(previous.additional_kwargs),
+        )
+
+    tool_result = session_memo.get(state.get("session_id"), tool_call["name"], tool_call["args"])
+    if tool_result is None:
+        if tool_call["name"] == "search-paper" and state.get("run_id"):
+            tool_result = speculative_search.claim(
+                state["run_id"],
+                tool_call["args"].get("query", ""),
+                int(tool_call["args"].get("max_papers", 1)),
+            )
+        if tool_result is None:
+            tool_result = tools_dict[tool_call["name"]].invoke(tool_call["args"])
+        session_memo.put(state.get("session_id"), tool_call["name"], tool_call["args"], str(tool_result))
+    if tool_call["name"] == "search-paper" and state.get("run_id"):
+        # Start downloading the most likely candidates before the agent asks for them
+        paper_prefetcher.prefetch(state["run_id"], tool_result)
+    return ToolMessage(
+        id=str(uuid.uuid4()),
+        content=json.dumps(tool_result),
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+    )
+
+
+def execute_tool_calls(state: AgentState, tool_calls: list) -> dict:
+    """Execute tool calls concurrently.
+
+    Returns:
+        The state update with the ToolMessages, in the original order, and the new tool result index entries.
+    """
+    if len(tool_calls) == 1:
+        outputs = [execute_tool_call(state, tool_calls[0])]
+    else:
+        outputs = list(tool_executor.map(lambda tool_call: execute_tool_call(state, tool_call), tool_calls))
+
+    known = state.get("tool_results") or {}
+    tool_results = {}
+    for tool_call, output in zip(tool_calls, outputs):
+        key = tool_result_key(tool_call["name"], tool_call["args"])
+        if key and (key not in known or known[key]["error"]):
+            result = str(json.loads(output.content))
+            tool_results[key] = index_entry(tool_call["name"], tool_call["args"], output.id, result)
+    return {"messages": outputs, "tool_results": tool_results}
+
+
 # Tool call node
 def tools_node(state: AgentState):
     """Tool call node that executes the tools based on the plan."""
-    #print("#" * 50)
-    #print("Tools node input:", state["messages"][-1])
-    #print("Tools node - tool calls:", state["messages"][-1].tool_calls)
-    outputs = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool_result = tools_dict[tool_call["name"]].invoke(tool_call["args"])
-        outputs.append(
-            ToolMessage(
-                content=json.dumps(tool_result),
-                name=tool_call["name"],
-                tool_call_id=tool_call["id"],
-            )
-        )
-    #print("Tools node output:", outputs)
-    return {"messages": outputs}
+    output = execute_tool_calls(state, state["messages"][-1].tool_calls)
+    return output
+
+
+# Research fan-out node
+def research_fan_out_node(state: AgentState):
+    """Fan-out node executing all the independent steps of the structured plan at once."""
+    tool_calls = [
+        {"name": step.tool, "args": step.tool_args(), "id": f"planned-{uuid.uuid4().hex[:12]}"}
+        for step in state["planned_steps"]
+    ]
+    # The steps are recorded as a tool calling message so that the agent sees the results as its own calls
+    request = AIMessage(content="Executing the independent steps of the plan.", tool_calls=tool_calls)
+    output = execute_tool_calls(state, tool_calls)
+    return {"messages": [request] + output["messages"], "tool_results": output["tool_results"], "planned_steps": []}
+
+
+# Tools router function
+def tools_router(state: AgentState):
+    """Router sending the downloaded papers to the summarization subgraph once there are several of them."""
+    if needs_summarization(state["messages"]):
+        return "summarize_papers"
+    return "agent"
+
+
+# Paper summarization node
+def summarize_papers_node(state: AgentState):
+    """Node replacing the raw downloaded papers with per-paper summaries and their synthesis."""
+    try:
+        return {"messages": summarize_downloaded_papers(summarization_graph, state["messages"])}
+    except Exception as e:
+        # The agent can still work from the raw papers
+        print(f"Error in summarize_papers_node: {e}")
+        return {}
 
 
 # Agent call node
 def agent_node(state: AgentState):
     """Agent call node that uses the LLM with tools to answer the user query."""
-    #print("#" * 50)
-    #print("Agent node input:", state["messages"][-1])
     
     system_prompt = SystemMessage(content=agent_prompt)
     
@@ -166,8 +313,7 @@ def agent_node(state: AgentState):
         return {"messages": [error_message]}
     
     try:
-        response = agent_llm.invoke(messages_to_send)
-        #print("Agent node output:", response)
+        response = node_llms.invoke("agent", messages_to_send)
         return {"messages": [response]}
     except Exception as e:
         print(f"Error in agent_node: {e}")
@@ -179,11 +325,8 @@ def agent_node(state: AgentState):
 # Should continue function
 def should_continue(state: AgentState):
     """Check if the agent should continue or end."""
-    #print("#" * 50)
     messages = state["messages"]
     last_message = messages[-1]
-    #print("Should continue node input:", last_message)
-    #print("Should continue node input:", last_message.tool_calls)
     if last_message.tool_calls:
         return "continue"
     else:
@@ -192,8 +335,6 @@ def should_continue(state: AgentState):
 
 def judge_node(state: AgentState):
     """Node to let the LLM judge the quality of its own final answer."""
-    #print("#" * 50)
-    #print("Judge node input:", state["messages"][-1])
     # End execution if the LLM failed to provide a good answer twice
     num_feedback_requests = state.get("num_feedback_requests", 0)
     if num_feedback_requests >= 2:
@@ -207,15 +348,17 @@ def judge_node(state: AgentState):
         }
 
     try:
-        system_prompt = SystemMessage(content=judge_prompt)
-        response: JudgeOutput = judge_llm.invoke([system_prompt] + state["messages"])
+        if JUDGE_MODE == "light":
+            response = light_judge(state)
+        else:
+            system_prompt = SystemMessage(content=judge_prompt)
+            response: JudgeOutput = node_llms.invoke("judge", [system_prompt] + state["messages"])
         output = {
             "is_good_answer": response.is_good_answer,
             "num_feedback_requests": num_feedback_requests + 1,
         }
         if response.feedback:
             output["messages"] = [AIMessage(content=response.feedback)]
-            #print("Judge node output:", output["messages"][-1])
         return output
     except Exception as e:
         print(f"Error in judge_node: {e}")
@@ -225,17 +368,34 @@ def judge_node(state: AgentState):
         }
 
 
+def light_judge(state: AgentState) -> JudgeOutput:
+    """Judge the final answer from the user query, the answer and the evidence digest only.
+
+    Local checks accept (or reject) the answer without an LLM call when they can.
+    """
+    query = next((m.content for m in state["messages"] if isinstance(m, HumanMessage)), "")
+    answer = state["messages"][-1].content
+
+    start = time.perf_counter()
+    accept, feedback = local_answer_checks(query, answer, evidence_sources(state.get("tool_results")))
+    if accept is not None:
+        latency_metrics.record("judge", "local-checks", time.perf_counter() - start)
+        return JudgeOutput(is_good_answer=accept, feedback=feedback)
+
+    judge_input = build_judge_input(query, answer, format_tool_digest(state.get("tool_results")))
+    return node_llms.invoke(
+        "judge", [SystemMessage(content=light_judge_prompt), HumanMessage(content=judge_input)]
+    )
+
+
 def termination_node(state: AgentState):
     """Node to handle graceful termination when max cycles are reached."""
-    #print("#" * 50)
-    #print("Termination node input:", state["messages"][-1])
     termination_message = AIMessage(
         content="I've reached the maximum number of attempts to provide a satisfactory answer. "
                "While I may not have fully met your expectations, I've provided the best response "
                "possible with the available information and tools. Please let me know if you'd like "
                "me to try a different approach or if you have additional questions."
     )
-    #print("Termination node output:", termination_message)
     return {
         "messages": [termination_message],
         "is_good_answer": True  # Force termination
@@ -245,8 +405,6 @@ def termination_node(state: AgentState):
 # Final answer router function
 def final_answer_router(state: AgentState):
     """Router to determine the final answer to the user query."""
-    #print("#" * 50)
-    #print("Final answer router input:", state["messages"][-1])
     if state["is_good_answer"]:
         return "end"
     else:
@@ -255,11 +413,9 @@ def final_answer_router(state: AgentState):
         max_planning_cycles = 3  # Maximum number of planning-agent-judge cycles
         
         if num_planning_cycles >= max_planning_cycles:
-            #print("Final answer router - terminating due to max planning cycles")
             # Route to termination node instead of returning dict
             return "termination"
         else:
-            #print("Final answer router - continuing to planning")
             return "planning"
 
 
@@ -272,6 +428,8 @@ workflow = StateGraph(AgentState)
 workflow.add_node("decision_making", decision_making_node)
 workflow.add_node("planning", planning_node)
 workflow.add_node("tools", tools_node)
+workflow.add_node("research_fan_out", research_fan_out_node)
+workflow.add_node("summarize_papers", summarize_papers_node)
 workflow.add_node("agent", agent_node)
 workflow.add_node("judge", judge_node)
 workflow.add_node("termination", termination_node)
@@ -285,8 +443,22 @@ workflow.add_conditional_edges(
     router,
     {"planning": "planning", "end": END},
 )
-workflow.add_edge("planning", "agent")
-workflow.add_edge("tools", "agent")
+workflow.add_conditional_edges(
+    "planning",
+    planning_router,
+    {"research_fan_out": "research_fan_out", "agent": "agent"},
+)
+workflow.add_conditional_edges(
+    "research_fan_out",
+    tools_router,
+    {"summarize_papers": "summarize_papers", "agent": "agent"},
+)
+workflow.add_conditional_edges(
+    "tools",
+    tools_router,
+    {"summarize_papers": "summarize_papers", "agent": "agent"},
+)
+workflow.add_edge("summarize_papers", "agent")
 workflow.add_conditional_edges(
     "agent",
     should_continue,
@@ -299,14 +471,30 @@ workflow.add_conditional_edges(
 )
 workflow.add_edge("termination", END)
 
-# compile the graph
-app = workflow.compile(debug=True)
+# compile the graph, RESEARCH_AGENT_GRAPH_DEBUG=1 prints every step of the runs
+app = workflow.compile(debug=os.getenv("RESEARCH_AGENT_GRAPH_DEBUG", "0") == "1")
+
+def initial_messages(query: str, session_id: Optional[str] = None) -> list:
+    """The messages a run starts from: the user query, preceded by the papers and searches
+    of the earlier queries of the session, if any."""
+    messages = [HumanMessage(content=query.strip())]
+    digest = session_memo.digest(session_id)
+    if digest:
+        messages.insert(0, SystemMessage(content=session_context.format(digest=digest)))
+    return messages
+
 
 # Wrapper function to handle invocation properly
-def run_research_workflow(query: str):
+def run_research_workflow(query: str, session_id: Optional[str] = None):
     """
     Wrapper function to run the research workflow with proper error handling
+
+    Args:
+        query: The user query.
+        session_id: Identifies the conversation, so that follow-up queries reuse the papers and
+            searches of the earlier ones.
     """
+    run_id = str(uuid.uuid4())
     try:
         # Validate input query
         if not query or not query.strip():
@@ -315,7 +503,9 @@ def run_research_workflow(query: str):
             }
         
         initial_state = {
-            "messages": [HumanMessage(content=query.strip())]
+            "messages": initial_messages(query, session_id),
+            "run_id": run_id,
+            "session_id": session_id,
         }
         
         # Use invoke with proper configuration
@@ -329,7 +519,68 @@ def run_research_workflow(query: str):
         return {
             "messages": [AIMessage(content=f"I encountered an error while processing your request: {str(e)}. Please try again with a different question.")]
         }
+    finally:
+        # Unused speculative work is dropped when the run ends
+        speculative_search.discard(run_id)
+        paper_prefetcher.cancel_run(run_id)
+
+
+def final_answer_from_messages(messages: list) -> str:
+    """Return the content of the last AI message without tool calls, the answer shown to the user."""
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and not message.tool_calls and message.content:
+            return message.content
+    return ""
+
+
+def stream_research_workflow(query: str, session_id: Optional[str] = None):
+    """
+    Run the research workflow and yield its progress as it happens.
+
+    The agent's final answer is yielded as soon as the agent node produces it, while the
+    judge evaluates it. If the judge rejects it, a "revising" event follows and the next
+    answer replaces it. See `run_research_workflow` for `session_id`.
+
+    Yields:
+        dict: Events with a "type" key:
+            - {"type": "node", "node": name}: a node of the workflow finished
+            - {"type": "answer", "content": str}: a candidate final answer, not judged yet
+            - {"type": "revising", "feedback": str}: the judge rejected the last answer
+            - {"type": "done", "content": str}: the final answer of the run
+    """
+    run_id = str(uuid.uuid4())
+    final_answer = ""
+    try:
+        # Validate input query
+        if not query or not query.strip():
+            yield {"type": "done", "content": "I apologize, but I didn't receive a valid query. Please provide a question or request."}
+            return
 
+        initial_state = {
+            "messages": initial_messages(query, session_id),
+            "run_id": run_id,
+            "session_id": session_id,
+        }
 
+        for chunk in app.stream(initial_state, config={"recursion_limit": 50}, stream_mode="updates"):
+            for node, update in chunk.items():
+                yield {"type": "node", "node": node}
+                messages = (update or {}).get("messages") or []
+                answer = final_answer_from_messages(messages)
+                if node in ("agent", "decision_making", "termination") and answer:
+                    final_answer = answer
+                    if node == "agent":
+                        yield {"type": "answer", "content": answer}
+                if node == "judge" and update and update.get("is_good_answer") is False:
+                    yield {"type": "revising", "feedback": answer}
 
+        yield {"type": "done", "content": final_answer}
 
+    except Exception as e:
+        print(f"Error in research workflow: {e}")
+        import traceback
+        traceback.print_exc()
+        yield {"type": "done", "content": f"I encountered an error while processing your request: {str(e)}. Please try again with a different question."}
+    finally:
+        speculative_search.discard(run_id)
+        paper_prefetcher.cancel_run(run_id)
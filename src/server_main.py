@@ -0,0 +1,295 @@
+"""
+Standalone HTTP service for the agents, independent of the Streamlit UI.
+
+Endpoints:
+    GET  /health                 Liveness and load of this worker process
+    GET  /agents                 The agents served
+    POST /agents/{agent}/invoke  Run an agent and return its final answer as JSON
+    POST /agents/{agent}/stream  Run an agent and stream its progress as Server-Sent Events
+
+Requests take a JSON body {"query": "...", "session_id": "..."}, where the optional session
+id lets the queries of a conversation reuse each other's tool results. Run it with:
+
+    python src/server_main.py --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import threading
+import warnings
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Suppress ALTS and gRPC warnings from Google libraries
+os.environ["GRPC_VERBOSITY"] = "ERROR"
+os.environ["GRPC_TRACE"] = ""
+warnings.filterwarnings("ignore", message=".*ALTS creds ignored.*")
+logging.getLogger("grpc").setLevel(logging.ERROR)
+logging.getLogger("google").setLevel(logging.ERROR)
+
+# Load environment variables, then the Streamlit secrets file if there is one
+load_dotenv()
+try:
+    from utils.secrets_loader import load_secrets_simple
+    load_secrets_simple()
+except Exception as e:
+    print(f"Secrets file not loaded, using the environment only: {e}")
+
+# Ensure local imports work when running the server from the project root
+CURRENT_DIR = Path(__file__).resolve().parent
+if str(CURRENT_DIR) not in sys.path:
+    sys.path.insert(0, str(CURRENT_DIR))
+
+from scientific_research_agent.workflow import stream_research_workflow
+
+
+# Agent runs executed at the same time by one worker process; further requests wait in line
+MAX_CONCURRENT_RUNS = int(os.getenv("RESEARCH_AGENT_SERVER_MAX_CONCURRENT_RUNS", "4"))
+# Seconds a request waits for a free run slot before being answered 503
+QUEUE_TIMEOUT = float(os.getenv("RESEARCH_AGENT_SERVER_QUEUE_TIMEOUT", "30"))
+# Seconds given to the running agents to finish on shutdown
+SHUTDOWN_TIMEOUT = int(os.getenv("RESEARCH_AGENT_SERVER_SHUTDOWN_TIMEOUT", "60"))
+# Seconds between SSE comments keeping idle connections open through proxies
+KEEPALIVE_INTERVAL = float(os.getenv("RESEARCH_AGENT_SERVER_KEEPALIVE_INTERVAL", "15"))
+
+# Each agent is a generator function taking the query (and an optional `session_id` keyword) and
+# yielding progress events, ending with a {"type": "done", "content": ...} event (see `stream_research_workflow`).
+# The Chiron learning agent is added here once its graph is complete.
+AGENTS: Dict[str, Callable[[str], Iterator[dict]]] = {
+    "research": stream_research_workflow,
+}
+
+_END = object()
+
+
+class RunSlots:
+    """Limits the number of agent runs executing at the same time in this process."""
+
+    def __init__(self, max_runs: int):
+        self.max_runs = max_runs
+        self.active = 0
+        self.accepting = True
+        self._semaphore = asyncio.Semaphore(max_runs)
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a free slot. Returns False if none was available."""
+        if not self.accepting:
+            return False
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def drain(self, timeout: float):
+        """Stop accepting runs and wait up to `timeout` seconds for the active ones to finish."""
+        self.accepting = False
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self.active and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.5)
+
+
+run_slots = RunSlots(MAX_CONCURRENT_RUNS)
+# The agents are synchronous, they run in their own threads outside of the event loop
+agent_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RUNS, thread_name_prefix="agent-runs")
+
+
+async def iterate_agent_events(agent: Callable[[str], Iterator[dict]], query: str) -> AsyncIterator[dict]:
+    """Run an agent in the executor and yield its events in the event loop.
+
+    When the consumer stops early (e.g. the client disconnected), the agent stops at its
+    next event and its generator is closed, releasing the work of the run.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is closed, the server is shutting down
+            stop.set()
+
+    def produce():
+        events = agent(query)
+        try:
+            for event in events:
+                if stop.is_set():
+                    break
+                put(event)
+        except Exception as e:
+            print(f"Error in agent run: {e}")
+            put({"type": "done", "content": f"I encountered an error while processing your request: {str(e)}."})
+        finally:
+            events.close()
+            put(_END)
+
+    loop.run_in_executor(agent_executor, produce)
+    try:
+        while True:
+            event = await queue.get()
+            if event is _END:
+                return
+            yield event
+    finally:
+        stop.set()
+
+
+def format_sse(event: dict) -> str:
+    """Format an agent event as a Server-Sent Event named after its type."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _parse_run_request(request: Request):
+    """Return (agent, query, None) for a valid run request, or (None, None, error_response)."""
+    agent = AGENTS.get(request.path_params["agent"])
+    if agent is None:
+        return None, None, JSONResponse({"error": f"Unknown agent: {request.path_params['agent']}"}, status_code=404)
+    try:
+        body = await request.json()
+    except ValueError:
+        return None, None, JSONResponse({"error": "The request body must be JSON."}, status_code=400)
+    query = body.get("query") if isinstance(body, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        return None, None, JSONResponse({"error": "The request body must contain a non-empty \"query\"."}, status_code=400)
+    session_id = body.get("session_id")
+    if isinstance(session_id, str) and session_id:
+        agent = functools.partial(agent, session_id=session_id)
+    return agent, query, None
+
+
+def _busy_response() -> JSONResponse:
+    return JSONResponse(
+        {"error": "The server is at capacity or shutting down, retry later."},
+        status_code=503,
+        headers={"Retry-After": "5"},
+    )
+
+
+async def health(request: Request):
+    return JSONResponse({
+        "status": "ok" if run_slots.accepting else "shutting_down",
+        "active_runs": run_slots.active,
+        "max_concurrent_runs": run_slots.max_runs,
+    })
+
+
+async def list_agents(request: Request):
+    return JSONResponse({"agents": sorted(AGENTS)})
+
+
+async def invoke_agent(request: Request):
+    agent, query, error = await _parse_run_request(request)
+    if error:
+        return error
+    if not await run_slots.acquire(QUEUE_TIMEOUT):
+        return _busy_response()
+    try:
+        answer = ""
+        async for event in iterate_agent_events(agent, query):
+            if event["type"] == "done":
+                answer = event["content"]
+        return JSONResponse({"answer": answer})
+    finally:
+        run_slots.release()
+
+
+async def stream_agent(request: Request):
+    agent, query, error = await _parse_run_request(request)
+    if error:
+        return error
+    if not await run_slots.acquire(QUEUE_TIMEOUT):
+        return _busy_response()
+
+    async def event_stream():
+        events = iterate_agent_events(agent, query)
+        next_event = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(events.__anext__())
+                done, _ = await asyncio.wait({next_event}, timeout=KEEPALIVE_INTERVAL)
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    return
+                next_event = None
+                yield format_sse(event)
+        finally:
+            if next_event is not None:
+                next_event.cancel()
+            await events.aclose()
+            run_slots.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    # Let the running agents finish, then stop the ones that did not
+    await run_slots.drain(SHUTDOWN_TIMEOUT)
+    agent_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        Route("/agents", list_agents, methods=["GET"]),
+        Route("/agents/{agent}/invoke", invoke_agent, methods=["POST"]),
+        Route("/agents/{agent}/stream", stream_agent, methods=["POST"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the agents over HTTP.")
+    parser.add_argument("--host", default=os.getenv("RESEARCH_AGENT_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RESEARCH_AGENT_SERVER_PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("RESEARCH_AGENT_SERVER_WORKERS", "1")),
+        help="Worker processes, each running up to RESEARCH_AGENT_SERVER_MAX_CONCURRENT_RUNS agents",
+    )
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "server_main:app",
+        app_dir=str(CURRENT_DIR),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import streamlit as st
 import json
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from datetime import datetime
 import os
 import sys
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import warnings
@@ -45,16 +48,115 @@ CURRENT_DIR = Path(__file__).resolve().parent
 if str(CURRENT_DIR) not in sys.path:
     sys.path.insert(0, str(CURRENT_DIR))
 
-# Import the scientific research agent with error handling
-try:
-    from scientific_research_agent.workflow import run_research_workflow
-    from langchain_core.messages import HumanMessage, AIMessage
-    RESEARCH_AGENT_AVAILABLE = True
-except ImportError as e:
-    st.error(f"Error importing research agent: {str(e)}")
-    st.error("Please check your package versions. Run: pip install -r requirements-fixed.txt")
-    RESEARCH_AGENT_AVAILABLE = False
-    run_research_workflow = None
+# With RESEARCH_AGENT_JOB_QUEUE=1, queries are executed by the job workers (src/job_worker.py)
+# instead of the Streamlit script thread
+USE_JOB_QUEUE = os.getenv("RESEARCH_AGENT_JOB_QUEUE", "0") == "1"
+
+# Queries run in the background on an executor shared by all sessions, so the page stays responsive
+QUERY_WORKERS = int(os.getenv("RESEARCH_AGENT_UI_QUERY_WORKERS", "4"))
+MAX_PENDING_QUERIES = int(os.getenv("RESEARCH_AGENT_UI_MAX_PENDING_QUERIES", "3"))
+PROGRESS_REFRESH_SECONDS = float(os.getenv("RESEARCH_AGENT_UI_REFRESH_SECONDS", "1"))
+CANCELLED_RESPONSE = "The query was cancelled."
+# Chat messages shown at the end of the history, and per click on "Show earlier messages"
+VISIBLE_MESSAGES = int(os.getenv("RESEARCH_AGENT_UI_VISIBLE_MESSAGES", "20"))
+# Conversations are saved to disk (see utils/chat_store.py), the session only keeps their end
+USE_CHAT_STORE = os.getenv("RESEARCH_AGENT_CHAT_HISTORY", "1") != "0"
+
+
+# The research agent (LangGraph, LangChain and the Gemini clients) is imported on first use
+# and kept for the whole process, so that the page is painted without waiting for it
+@st.cache_resource(show_spinner=False)
+def load_research_agent() -> Dict[str, Any]:
+    """Import the research workflow once per process.
+
+    Returns:
+        dict: {"stream": stream_research_workflow, "error": None}, or {"stream": None, "error": message}
+            if the agent could not be imported.
+    """
+    try:
+        from scientific_research_agent.workflow import stream_research_workflow
+        return {"stream": stream_research_workflow, "error": None}
+    except ImportError as e:
+        print("Error importing research agent:", e)
+        return {"stream": None, "error": str(e)}
+
+@st.cache_resource(show_spinner=False)
+def warm_up_research_agent():
+    """Load the research agent and build its LLM clients in the background, once per process"""
+    def warm_up():
+        if load_research_agent()["stream"] is None:
+            return
+        from scientific_research_agent.workflow import node_llms
+        for node in node_llms.bindings:
+            try:
+                node_llms.get(node)
+            except Exception as e:
+                print(f"Could not build the {node} LLM: {e}")
+    return get_query_executor().submit(warm_up)
+
+@st.cache_resource(show_spinner=False)
+def get_chat_store():
+    """Return the store the conversations are saved to"""
+    from utils.chat_store import ChatStore
+    return ChatStore()
+
+def load_chat_tail(agent_name: str) -> List[Dict[str, Any]]:
+    """Return the last messages of the conversation of this user with an agent"""
+    if not USE_CHAT_STORE:
+        return []
+    return get_chat_store().tail(st.session_state.user_id, agent_name, VISIBLE_MESSAGES)
+
+def count_chat_messages() -> int:
+    """Return the number of messages of the current conversation, including those not in memory"""
+    if not USE_CHAT_STORE:
+        return len(st.session_state.messages)
+    return get_chat_store().count(st.session_state.user_id, st.session_state.selected_agent)
+
+def save_chat_message(message: Dict[str, Any], reply_to: Optional[str] = None) -> bool:
+    """Save a message of the current conversation to the chat store.
+
+    Returns:
+        bool: False if the message answers a question that was deleted, True otherwise.
+    """
+    if not USE_CHAT_STORE:
+        return True
+    position = get_chat_store().add_message(
+        st.session_state.user_id, st.session_state.selected_agent, message, reply_to=reply_to
+    )
+    if position is None:
+        return False
+    message["position"] = position
+    return True
+
+def trim_session_messages():
+    """Keep only the end of the conversation in the session when it is saved to disk"""
+    if USE_CHAT_STORE and len(st.session_state.messages) > VISIBLE_MESSAGES:
+        st.session_state.messages = st.session_state.messages[-VISIBLE_MESSAGES:]
+
+def conversation_session_id() -> str:
+    """Return the id under which the queries of the current conversation share their tool results"""
+    return f"{st.session_state.user_id}:{st.session_state.conversation_id}"
+
+def clear_chat_history():
+    """Delete the current conversation, and the tool results its queries shared"""
+    if USE_CHAT_STORE:
+        get_chat_store().clear(st.session_state.user_id, st.session_state.selected_agent)
+    # The memo is only loaded once the agent ran in this process, job workers drop theirs on expiry
+    session_memo = sys.modules.get("scientific_research_agent.session_memo")
+    if session_memo is not None:
+        session_memo.session_memo.clear(conversation_session_id())
+    # Later queries start a new memo session, also in the job workers
+    st.session_state.conversation_id = uuid.uuid4().hex[:8]
+    st.query_params["conversation"] = st.session_state.conversation_id
+    st.session_state.messages = []
+    st.session_state.query_errors = []
+    st.session_state.history_window = VISIBLE_MESSAGES
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Return the job queue the research queries are sent to"""
+    from utils.job_queue import JobQueue
+    return JobQueue()
 
 # Page configuration
 st.set_page_config(
@@ -207,12 +309,25 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
 if "selected_agent" not in st.session_state:
     st.session_state.selected_agent = "Scientific Research Agent"
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = {}
+if "user_id" not in st.session_state:
+    # Kept in the URL, so that the saved conversations are found again after a refresh
+    st.session_state.user_id = st.query_params.get("user") or str(uuid.uuid4())
+    st.query_params["user"] = st.session_state.user_id
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = st.query_params.get("conversation") or uuid.uuid4().hex[:8]
+    st.query_params["conversation"] = st.session_state.conversation_id
+if "messages" not in st.session_state:
+    st.session_state.messages = load_chat_tail(st.session_state.selected_agent)
+if "pending_queries" not in st.session_state:
+    st.session_state.pending_queries = []
+if "query_errors" not in st.session_state:
+    st.session_state.query_errors = []
+if "history_window" not in st.session_state:
+    st.session_state.history_window = VISIBLE_MESSAGES
 
 # Available agents configuration
 AGENTS_CONFIG = {
@@ -285,57 +400,291 @@ def display_template_queries(agent_name):
                 st.session_state.user_input = query
                 st.rerun()
 
-def process_research_query(query: str) -> str:
-    """Process query using the scientific research agent"""
+def process_research_query(
+    query: str,
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+    user_id: str = "anonymous",
+    cancel_event: Optional[threading.Event] = None,
+    session_id: Optional[str] = None,
+) -> str:
+    """Process query using the scientific research agent
+
+    Args:
+        query: The user query.
+        on_update: Optional callback receiving the workflow events (see `stream_research_workflow`)
+            as they happen, e.g. to show a candidate answer while the judge evaluates it, and an
+            "error" event if the query fails. It is called from the thread running the query.
+        user_id: The user asking. Their queries are queued for them when the job queue is enabled.
+        cancel_event: Optional event stopping the run at its next step once set.
+        session_id: The conversation the query belongs to. Its queries reuse each other's papers
+            and searches. Defaults to the user.
+    """
     print("Processing research query:", query)
-    if not RESEARCH_AGENT_AVAILABLE:
+    session_id = session_id or user_id
+    if USE_JOB_QUEUE:
+        return process_research_query_in_queue(query, on_update, user_id, cancel_event, session_id)
+    research_agent = load_research_agent()
+    if research_agent["stream"] is None:
         return "The Scientific Research Agent is currently unavailable due to a compatibility issue. Please check your package versions and try again."
     
     try:
-        # Use the wrapper function to run the research workflow
-        result = run_research_workflow(query)
-        print("Research agent result:", result)
+        # Stream the research workflow so that answers can be shown before the judge is done
+        response = ""
+        # The queries of a conversation share their papers and searches
+        events = research_agent["stream"](query, session_id=session_id)
+        try:
+            for event in events:
+                if cancel_event is not None and cancel_event.is_set():
+                    return CANCELLED_RESPONSE
+                if on_update is not None:
+                    on_update(event)
+                if event["type"] == "done":
+                    response = event["content"]
+        finally:
+            events.close()
+        print("Research agent result:", response)
         
-        # Extract the final response
-        if result and "messages" in result:
-            # Get the last AI message
-            for message in reversed(result["messages"]):
-                # Include messages that do not contain tool calls or have empty tool_calls
-                if isinstance(message, AIMessage) and not getattr(message, 'tool_calls', None):
-                    return message.content
-        
-        # If no proper response found, try to extract any content
-        if result and "messages" in result and result["messages"]:
-            last_message = result["messages"][-1]
-            if hasattr(last_message, 'content') and last_message.content:
-                return last_message.content
+        if response:
+            return response
         
         print("No AI message found in research agent result")
         return "I apologize, but I couldn't generate a proper response. Please try rephrasing your question."
     
     except Exception as e:
-        st.error(f"Error processing query: {str(e)}")
+        # Running in the background, without the page: the error is shown by the progress fragment
+        if on_update is not None:
+            on_update({"type": "error", "content": str(e)})
         print("Error processing query:", e)
         import traceback
         traceback.print_exc()
         return "I encountered an error while processing your request. Please try again."
 
-def display_chat_message(message: Dict[str, Any]):
-    """Display a chat message with proper styling"""
+def process_research_query_in_queue(
+    query: str,
+    on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+    user_id: str = "anonymous",
+    cancel_event: Optional[threading.Event] = None,
+    session_id: Optional[str] = None,
+) -> str:
+    """Enqueue a research query for the job workers and follow its progress until it is finished"""
+    from utils.job_queue import DONE
+
+    job_queue = get_job_queue()
+    try:
+        job_id = job_queue.enqueue(query, user_id=user_id, agent="research", session_id=session_id)
+        print("Queued research job:", job_id)
+        for event in job_queue.follow(job_id):
+            if cancel_event is not None and cancel_event.is_set():
+                job_queue.cancel(job_id)
+                return CANCELLED_RESPONSE
+            if on_update is not None:
+                on_update(event)
+
+        job = job_queue.get(job_id)
+        if job["status"] == DONE and job["result"]:
+            return job["result"]
+        print(f"Research job {job_id} ended as {job['status']}: {job['error']}")
+        if on_update is not None:
+            on_update({"type": "error", "content": job["error"] or f"The job ended as {job['status']}."})
+        return "I encountered an error while processing your request. Please try again."
+
+    except Exception as e:
+        if on_update is not None:
+            on_update({"type": "error", "content": str(e)})
+        print("Error processing query:", e)
+        return "I encountered an error while processing your request. Please try again."
+
+@st.cache_resource
+def get_query_executor() -> ThreadPoolExecutor:
+    """Return the executor running the agent queries of all sessions in the background"""
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="ui-queries")
+
+def submit_query(query: str, agent_name: str, user_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Start processing a query in the background and return its pending entry.
+
+    The entry holds the future of the response, the progress of the run, updated from the
+    background thread, and the event used to cancel it.
+    """
+    progress: Dict[str, Any] = {}
+    cancel_event = threading.Event()
+    if agent_name == "Scientific Research Agent":
+        future = get_query_executor().submit(
+            process_research_query,
+            query,
+            on_update=lambda event: update_research_progress(progress, event),
+            user_id=user_id,
+            cancel_event=cancel_event,
+            session_id=session_id,
+        )
+    else:
+        future = get_query_executor().submit(
+            lambda: f"Sorry, the {agent_name} is currently offline. Please select the Scientific Research Agent for now."
+        )
+    return {
+        "id": str(uuid.uuid4()),
+        "query": query,
+        "agent": agent_name,
+        "future": future,
+        "progress": progress,
+        "cancel_event": cancel_event,
+    }
+
+def update_research_progress(state: Dict[str, Any], event: Dict[str, Any]):
+    """Record a research workflow event in the progress state of a query.
+
+    Candidate answers are kept right away. If the judge rejects one, it stays visible
+    marked as being revised until the next answer replaces it.
+    """
+    if event["type"] == "answer":
+        state["answer"] = event["content"]
+        state["revising"] = None
+    elif event["type"] == "revising":
+        state["revising"] = event.get("feedback") or "The answer did not pass the quality review."
+    elif event["type"] == "node":
+        state["node"] = event["node"]
+    elif event["type"] == "error":
+        state["error"] = event["content"]
+
+def render_research_progress(state: Dict[str, Any]):
+    """Render the progress state of a query"""
+    if state.get("answer"):
+        if state.get("revising"):
+            st.warning(f"✏️ This answer is being revised: {state['revising']}")
+        display_chat_message({"role": "assistant", "content": state["answer"]})
+        if not state.get("revising") and state.get("node") == "agent":
+            st.caption("🔎 Reviewing the answer...")
+    elif state.get("node"):
+        st.caption(f"⚙️ {state['node'].replace('_', ' ').capitalize()} step done...")
+    else:
+        st.caption("⏳ Waiting to start...")
+
+def collect_finished_queries() -> bool:
+    """Move the responses of the finished queries into the chat history.
+
+    Each response is inserted after the user message of its query, so that answers stay
+    next to their question when several queries are pending. Responses to questions no
+    longer in memory are only saved to the chat store.
+
+    The errors of the failed queries are kept in `query_errors`, shown on the page by the rerun
+    that follows.
+
+    Returns:
+        bool: Whether any query finished.
+    """
+    pending = st.session_state.pending_queries
+    finished = [p for p in pending if p["future"].done()]
+    for entry in finished:
+        try:
+            response = entry["future"].result()
+        except Exception as e:
+            print("Error processing query:", e)
+            entry["progress"]["error"] = str(e)
+            response = "I encountered an error while processing your request. Please try again."
+        if entry["progress"].get("error"):
+            st.session_state.query_errors.append(entry["progress"]["error"])
+        message = {
+            "id": str(uuid.uuid4()),
+            "role": "assistant",
+            "content": response,
+            "timestamp": datetime.now().isoformat()
+        }
+        # The chat was cleared while the query was running
+        if not save_chat_message(message, reply_to=entry["id"]):
+            continue
+        position = next(
+            (i for i, m in enumerate(st.session_state.messages) if m.get("query_id") == entry["id"]),
+            None,
+        )
+        if position is None:
+            continue
+        while (
+            position + 1 < len(st.session_state.messages)
+            and st.session_state.messages[position + 1]["role"] == "assistant"
+        ):
+            position += 1
+        st.session_state.messages.insert(position + 1, message)
+    trim_session_messages()
+    st.session_state.pending_queries = [p for p in pending if not p["future"].done()]
+    return bool(finished)
+
+def cancel_pending_queries():
+    """Cancel the queries still running in this session"""
+    for entry in st.session_state.pending_queries:
+        entry["cancel_event"].set()
+    st.session_state.pending_queries = []
+
+@st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+def display_pending_queries():
+    """Show the progress of the pending queries, refreshed on its own without rerunning the page"""
+    if collect_finished_queries():
+        st.rerun()
+
+    for entry in st.session_state.pending_queries:
+        with st.container(border=True):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.caption(f"{entry['agent']} is working on: {entry['query']}")
+            with col2:
+                if not entry["cancel_event"].is_set():
+                    if st.button("✖️ Cancel", key=f"cancel_{entry['id']}", help="Stop this query"):
+                        entry["cancel_event"].set()
+                if entry["cancel_event"].is_set():
+                    st.caption("Cancelling...")
+            render_research_progress(entry["progress"])
+
+def render_chat_message(message: Dict[str, Any], agent_name: str) -> str:
+    """Build the HTML of a chat message"""
     if message["role"] == "user":
-        st.markdown(f"""
+        return f"""
         <div class="chat-message user-message">
             <strong>You:</strong><br>
             {message["content"]}
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
+        """
+    return f"""
         <div class="chat-message assistant-message">
-            <strong>🤖 {st.session_state.selected_agent}:</strong><br>
+            <strong>🤖 {agent_name}:</strong><br>
             {message["content"]}
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+def display_chat_message(message: Dict[str, Any]):
+    """Display a chat message with proper styling"""
+    st.markdown(render_chat_message(message, st.session_state.selected_agent), unsafe_allow_html=True)
+
+def display_chat_history():
+    """Display the last messages of the chat, older ones are shown a page at a time on request.
+
+    Only the messages in the window are sent to the browser, and the earlier pages the user
+    asked for are sent as a single collapsible element, so the number of elements sent on
+    each rerun stays bounded as the conversation grows.
+    """
+    messages = st.session_state.messages
+    window = st.session_state.history_window
+    hidden = max(0, count_chat_messages() - window)
+    if hidden:
+        if st.button(f"⬆️ Show earlier messages ({hidden} hidden)", key="show_earlier_messages"):
+            st.session_state.history_window += VISIBLE_MESSAGES
+            st.rerun()
+
+    visible = messages[-window:]
+    # Earlier messages are read from the chat store when scrolled back to, not kept in the session
+    if USE_CHAT_STORE and window > len(messages) and messages and "position" in messages[0]:
+        visible = get_chat_store().before(
+            st.session_state.user_id,
+            st.session_state.selected_agent,
+            messages[0]["position"],
+            window - len(messages),
+        ) + visible
+    earlier, recent = visible[:-VISIBLE_MESSAGES], visible[-VISIBLE_MESSAGES:]
+    if earlier:
+        with st.expander(f"Earlier messages ({len(earlier)})", expanded=True):
+            st.markdown(
+                "".join(render_chat_message(message, st.session_state.selected_agent) for message in earlier),
+                unsafe_allow_html=True,
+            )
+    for message in recent:
+        display_chat_message(message)
 
 def main():
     # Main header
@@ -362,8 +711,10 @@ def main():
         # Update selected agent in session state
         if selected_agent != st.session_state.selected_agent:
             st.session_state.selected_agent = selected_agent
-            # Clear messages when switching agents
-            st.session_state.messages = []
+            # Show the conversation with the new agent
+            cancel_pending_queries()
+            st.session_state.messages = load_chat_tail(selected_agent)
+            st.session_state.history_window = VISIBLE_MESSAGES
         
         st.divider()
         
@@ -381,12 +732,13 @@ def main():
         st.subheader("💬 Chat Controls")
         
         if st.button("🗑️ Clear Chat History", help="Clear all chat messages"):
-            st.session_state.messages = []
+            cancel_pending_queries()
+            clear_chat_history()
             st.rerun()
         
         # Display chat statistics
         if st.session_state.messages:
-            st.metric("Messages", len(st.session_state.messages))
+            st.metric("Messages", count_chat_messages())
             st.metric("Agent", st.session_state.selected_agent)
     
     # Main chat interface
@@ -406,8 +758,15 @@ def main():
         if not st.session_state.messages:
             st.info("👋 Welcome! Select an agent and start chatting, or try one of the template queries from the sidebar.")
         else:
-            for message in st.session_state.messages:
-                display_chat_message(message)
+            display_chat_history()
+
+        # Errors of the queries that failed in the background, kept until the next query is sent
+        for error in st.session_state.query_errors:
+            st.error(f"Error processing query: {error}")
+
+        # Progress of the queries still running, refreshed without blocking the page
+        if st.session_state.pending_queries:
+            display_pending_queries()
     
     # Chat input
     st.markdown("---")
@@ -433,42 +792,35 @@ def main():
         with col2:
             submit_button = st.form_submit_button("Send", use_container_width=True)
     
-    # Process user input
+    # Process user input in the background
     if submit_button and user_query:
-        user_query = st.text_input(
-                "Type your message here...",
-                value=user_input,
-                placeholder=f"Ask {st.session_state.selected_agent} anything...",
-                label_visibility="collapsed"
+        if len(st.session_state.pending_queries) >= MAX_PENDING_QUERIES:
+            st.warning(f"You already have {MAX_PENDING_QUERIES} queries in progress. Wait for one to finish or cancel it.")
+        else:
+            entry = submit_query(
+                user_query, st.session_state.selected_agent, st.session_state.user_id, conversation_session_id()
             )
-        # Add user message to chat history
-        st.session_state.messages.append({
-            "role": "user",
-            "content": user_query,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Show typing indicator
-        with st.spinner(f"{st.session_state.selected_agent} is thinking..."):
-            # Process the query based on selected agent
-            if st.session_state.selected_agent == "Scientific Research Agent":
-                response = process_research_query(user_query)
-            else:
-                response = f"Sorry, the {st.session_state.selected_agent} is currently offline. Please select the Scientific Research Agent for now."
-        
-        # Add assistant response to chat history
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Clear the input field after successful submission
-        st.session_state.user_input = ""
-        
-        # Rerun to display new messages
-        st.rerun()
-    
+            st.session_state.pending_queries.append(entry)
+            st.session_state.query_errors = []
+
+            # Add user message to chat history, its id is the one the response replies to
+            message = {
+                "id": entry["id"],
+                "role": "user",
+                "content": user_query,
+                "timestamp": datetime.now().isoformat(),
+                "query_id": entry["id"]
+            }
+            save_chat_message(message)
+            st.session_state.messages.append(message)
+            trim_session_messages()
+
+            # Clear the input field after successful submission
+            st.session_state.user_input = ""
+
+            # Rerun to display new messages
+            st.rerun()
+
     # Footer
     st.markdown("---")
     st.markdown(
@@ -480,5 +832,9 @@ def main():
         unsafe_allow_html=True
     )
 
+    # The page is painted, load the research agent for the first query
+    if not USE_JOB_QUEUE:
+        warm_up_research_agent()
+
 if __name__ == "__main__":
     main()
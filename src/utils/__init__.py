@@ -8,10 +8,16 @@ from .secrets_loader import (
     get_secret,
     load_secrets_and_validate
 )
+from .job_queue import JobQueue
+from .chat_store import ChatStore
+from .cache import TTLCache
 
 __all__ = [
     "load_secrets_from_toml",
     "load_secrets_simple", 
     "get_secret",
-    "load_secrets_and_validate"
+    "load_secrets_and_validate",
+    "JobQueue",
+    "ChatStore",
+    "TTLCache"
 ]
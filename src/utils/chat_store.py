@@ -0,0 +1,155 @@
+"""
+Persistent chat history backed by SQLite.
+
+Conversations are keyed by user and agent. Message bodies are stored zlib-compressed,
+and messages are read a page at a time, so a frontend only needs to keep the end of a
+conversation in memory.
+"""
+
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+
+DEFAULT_CHAT_DB = os.getenv("RESEARCH_AGENT_CHAT_DB", "chat_history.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    position REAL NOT NULL,
+    role TEXT NOT NULL,
+    content BLOB NOT NULL,
+    timestamp TEXT,
+    query_id TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_messages_conversation ON chat_messages (user_id, agent, position);
+"""
+
+
+class ChatStore:
+    """Stores the chat messages of every user and agent in a SQLite file.
+
+    Messages are dicts with "id", "role", "content", "timestamp" and optionally "query_id".
+    The messages read back also carry their "position" in the conversation.
+
+    Args:
+        path: The SQLite database file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHAT_DB):
+        self.path = str(path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_message(row: sqlite3.Row) -> dict:
+        message = {
+            "id": row["id"],
+            "role": row["role"],
+            "content": zlib.decompress(row["content"]).decode("utf-8"),
+            "timestamp": row["timestamp"],
+            "position": row["position"],
+        }
+        if row["query_id"]:
+            message["query_id"] = row["query_id"]
+        return message
+
+    def add_message(self, user_id: str, agent: str, message: dict, reply_to: Optional[str] = None) -> Optional[float]:
+        """Store a message at the end of a conversation, or right after the message it replies to.
+
+        Args:
+            reply_to: The id of the message answered by this one. Answers are placed after their
+                question, even when other messages were added in between.
+
+        Returns:
+            float: The position of the message in the conversation, or None if the message it
+                replies to was deleted, in which case it is not stored.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                position = None
+                if reply_to is not None:
+                    row = conn.execute(
+                        "SELECT position FROM chat_messages WHERE id = ?", (reply_to,)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    # Halfway between the question and the next message
+                    next_row = conn.execute(
+                        "SELECT MIN(position) AS position FROM chat_messages "
+                        "WHERE user_id = ? AND agent = ? AND position > ?",
+                        (user_id, agent, row["position"]),
+                    ).fetchone()
+                    upper = next_row["position"] if next_row["position"] is not None else row["position"] + 1
+                    position = (row["position"] + upper) / 2
+                if position is None:
+                    row = conn.execute(
+                        "SELECT MAX(position) AS position FROM chat_messages WHERE user_id = ? AND agent = ?",
+                        (user_id, agent),
+                    ).fetchone()
+                    position = (row["position"] or 0) + 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO chat_messages "
+                    "(id, user_id, agent, position, role, content, timestamp, query_id, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        message["id"], user_id, agent, position, message["role"],
+                        zlib.compress(message["content"].encode("utf-8")),
+                        message.get("timestamp"), message.get("query_id"), time.time(),
+                    ),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return position
+
+    def tail(self, user_id: str, agent: str, limit: int) -> List[dict]:
+        """Return the last `limit` messages of a conversation, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM chat_messages WHERE user_id = ? AND agent = ? ORDER BY position DESC LIMIT ?",
+                (user_id, agent, limit),
+            ).fetchall()
+        return [self._to_message(row) for row in reversed(rows)]
+
+    def before(self, user_id: str, agent: str, position: float, limit: int) -> List[dict]:
+        """Return the `limit` messages preceding `position` in a conversation, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM chat_messages WHERE user_id = ? AND agent = ? AND position < ? "
+                "ORDER BY position DESC LIMIT ?",
+                (user_id, agent, position, limit),
+            ).fetchall()
+        return [self._to_message(row) for row in reversed(rows)]
+
+    def count(self, user_id: str, agent: str) -> int:
+        """Return the number of messages of a conversation."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM chat_messages WHERE user_id = ? AND agent = ?", (user_id, agent)
+            ).fetchone()
+        return row["n"]
+
+    def clear(self, user_id: str, agent: str):
+        """Delete a conversation."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE user_id = ? AND agent = ?", (user_id, agent))
@@ -0,0 +1,323 @@
+"""
+Durable job queue backed by SQLite.
+
+Frontends enqueue agent runs and read their progress and result by job id, while
+worker processes (see `job_worker.py`) claim and execute them. Jobs survive restarts
+of both sides: a job whose worker stopped sending heartbeats is queued again, up to
+a maximum number of attempts.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+
+DEFAULT_JOB_DB = os.getenv("RESEARCH_AGENT_JOB_DB", "research_jobs.db")
+# Jobs a single user can have running at the same time
+DEFAULT_MAX_RUNNING_PER_USER = int(os.getenv("RESEARCH_AGENT_JOB_MAX_RUNNING_PER_USER", "2"))
+# Times a job is claimed before a lost worker makes it fail instead of being queued again
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("RESEARCH_AGENT_JOB_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT,
+    query TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    lease TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobQueue:
+    """A priority job queue with per-user concurrency caps, stored in a SQLite file.
+
+    Every method opens its own connection, so a JobQueue can be shared between threads,
+    and several processes can use the same file.
+
+    Each claim gives the job a new lease token. The worker passes it back with its events,
+    heartbeats and result, which are ignored once the job was queued again for another
+    worker or cancelled, so a job requeued by mistake never finishes twice.
+
+    Args:
+        path: The SQLite database file.
+        max_running_per_user: Jobs of one user running at the same time; further jobs of
+            that user wait in the queue while other users' jobs are claimed.
+        max_attempts: Claims of a job before it fails instead of being queued again
+            when its worker is lost.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_JOB_DB,
+        max_running_per_user: int = DEFAULT_MAX_RUNNING_PER_USER,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.path = str(path)
+        self.max_running_per_user = max_running_per_user
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before leases and sessions were added
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("lease", "session_id"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(
+        self,
+        query: str,
+        user_id: str = "anonymous",
+        agent: str = "research",
+        priority: int = 0,
+        session_id: Optional[str] = None,
+    ) -> str:
+        """Add a job to the queue. Higher priorities are claimed first.
+
+        Args:
+            session_id: The conversation the query belongs to, whose queries share their
+                tool results. Defaults to the user.
+
+        Returns:
+            str: The job id.
+        """
+        job_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, agent, user_id, session_id, query, priority, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, agent, user_id, session_id or user_id, query, priority, QUEUED, time.time()),
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Mark the next runnable job as running by `worker` and return it, or None if there is none.
+
+        The returned job carries the "lease" to pass to `add_event`, `heartbeat`, `complete` and `fail`.
+        """
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    """
+                    SELECT * FROM jobs AS j
+                    WHERE j.status = ?
+                      AND (SELECT COUNT(*) FROM jobs AS r WHERE r.user_id = j.user_id AND r.status = ?) < ?
+                    ORDER BY j.priority DESC, j.created_at
+                    LIMIT 1
+                    """,
+                    (QUEUED, RUNNING, self.max_running_per_user),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                lease = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, lease = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ?",
+                    (RUNNING, worker, lease, now, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = dict(row)
+        job.update(status=RUNNING, worker=worker, lease=lease, attempts=row["attempts"] + 1)
+        return job
+
+    def add_event(self, job_id: str, event: dict, lease: str) -> bool:
+        """Record a progress event of a running job, which also serves as its heartbeat.
+
+        Returns:
+            bool: False if the job is no longer running under this lease (cancelled or queued
+            again), in which case the event is dropped and the run should stop.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND lease = ?",
+                (time.time(), job_id, RUNNING, lease),
+            )
+            if cursor.rowcount:
+                conn.execute(
+                    "INSERT INTO job_events (job_id, seq, event) "
+                    "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?)",
+                    (job_id, job_id, json.dumps(event)),
+                )
+            conn.execute("COMMIT")
+            return cursor.rowcount > 0
+
+    def heartbeat(self, job_id: str, lease: str) -> bool:
+        """Tell the queue the worker of a job is still alive.
+
+        Returns:
+            bool: False if the job is no longer running under this lease.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND lease = ?",
+                (time.time(), job_id, RUNNING, lease),
+            )
+            return cursor.rowcount > 0
+
+    def _finish(self, job_id: str, lease: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = ? AND lease = ?",
+                (status, result, error, time.time(), job_id, RUNNING, lease),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str, result: str, lease: str) -> bool:
+        """Mark a running job as done with its result.
+
+        Returns:
+            bool: False if the job is no longer running under this lease, and the result was dropped.
+        """
+        return self._finish(job_id, lease, DONE, result=result)
+
+    def fail(self, job_id: str, error: str, lease: str) -> bool:
+        """Mark a running job as failed.
+
+        Returns:
+            bool: False if the job is no longer running under this lease.
+        """
+        return self._finish(job_id, lease, FAILED, error=error)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. A running job stops at its next progress event.
+
+        Returns:
+            bool: Whether the job was still queued or running.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self, heartbeat_timeout: float) -> int:
+        """Queue again the running jobs whose worker sent no heartbeat for `heartbeat_timeout` seconds.
+
+        Jobs already claimed `max_attempts` times fail instead, so a job crashing its workers
+        is not retried forever.
+
+        Returns:
+            int: The number of jobs queued again.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker = NULL, lease = NULL, finished_at = ? "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (FAILED, "The job's worker was lost too many times.", now, RUNNING, now - heartbeat_timeout, self.max_attempts),
+            )
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, now - heartbeat_timeout),
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount
+
+    def prune(self, max_age: float) -> int:
+        """Delete the jobs finished more than `max_age` seconds ago, with their events.
+
+        Returns:
+            int: The number of jobs deleted.
+        """
+        cutoff = time.time() - max_age
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,)
+            )
+            cursor = conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a job by id, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def events(self, job_id: str, after: int = 0) -> List[dict]:
+        """Return the progress events of a job recorded after sequence number `after`.
+
+        Each event carries its sequence number under "seq", to pass as `after` on the next call.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+        return [{**json.loads(row["event"]), "seq": row["seq"]} for row in rows]
+
+    def follow(self, job_id: str, poll_interval: float = 0.5, timeout: Optional[float] = None) -> Iterator[dict]:
+        """Yield the progress events of a job as they are recorded, until it is finished.
+
+        Raises:
+            TimeoutError: If the job is not finished after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        seq = 0
+        while True:
+            job = self.get(job_id)
+            for event in self.events(job_id, after=seq):
+                seq = event["seq"]
+                yield event
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} did not finish within {timeout:g} seconds")
+            time.sleep(poll_interval)
+
+    def stats(self) -> dict:
+        """Return the number of jobs per status."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pytest
+
+from scientific_research_agent.cache import SingleFlight
+from utils import cache
+from utils.cache import TTLCache
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight(max_workers=4)
+    release = threading.Event()
+    calls = []
+
+    def search(query):
+        calls.append(query)
+        release.wait(5)
+        return f"results for {query}"
+
+    with ThreadPoolExecutor(max_workers=5) as callers:
+        futures = [callers.submit(flight.do, "attention", search, "attention") for _ in range(5)]
+        # All the callers are waiting for the same call before it finishes
+        while flight.stats()["calls"] < 5:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ["results for attention"] * 5
+    assert calls == ["attention"]
+    assert flight.stats() == {"inflight": 0, "calls": 5, "shared": 4}
+
+
+def test_a_caller_timing_out_does_not_cancel_the_call_for_the_others():
+    flight = SingleFlight(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def download(url):
+        calls.append(url)
+        release.wait(5)
+        return "paper"
+
+    with pytest.raises(TimeoutError):
+        flight.do("url", download, "url", timeout=0.05)
+    patient = flight.submit("url", download, "url")
+    release.set()
+
+    assert patient.result(timeout=5) == "paper"
+    assert calls == ["url"]
+
+
+def test_calls_after_the_first_finished_run_again():
+    flight = SingleFlight(max_workers=1)
+    calls = []
+    for _ in range(2):
+        flight.do("key", calls.append, "call", timeout=5)
+    assert calls == ["call", "call"]
+    assert flight.get("key") is None
+
+
+def test_failures_are_shared_by_concurrent_callers():
+    flight = SingleFlight(max_workers=1)
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("CORE is down")
+
+    first, second = flight.submit("key", failing), flight.submit("key", failing)
+    release.set()
+    assert first is second
+    with pytest.raises(ValueError):
+        first.result(timeout=5)
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl_cache = TTLCache(max_entries=2, ttl_seconds=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1
+    ttl_cache.set("c", 3)
+    assert "b" not in ttl_cache and ttl_cache.get("a") == 1
+
+    now[0] = 11
+    assert ttl_cache.get("a", "expired") == "expired"
+    ttl_cache.set("d", 4, ttl_seconds=60)
+    now[0] = 30
+    assert ttl_cache.get("d") == 4
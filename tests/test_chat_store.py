@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from utils.chat_store import ChatStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChatStore(tmp_path / "chat.db")
+
+
+def message(message_id: str, role: str = "user", content: str = None) -> dict:
+    return {"id": message_id, "role": role, "content": content or f"content of {message_id}", "timestamp": "t"}
+
+
+def test_replies_are_placed_after_their_question(store):
+    store.add_message("alice", "research", message("q1"))
+    store.add_message("alice", "research", message("q2"))
+    # The second question is answered first
+    store.add_message("alice", "research", message("a2", "assistant"), reply_to="q2")
+    store.add_message("alice", "research", message("a1", "assistant"), reply_to="q1")
+    store.add_message("alice", "research", message("q3"))
+
+    assert [m["id"] for m in store.tail("alice", "research", 10)] == ["q1", "a1", "q2", "a2", "q3"]
+
+
+def test_replies_to_deleted_questions_are_dropped(store):
+    store.add_message("alice", "research", message("q1"))
+    store.clear("alice", "research")
+    assert store.add_message("alice", "research", message("a1", "assistant"), reply_to="q1") is None
+    assert store.count("alice", "research") == 0
+
+
+def test_conversations_are_paged_from_the_end(store):
+    for i in range(7):
+        store.add_message("alice", "research", message(f"m{i}"))
+    store.add_message("bob", "research", message("other user"))
+    store.add_message("alice", "chiron", message("other agent"))
+
+    pages = [store.tail("alice", "research", 3)]
+    while pages[-1]:
+        pages.append(store.before("alice", "research", pages[-1][0]["position"], 3))
+    assert [[m["id"] for m in page] for page in pages] == [["m4", "m5", "m6"], ["m1", "m2", "m3"], ["m0"], []]
+    assert store.count("alice", "research") == 7
+
+
+def test_contents_are_stored_compressed_and_read_back(store, tmp_path):
+    content = "Résumé des réponses 🧪 " * 500
+    store.add_message("alice", "research", dict(message("q1", content=content), query_id="q1"))
+
+    (read,) = store.tail("alice", "research", 1)
+    assert read["content"] == content
+    assert read["query_id"] == "q1"
+    with sqlite3.connect(tmp_path / "chat.db") as conn:
+        (blob,) = conn.execute("SELECT content FROM chat_messages WHERE id = 'q1'").fetchone()
+    assert len(blob) < len(content.encode("utf-8")) / 10
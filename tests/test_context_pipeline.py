@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from chiron_learning_agent.context_pipeline import (
+    AdaptiveBatchSize,
+    embed_into_storage,
+    ingest_context,
+    iter_chunks,
+    iter_windows,
+)
+from chiron_learning_agent.context_storage import ContextStorage
+from chiron_learning_agent.near_duplicates import NearDuplicateFilter
+
+
+def paragraph_chunker(texts: List[str]) -> List[list]:
+    """Chunks each text into its paragraphs, stripped like the semantic chunker's."""
+    return [
+        [SimpleNamespace(content=paragraph.strip()) for paragraph in text.split("\n\n") if paragraph.strip()]
+        for text in texts
+    ]
+
+
+class LengthEmbeddings(Embeddings):
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+PARAGRAPHS = [f"Paragraph {i} says something about topic {i}. It has a second sentence." for i in range(12)]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def test_windows_cover_the_text_and_end_at_boundaries():
+    windows = list(iter_windows(TEXT, window_chars=100))
+    assert "".join(windows) == TEXT
+    assert all(len(window) <= 100 for window in windows)
+    assert all(window.endswith(("\n\n", ". ")) for window in windows[:-1])
+
+
+def test_chunks_across_windows_keep_paragraph_breaks():
+    for window_chars in (60, 100, 250):
+        assert list(iter_chunks(TEXT, paragraph_chunker, window_chars)) == PARAGRAPHS
+
+
+def test_words_cut_by_a_window_are_joined_back():
+    text = "x" * 45 + "\n\n" + "y" * 10
+    assert list(iter_chunks(text, paragraph_chunker, window_chars=20)) == ["x" * 45, "y" * 10]
+
+
+def test_embedding_batches_are_bounded_and_stored_in_order(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    embeddings = LengthEmbeddings()
+    batch_size = AdaptiveBatchSize(minimum=3, maximum=3)
+
+    stored = embed_into_storage(iter(PARAGRAPHS), embeddings, storage, "key", concurrency=2, batch_size=batch_size)
+    assert stored == len(PARAGRAPHS)
+    assert all(len(batch) == 3 for batch in embeddings.batches)
+    assert storage.get_context("key").chunks == PARAGRAPHS
+
+
+def test_ingest_drops_near_duplicates_and_replaces_the_context(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context(["stale"], [[1.0, 1.0]], key="key")
+    text = TEXT + "\n\n" + PARAGRAPHS[0]
+
+    stored = ingest_context(
+        text, paragraph_chunker, LengthEmbeddings(), storage, "key", window_chars=100, near_duplicates=NearDuplicateFilter()
+    )
+    assert stored == len(PARAGRAPHS)
+    assert storage.get_context("key").chunks == PARAGRAPHS
+
+
+def test_ingest_of_an_empty_context_keeps_the_key(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    assert ingest_context("", paragraph_chunker, LengthEmbeddings(), storage, "key") == 0
+    assert len(storage.get_context("key")) == 0
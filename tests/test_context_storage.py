@@ -0,0 +1,83 @@
+import os
+
+from chiron_learning_agent.context_storage import ContextStorage
+
+
+def test_spilled_empty_context_accepts_embeddings_again(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context([], [], key="empty")
+    with storage._lock:
+        storage._spill("empty")
+
+    assert len(storage.get_context("empty")) == 0
+    storage.add_to_context(["chunk"], [[1.0, 0.0, 0.0]], key="empty")
+    assert storage.get_context("empty").search_chunks([1.0, 0.0, 0.0], k=1) == [["chunk"]]
+
+
+def test_spilled_context_is_read_back(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], key="key")
+    with storage._lock:
+        storage._spill("key")
+
+    vector_store = storage.get_context("key")
+    assert vector_store.memory_mapped
+    storage.add_to_context(["c"], [[1.0, 1.0]], key="key")
+    assert storage.get_context("key").chunks == ["a", "b", "c"]
+
+
+def test_spills_of_finished_processes_are_removed_on_startup(tmp_path):
+    running = ContextStorage(spill_dir=tmp_path)
+    running.save_context(["a"], [[1.0, 0.0]], key="key")
+    with running._lock:
+        running._spill("key")
+    # A process id above the kernel's limit is never running
+    finished = tmp_path / "999999999-abcdef01" / "context"
+    finished.mkdir(parents=True)
+    unversioned = tmp_path / "0123abcd"
+    unversioned.mkdir()
+
+    ContextStorage(spill_dir=tmp_path)
+    if os.name == "posix":
+        assert not finished.parent.exists() and not unversioned.exists()
+    assert running.spill_dir.exists()
+    assert running.get_context("key").chunks == ["a"]
+
+
+def test_deleting_a_reloaded_context_removes_its_spill(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context(["a"], [[1.0, 0.0]], key="key")
+    with storage._lock:
+        storage._spill("key")
+    path = storage._spill_path("key")
+    assert storage.get_context("key").memory_mapped and path.exists()
+
+    storage.delete_context("key")
+    assert not path.exists()
+    assert list(storage.spill_dir.iterdir()) == []
+
+
+def test_replacing_a_reloaded_context_removes_its_spill(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context(["a"], [[1.0, 0.0]], key="key")
+    with storage._lock:
+        storage._spill("key")
+    storage.get_context("key")
+
+    storage.save_context(["b"], [[0.0, 1.0]], key="key")
+    assert not storage._spill_path("key").exists()
+    assert storage.get_context("key").chunks == ["b"]
+
+
+def test_respilling_a_modified_context_keeps_earlier_maps_readable(tmp_path):
+    storage = ContextStorage(spill_dir=tmp_path)
+    storage.save_context(["a"], [[1.0, 0.0]], key="key")
+    with storage._lock:
+        storage._spill("key")
+    mapped = storage.get_context("key").vectors
+
+    storage.add_to_context(["b"], [[0.0, 1.0]], key="key")
+    with storage._lock:
+        storage._spill("key")
+    assert mapped.tolist() == [[1.0, 0.0]]
+    assert storage.get_context("key").chunks == ["a", "b"]
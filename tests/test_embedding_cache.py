@@ -0,0 +1,56 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from chiron_learning_agent.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds a text as its length and the sum of the keyword arguments given, counting the texts embedded."""
+
+    def __init__(self):
+        self.embedded: List[str] = []
+
+    def _vector(self, text: str, kwargs: dict) -> List[float]:
+        return [float(len(text)), float(kwargs.get("output_dimensionality") or 0), 1.0 if kwargs.get("task_type") else 0.0]
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [self._vector(text, kwargs) for text in texts]
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        self.embedded.append(text)
+        return self._vector(text, kwargs)
+
+
+def test_only_misses_are_embedded_in_batches(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, path=tmp_path / "cache.db", dtype="float32", batch_size=2)
+
+    assert cache.embed_documents(["a", "bb", "a"]) == [[1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [1.0, 0.0, 0.0]]
+    assert cache.embed_documents(["bb", "ccc"]) == [[2.0, 0.0, 0.0], [3.0, 0.0, 0.0]]
+    assert model.embedded == ["a", "bb", "ccc"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+
+
+def test_cache_is_shared_through_the_database(tmp_path):
+    model = CountingEmbeddings()
+    CachedEmbeddings(model, path=tmp_path / "cache.db").embed_documents(["text"])
+    assert CachedEmbeddings(model, path=tmp_path / "cache.db").embed_documents(["text"]) == [[4.0, 0.0, 0.0]]
+    assert model.embedded == ["text"]
+
+
+def test_every_keyword_argument_is_part_of_the_key(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, path=tmp_path / "cache.db")
+
+    assert cache.embed_documents(["text"]) == [[4.0, 0.0, 0.0]]
+    assert cache.embed_documents(["text"], task_type="retrieval_document") == [[4.0, 0.0, 1.0]]
+    assert cache.embed_documents(["text"], output_dimensionality=8) == [[4.0, 8.0, 0.0]]
+    assert cache.embed_documents(["text"], output_dimensionality=16) == [[4.0, 16.0, 0.0]]
+    assert cache.embed_documents(["text"], output_dimensionality=8) == [[4.0, 8.0, 0.0]]
+    assert len(model.embedded) == 4
+
+    assert cache.embed_query("text", output_dimensionality=8) == [4.0, 8.0, 0.0]
+    assert cache.embed_query("text", output_dimensionality=8) == [4.0, 8.0, 0.0]
+    assert len(model.embedded) == 5
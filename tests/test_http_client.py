@@ -0,0 +1,164 @@
+import http.server
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import urllib3
+
+from scientific_research_agent import agent_tools, core_api_wrapper, http_client
+from scientific_research_agent.http_client import HttpClient, get_circuit_breaker
+
+
+class FakeResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.data = json.dumps(body or {}).encode("utf-8")
+        self.headers = headers or {}
+        self.released = False
+
+    def json(self):
+        return json.loads(self.data)
+
+    def drain_conn(self):
+        pass
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakePoolManager:
+    """Answers each request with the next item of `outcomes`, raising it if it is an exception."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(http_client.time, "sleep", delays.append)
+    return delays
+
+
+def unique_url():
+    host = f"test-{uuid.uuid4().hex[:8]}.example.org"
+    return host, f"https://{host}/search"
+
+
+def test_overload_statuses_are_retried_honouring_retry_after(sleeps):
+    host, url = unique_url()
+    overloaded = FakeResponse(503, headers={"Retry-After": "7"})
+    pool = FakePoolManager([FakeResponse(429), overloaded, FakeResponse(200, {"results": []})])
+    client = HttpClient(pool, retries=2, backoff=0.5, hedge_after=None)
+
+    assert client.request("GET", url).status == 200
+    assert pool.calls == 3
+    assert sleeps == [0.5, 7.0]
+    assert overloaded.released
+
+
+def test_retry_after_longer_than_the_cap_returns_the_error(sleeps):
+    _, url = unique_url()
+    pool = FakePoolManager([FakeResponse(503, headers={"Retry-After": "3600"})])
+    client = HttpClient(pool, retries=2, hedge_after=None)
+
+    assert client.request("GET", url).status == 503
+    assert pool.calls == 1 and sleeps == []
+
+
+def test_one_failed_request_counts_once_in_the_circuit(sleeps):
+    host, url = unique_url()
+    pool = FakePoolManager([urllib3.exceptions.ReadTimeoutError(None, url, "timed out")] * 3)
+    client = HttpClient(pool, retries=2, hedge_after=None)
+
+    with pytest.raises(urllib3.exceptions.ReadTimeoutError):
+        client.request("GET", url)
+    breaker = get_circuit_breaker(host)
+    assert pool.calls == 3
+    assert breaker.failures == 1
+    assert breaker.state == "closed"
+
+
+def test_core_errors_are_raised_and_not_cached(monkeypatch, sleeps):
+    pool = FakePoolManager([FakeResponse(429, {"message": "Too many requests"})] * 6)
+    monkeypatch.setattr(core_api_wrapper, "core_client", HttpClient(pool, retries=2, hedge_after=None))
+    query = f"rate limited query {uuid.uuid4().hex}"
+
+    with pytest.raises(core_api_wrapper.CoreAPIError):
+        agent_tools.cached_search(query, max_papers=1)
+    assert (agent_tools.normalize_search_query(query), 1) not in agent_tools.search_cache
+    assert agent_tools.search_paper.invoke({"query": query}).startswith("Error searching for papers")
+    get_circuit_breaker("api.core.ac.uk").record_success()
+
+
+class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.active -= 1
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    KeepAliveHandler.active = KeepAliveHandler.max_active = 0
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_pools_are_sized_per_host(monkeypatch):
+    monkeypatch.setitem(http_client.HOST_POOL_SIZES, "127.0.0.1", 5)
+    manager = http_client.KeepAlivePoolManager()
+    assert manager.connection_from_host("127.0.0.1", 8000, "http").pool.maxsize == 5
+    assert manager.connection_from_host("other.example.org", 443, "https").pool.maxsize == http_client.DEFAULT_POOL_SIZE
+    # Explicit pool arguments win over the table
+    assert manager.connection_from_host("127.0.0.1", 8001, "http", {"maxsize": 7}).pool.maxsize == 7
+
+
+def test_connections_are_reused_and_capped_per_host(monkeypatch, local_server):
+    monkeypatch.setitem(http_client.HOST_POOL_SIZES, "127.0.0.1", 1)
+    http_client.connection_stats.reset()
+    manager = http_client.KeepAlivePoolManager()
+    url = f"http://127.0.0.1:{local_server}/paper.pdf"
+
+    for _ in range(3):
+        assert manager.request("GET", url).data == b"ok"
+    assert http_client.connection_stats.snapshot()["127.0.0.1"] == {"opened": 1, "requests": 3, "reused": 2}
+
+    # With a single connection to the host, concurrent requests are sent one at a time
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        bodies = list(executor.map(lambda _: manager.request("GET", url).data, range(4)))
+    assert bodies == [b"ok"] * 4
+    assert KeepAliveHandler.max_active == 1
+    assert http_client.connection_stats.snapshot()["127.0.0.1"]["opened"] == 1
@@ -0,0 +1,49 @@
+"""Cold start budget of the Streamlit app: importing it must not pull in the agents."""
+
+import os
+import re
+import subprocess
+import sys
+
+from conftest import SRC_DIR
+
+# Cumulative import time of streamlit_main, Streamlit included, in milliseconds
+IMPORT_BUDGET_MS = float(os.getenv("RESEARCH_AGENT_IMPORT_BUDGET_MS", "1500"))
+# Loaded on first use by load_research_agent, never at module load
+HEAVY_MODULES = (
+    "scientific_research_agent.workflow",
+    "langgraph",
+    "langchain_core",
+    "langchain_google_genai",
+    "pdfplumber",
+)
+
+
+def import_streamlit_main(tmp_path) -> subprocess.CompletedProcess:
+    secrets = tmp_path / ".streamlit" / "secrets.toml"
+    secrets.parent.mkdir()
+    secrets.write_text('[secrets]\nGOOGLE_API_KEY = "test"\nCORE_API_KEY = "test"\nTAVILY_API_KEY = "test"\n')
+    code = (
+        "import sys, streamlit_main; "
+        f"print('LOADED', [m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR)},
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_streamlit_main_import_budget(tmp_path):
+    result = import_streamlit_main(tmp_path)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    loaded = re.search(r"LOADED (\[.*\])", result.stdout).group(1)
+    assert loaded == "[]", f"Heavy modules imported at module load: {loaded}"
+
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| streamlit_main$", result.stderr, re.MULTILINE)
+    cumulative_ms = int(match.group(1)) / 1000
+    assert cumulative_ms < IMPORT_BUDGET_MS, f"Importing streamlit_main took {cumulative_ms:.0f} ms"
@@ -0,0 +1,123 @@
+import sqlite3
+import time
+
+import pytest
+
+import job_worker
+from utils.job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "jobs.db", max_running_per_user=2, max_attempts=2)
+
+
+def test_lost_jobs_fail_after_max_attempts(queue):
+    job_id = queue.enqueue("poison")
+    for _ in range(2):
+        assert queue.claim("w")["id"] == job_id
+        # Every running job is stale with a negative timeout
+        queue.requeue_stale(-1)
+    job = queue.get(job_id)
+    assert job["status"] == FAILED and job["attempts"] == 2
+    assert queue.claim("w") is None
+
+
+def test_requeued_job_cannot_be_finished_by_its_first_worker(queue):
+    job_id = queue.enqueue("query")
+    first = queue.claim("w1")
+    assert queue.requeue_stale(-1) == 1
+    second = queue.claim("w2")
+    assert first["lease"] != second["lease"]
+
+    assert not queue.add_event(job_id, {"type": "step"}, lease=first["lease"])
+    assert not queue.heartbeat(job_id, lease=first["lease"])
+    assert not queue.complete(job_id, "stale answer", lease=first["lease"])
+    assert queue.get(job_id)["status"] == RUNNING
+
+    assert queue.add_event(job_id, {"type": "step"}, lease=second["lease"])
+    assert queue.complete(job_id, "answer", lease=second["lease"])
+    job = queue.get(job_id)
+    assert (job["status"], job["result"]) == (DONE, "answer")
+    assert [event["type"] for event in queue.events(job_id)] == ["step"]
+
+
+def test_cancelled_job_rejects_events(queue):
+    job_id = queue.enqueue("query")
+    job = queue.claim("w")
+    assert queue.cancel(job_id)
+    assert not queue.add_event(job_id, {"type": "step"}, lease=job["lease"])
+    assert not queue.fail(job_id, "error", lease=job["lease"])
+    assert queue.get(job_id)["status"] == CANCELLED
+
+
+def test_prune_deletes_old_finished_jobs_and_events(queue):
+    old_id = queue.enqueue("old")
+    job = queue.claim("w")
+    queue.add_event(old_id, {"type": "step"}, lease=job["lease"])
+    queue.complete(old_id, "answer", lease=job["lease"])
+    pending_id = queue.enqueue("pending")
+
+    assert queue.prune(max_age=-1) == 1
+    assert queue.get(old_id) is None and queue.events(old_id) == []
+    assert queue.get(pending_id)["status"] == QUEUED
+
+
+def test_databases_without_leases_or_sessions_are_migrated(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, agent TEXT NOT NULL, user_id TEXT NOT NULL, query TEXT NOT NULL, "
+            "priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, result TEXT, error TEXT, worker TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)"
+        )
+    queue = JobQueue(path)
+    queue.enqueue("query", user_id="alice")
+    job = queue.claim("w")
+    assert job["lease"] and job["session_id"] == "alice"
+
+
+def test_worker_runs_jobs_in_their_conversation_session(queue):
+    queue.enqueue("query", user_id="alice", session_id="alice:cleared")
+    queue.enqueue("query", user_id="alice", session_id="alice:new")
+    sessions = []
+
+    def agent(query, session_id=None):
+        sessions.append(session_id)
+        yield {"type": "done", "content": "answer"}
+
+    for _ in range(2):
+        job_worker.run_job(queue, queue.claim("w"), {"research": agent})
+    assert sessions == ["alice:cleared", "alice:new"]
+
+
+def test_worker_sends_heartbeats_during_silent_steps(queue, monkeypatch):
+    monkeypatch.setattr(job_worker, "HEARTBEAT_INTERVAL", 0.05)
+    job_id = queue.enqueue("query")
+    job = queue.claim("w")
+    claimed_heartbeat = queue.get(job_id)["heartbeat_at"]
+
+    def silent_agent(query, session_id=None):
+        # A long LLM call emitting no event
+        time.sleep(0.3)
+        yield {"type": "done", "content": "answer"}
+
+    job_worker.run_job(queue, job, {"research": silent_agent})
+    job = queue.get(job_id)
+    assert job["status"] == DONE and job["result"] == "answer"
+    assert job["heartbeat_at"] > claimed_heartbeat
+
+
+def test_worker_stops_a_job_taken_over_by_another_worker(queue):
+    job_id = queue.enqueue("query")
+    job = queue.claim("w1")
+
+    def agent(query, session_id=None):
+        queue.requeue_stale(-1)
+        queue.claim("w2")
+        yield {"type": "step"}
+        yield {"type": "done", "content": "stale answer"}
+
+    job_worker.run_job(queue, job, {"research": agent})
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.events(job_id) == []
@@ -0,0 +1,74 @@
+import pytest
+
+from scientific_research_agent import judge
+from scientific_research_agent.judge import cited_references, local_answer_checks
+from scientific_research_agent.tool_index import evidence_sources, index_entry
+
+SEARCH_RESULT = (
+    "* ID: 1234,\n* Title: Attention Is All You Need,\n* Published Date: 2017,\n"
+    "* Authors: Vaswani and others,\n* Abstract: The Transformer...,\n"
+    "* Paper URLs: ['https://arxiv.org/abs/1706.03762']"
+)
+PAPER_URL = "https://arxiv.org/pdf/1706.03762"
+QUERY = "How does the transformer attention mechanism replace recurrence?"
+GOOD_ANSWER = (
+    "The Transformer replaces recurrence with self-attention: every position attends to every other "
+    "position of the sequence through scaled dot-product attention, and multi-head attention lets the "
+    "model attend to several representation subspaces at once. Without recurrence the computation is "
+    "parallel across positions, which shortens training considerably (Vaswani et al., "
+    "https://arxiv.org/abs/1706.03762)."
+)
+
+
+@pytest.fixture(autouse=True)
+def early_accept(monkeypatch):
+    monkeypatch.setattr(judge, "JUDGE_EARLY_ACCEPT", True)
+
+
+def search_evidence():
+    entry = index_entry("search-paper", {"query": "attention is all you need"}, "m1", SEARCH_RESULT)
+    return evidence_sources({"search": entry})
+
+
+def test_answer_citing_retrieved_sources_is_accepted():
+    assert local_answer_checks(QUERY, GOOD_ANSWER, search_evidence()) == (True, None)
+
+
+def test_arxiv_pdf_and_abstract_urls_are_the_same_source():
+    entry = index_entry("download-paper", {"url": PAPER_URL}, "m1", "Full paper text")
+    assert local_answer_checks(QUERY, GOOD_ANSWER, evidence_sources({"download": entry})) == (True, None)
+
+
+def test_empty_answer_is_rejected():
+    accept, feedback = local_answer_checks(QUERY, "  ")
+    assert accept is False and feedback
+
+
+def test_stopword_only_query_goes_to_the_judge():
+    query = f"Download and summarize the findings of this paper: {PAPER_URL}"
+    apology = (
+        f"I am sorry, but I could not download the paper at {PAPER_URL}. The server did not answer in "
+        "time and every retry failed, so I am unable to summarize it at the moment. Please check that "
+        "the link is correct and publicly accessible, or try again later when the repository is "
+        "reachable again. I apologize for the inconvenience this may cause."
+    )
+    entry = index_entry("download-paper", {"url": PAPER_URL}, "m1", "Full paper text")
+    assert local_answer_checks(query, apology, evidence_sources({"download": entry})) == (None, None)
+
+
+def test_citations_missing_from_the_tool_results_go_to_the_judge():
+    answer = GOOD_ANSWER.replace("https://arxiv.org/abs/1706.03762", "https://example.org/made-up-paper")
+    assert local_answer_checks(QUERY, answer, search_evidence()) == (None, None)
+    assert local_answer_checks(QUERY, GOOD_ANSWER, []) == (None, None)
+
+
+def test_failed_tool_calls_provide_no_evidence():
+    entry = index_entry("download-paper", {"url": PAPER_URL}, "m1", "Error downloading paper: timed out")
+    assert evidence_sources({"download": entry}) == []
+    assert local_answer_checks(QUERY, GOOD_ANSWER, evidence_sources({"download": entry})) == (None, None)
+
+
+def test_author_year_mentions_are_not_verifiable_citations():
+    answer = GOOD_ANSWER.replace(", https://arxiv.org/abs/1706.03762", "") + " See also arXiv and [1]."
+    assert cited_references(answer) == []
+    assert local_answer_checks(QUERY, answer, search_evidence()) == (None, None)
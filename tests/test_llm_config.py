@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from scientific_research_agent.llm_config import DEFAULT_NODE_MODELS, NodeLLMRegistry, load_node_config
+from scientific_research_agent.metrics import LatencyMetrics, latency_metrics
+from scientific_research_agent.pydantic_models import NodeModelConfig
+
+
+def test_defaults_without_overrides(monkeypatch):
+    for suffix in ("MODEL", "TEMPERATURE", "MAX_OUTPUT_TOKENS"):
+        monkeypatch.delenv(f"RESEARCH_AGENT_JUDGE_{suffix}", raising=False)
+    assert load_node_config("judge") == DEFAULT_NODE_MODELS["judge"]
+
+
+def test_env_overrides(monkeypatch):
+    monkeypatch.setenv("RESEARCH_AGENT_JUDGE_MODEL", "gemini-test")
+    monkeypatch.setenv("RESEARCH_AGENT_JUDGE_TEMPERATURE", "0.3")
+    monkeypatch.setenv("RESEARCH_AGENT_JUDGE_MAX_OUTPUT_TOKENS", "64")
+    config = load_node_config("judge")
+    assert (config.model, config.temperature, config.max_output_tokens) == ("gemini-test", 0.3, 64)
+
+
+@pytest.mark.parametrize("value", ["0", "none", "None"])
+def test_env_override_removes_output_cap(monkeypatch, value):
+    monkeypatch.setenv("RESEARCH_AGENT_PLANNING_MAX_OUTPUT_TOKENS", value)
+    assert load_node_config("planning").max_output_tokens is None
+
+
+def test_unknown_node_uses_agent_defaults(monkeypatch):
+    monkeypatch.delenv("RESEARCH_AGENT_SOMETHING_ELSE_MODEL", raising=False)
+    assert load_node_config("something_else").model == DEFAULT_NODE_MODELS["agent"].model
+
+
+def test_configure_factory_and_configs():
+    built = []
+
+    def factory(config):
+        built.append(config.model)
+        return FakeListChatModel(responses=["fake answer"])
+
+    registry = NodeLLMRegistry(bindings={})
+    registry.configure(factory=factory, configs={"judge": NodeModelConfig(model="fake-lite", temperature=0)})
+    assert registry.get("judge") is registry.get("judge")
+    assert built == ["fake-lite"]
+
+    latency_metrics.reset()
+    assert registry.invoke("judge", "question").content == "fake answer"
+    assert registry.invoke("agent", "question").content == "fake answer"
+    assert latency_metrics.summary(group_by="node")["judge"]["count"] == 1
+    by_model = latency_metrics.summary(group_by="model")
+    assert by_model["fake-lite"]["count"] == 1
+    assert by_model[DEFAULT_NODE_MODELS["agent"].model]["count"] == 1
+    latency_metrics.reset()
+
+
+def test_bindings_wrap_the_base_model():
+    registry = NodeLLMRegistry(
+        bindings={"judge": lambda llm: ("bound", llm)},
+        factory=lambda config: FakeListChatModel(responses=["x"]),
+    )
+    bound = registry.get("judge")
+    assert bound[0] == "bound" and isinstance(bound[1], FakeListChatModel)
+
+
+def test_latency_summary_per_node_and_tier():
+    metrics = LatencyMetrics(max_samples=3)
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        metrics.record("judge", "lite", seconds)
+    metrics.record("planning", "flash", 5.0)
+    metrics.record("agent", "flash", 7.0)
+
+    by_node = metrics.summary(group_by="node")
+    # Only the last `max_samples` samples are kept
+    assert by_node["judge"] == {"count": 3, "mean_s": 3.0, "p50_s": 3.0, "p95_s": 3.0, "max_s": 4.0}
+    assert metrics.summary(group_by="model")["flash"]["count"] == 2
+    with pytest.raises(ValueError):
+        metrics.summary(group_by="user")
+    metrics.reset()
+    assert metrics.summary() == {}
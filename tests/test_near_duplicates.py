@@ -0,0 +1,28 @@
+from chiron_learning_agent.near_duplicates import NearDuplicateFilter
+
+
+CHUNK = " ".join(f"word{i}" for i in range(200))
+
+
+def test_near_duplicates_are_dropped_and_distinct_chunks_kept():
+    near_duplicates = NearDuplicateFilter()
+    reworded = CHUNK.replace("word100 ", "other ")
+    distinct = " ".join(f"term{i}" for i in range(200))
+
+    assert list(near_duplicates.filter([CHUNK, reworded, distinct, CHUNK])) == [CHUNK, distinct]
+    stats = near_duplicates.stats(dim=4)
+    assert (stats["chunks_seen"], stats["duplicates"], stats["embeddings_saved"]) == (4, 2, 2)
+    assert stats["bytes_saved"] == len(reworded) + len(CHUNK) + 2 * 4 * 4
+
+
+def test_stats_since_an_earlier_snapshot_count_only_later_chunks():
+    near_duplicates = NearDuplicateFilter()
+    near_duplicates.is_duplicate(CHUNK)
+    near_duplicates.is_duplicate(CHUNK)
+    before = near_duplicates.stats()
+
+    near_duplicates.is_duplicate(CHUNK)
+    near_duplicates.is_duplicate("a short unrelated chunk")
+    stats = near_duplicates.stats(since=before)
+    assert (stats["chunks_seen"], stats["duplicates"], stats["chars_saved"]) == (2, 1, len(CHUNK))
+    assert near_duplicates.stats()["duplicates"] == 2
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from scientific_research_agent import prefetch
+from scientific_research_agent.core_api_wrapper import SEARCH_RESULTS_SEPARATOR
+
+
+def make_search_output(urls):
+    return SEARCH_RESULTS_SEPARATOR.join(f"* Title: Paper {i}\n* Paper URLs: ['{url}']" for i, url in enumerate(urls))
+
+
+def test_concurrent_prefetches_stay_within_the_run_budget(monkeypatch):
+    max_bytes_given = []
+    lock = threading.Lock()
+
+    def fake_fetch_paper(url, max_bytes=None, cancel_event=None):
+        with lock:
+            max_bytes_given.append(max_bytes)
+        time.sleep(0.05)
+        # Every paper uses its whole allowance
+        return f"text of {url}", max_bytes
+
+    monkeypatch.setattr(prefetch, "PAPER_PREFETCH_ENABLED", True)
+    monkeypatch.setattr(prefetch, "fetch_paper", fake_fetch_paper)
+    monkeypatch.setattr(prefetch, "is_host_available", lambda url: True)
+    prefetcher = prefetch.PaperPrefetcher(max_workers=2, byte_budget=1000)
+
+    urls = [f"https://example.org/budget-test-{time.time_ns()}-{i}.pdf" for i in range(4)]
+    prefetcher.prefetch("run", make_search_output(urls), top_n=4)
+    for future in prefetcher._runs["run"]["futures"]:
+        future.exception()
+
+    assert sum(max_bytes_given) <= 1000
+    assert prefetcher.stats()["bytes_fetched"] <= 1000
+    prefetcher.cancel_run("run")
+
+
+def test_unused_reservation_is_given_back(monkeypatch):
+    monkeypatch.setattr(prefetch, "fetch_paper", lambda url, max_bytes=None, cancel_event=None: ("text", 100))
+    prefetcher = prefetch.PaperPrefetcher(max_workers=2, byte_budget=1000)
+    prefetcher._runs["run"] = {"remaining": 1000, "cancel": threading.Event(), "futures": []}
+
+    prefetcher._fetch("run", f"https://example.org/reservation-{time.time_ns()}.pdf")
+    assert prefetcher._runs["run"]["remaining"] == 900
+
+
+def blocking_search(monkeypatch):
+    """Replace the CORE search by one waiting for the returned event, recording its queries."""
+    release, queries = threading.Event(), []
+
+    def fake_cached_search(query, max_papers=1):
+        queries.append(query)
+        release.wait(5)
+        return make_search_output([f"https://example.org/{query.replace(' ', '-')}-{i}.pdf" for i in range(max_papers)])
+
+    monkeypatch.setattr(prefetch, "SPECULATIVE_SEARCH_ENABLED", True)
+    monkeypatch.setattr(prefetch, "cached_search", fake_cached_search)
+    return release, queries
+
+
+def test_speculative_search_is_claimed_by_a_matching_query(monkeypatch):
+    release, queries = blocking_search(monkeypatch)
+    speculative = prefetch.SpeculativeSearch(max_workers=1)
+    assert speculative.start("run", "What is Attention?")
+    # Speculations for URLs and a second one for the same run are skipped
+    assert not speculative.start("run", "What is attention?")
+    assert not speculative.start("other", "Summarize https://arxiv.org/abs/1706.03762")
+    release.set()
+
+    papers = speculative.claim("run", "what is attention", max_papers=2, timeout=5)
+    assert papers.count("* Paper URLs:") == 2
+    assert queries == ["What is Attention?"]
+    # Consumed by the first claim
+    assert speculative.claim("run", "what is attention") is None
+    assert speculative.stats() == {"pending": 0, "hits": 1, "misses": 0}
+
+
+def test_speculative_search_is_discarded_on_a_mismatch(monkeypatch):
+    release, queries = blocking_search(monkeypatch)
+    speculative = prefetch.SpeculativeSearch(max_workers=1)
+    speculative.start("busy", "first query")
+    speculative.start("run", "transformers")
+
+    # The speculation of "run" is still queued behind "busy", so it never runs
+    assert speculative.claim("run", "convolutional networks") is None
+    release.set()
+    assert speculative.claim("busy", "first query", timeout=5) is not None
+    assert queries == ["first query"]
+    assert speculative.stats() == {"pending": 0, "hits": 1, "misses": 1}
+
+
+def test_discarded_speculation_is_cancelled(monkeypatch):
+    release, queries = blocking_search(monkeypatch)
+    speculative = prefetch.SpeculativeSearch(max_workers=1)
+    speculative.start("busy", "first query")
+    speculative.start("run", "transformers")
+
+    speculative.discard("run")
+    release.set()
+    speculative.discard("busy")
+    speculative._executor.shutdown(wait=True)
+    assert queries == ["first query"]
+    assert speculative.claim("run", "transformers") is None
+    assert speculative.stats()["pending"] == 0
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+import server_main
+
+
+def fake_agent(query, session_id=None):
+    yield {"type": "node", "node": "planning"}
+    yield {"type": "answer", "content": f"Draft about {query}"}
+    yield {"type": "done", "content": f"Answer about {query} for {session_id}"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(server_main.AGENTS, "research", fake_agent)
+    # Run slots are bound to the event loop of their first use
+    monkeypatch.setattr(server_main, "run_slots", server_main.RunSlots(2))
+    # Not entered as a context manager: the lifespan would shut the agent executor down
+    return TestClient(server_main.app)
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_invoke_returns_the_answer(client):
+    response = client.post("/agents/research/invoke", json={"query": "attention", "session_id": "alice:1"})
+    assert response.status_code == 200
+    assert response.json() == {"answer": "Answer about attention for alice:1"}
+    assert server_main.run_slots.active == 0
+
+
+def test_stream_sends_each_event_as_sse(client):
+    response = client.post("/agents/research/stream", json={"query": "attention"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert parse_sse(response.text) == [
+        ("node", {"type": "node", "node": "planning"}),
+        ("answer", {"type": "answer", "content": "Draft about attention"}),
+        ("done", {"type": "done", "content": "Answer about attention for None"}),
+    ]
+    assert server_main.run_slots.active == 0
+
+
+@pytest.mark.parametrize("body", [{}, {"query": "  "}, {"query": 3}, ["attention"]])
+def test_requests_without_a_query_are_rejected(client, body):
+    response = client.post("/agents/research/invoke", json=body)
+    assert response.status_code == 400
+    assert "query" in response.json()["error"]
+
+
+def test_invalid_json_is_rejected(client):
+    response = client.post("/agents/research/stream", content=b"not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+
+def test_unknown_agents_are_not_found(client):
+    response = client.post("/agents/chiron/invoke", json={"query": "attention"})
+    assert response.status_code == 404
+    assert response.json() == {"error": "Unknown agent: chiron"}
+
+
+@pytest.mark.parametrize("endpoint", ["invoke", "stream"])
+def test_busy_server_answers_503(client, monkeypatch, endpoint):
+    monkeypatch.setattr(server_main, "run_slots", server_main.RunSlots(0))
+    monkeypatch.setattr(server_main, "QUEUE_TIMEOUT", 0.05)
+    response = client.post(f"/agents/research/{endpoint}", json={"query": "attention"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_agent_errors_end_the_run_with_a_message(client, monkeypatch):
+    def failing_agent(query):
+        yield {"type": "node", "node": "planning"}
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setitem(server_main.AGENTS, "research", failing_agent)
+    response = client.post("/agents/research/invoke", json={"query": "attention"})
+    assert response.status_code == 200
+    assert "model unavailable" in response.json()["answer"]
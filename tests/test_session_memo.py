@@ -0,0 +1,63 @@
+from scientific_research_agent import session_memo as session_memo_module
+from scientific_research_agent.session_memo import SessionToolMemo
+
+
+def download(url: str) -> dict:
+    return {"url": url}
+
+
+def test_results_are_kept_per_session():
+    memo = SessionToolMemo()
+    memo.put("alice:1", "download-paper", download("https://a.org/p.pdf"), "Paper A")
+    memo.put("alice:1", "search-paper", {"query": "attention"}, "Error: CORE is unavailable")
+
+    assert memo.get("alice:1", "download-paper", download(" https://a.org/p.pdf ")) == "Paper A"
+    assert memo.get("alice:2", "download-paper", download("https://a.org/p.pdf")) is None
+    assert memo.get("alice:1", "search-paper", {"query": "attention"}) is None
+    assert memo.get(None, "download-paper", download("https://a.org/p.pdf")) is None
+
+    memo.clear("alice:1")
+    assert memo.get("alice:1", "download-paper", download("https://a.org/p.pdf")) is None
+
+
+def test_least_recently_used_results_are_evicted_by_size():
+    memo = SessionToolMemo(max_chars=10)
+    memo.put("s", "download-paper", download("a"), "aaaa")
+    memo.put("s", "download-paper", download("b"), "bbbb")
+    # Using "a" makes "b" the least recently used
+    assert memo.get("s", "download-paper", download("a")) == "aaaa"
+    memo.put("s", "download-paper", download("c"), "cccc")
+
+    assert memo.get("s", "download-paper", download("b")) is None
+    assert memo.get("s", "download-paper", download("a")) == "aaaa"
+    assert memo.get("s", "download-paper", download("c")) == "cccc"
+    # Results larger than a whole session are never kept
+    memo.put("s", "download-paper", download("d"), "d" * 11)
+    assert memo.stats()["chars"] == 8
+
+
+def test_results_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_memo_module.time, "monotonic", lambda: now[0])
+    memo = SessionToolMemo(ttl_seconds=60)
+    memo.put("s", "download-paper", download("old"), "old")
+    now[0] += 40
+    memo.put("s", "download-paper", download("new"), "new")
+    now[0] += 30
+
+    assert memo.get("s", "download-paper", download("old")) is None
+    assert memo.get("s", "download-paper", download("new")) == "new"
+    assert "old" not in memo.digest("s") and "new" in memo.digest("s")
+
+
+def test_least_recently_used_sessions_are_dropped():
+    memo = SessionToolMemo(max_sessions=2)
+    for session_id in ("first", "second"):
+        memo.put(session_id, "download-paper", download("a"), session_id)
+    # Reading "first" makes "second" the least recently used session
+    assert memo.get("first", "download-paper", download("a")) == "first"
+    memo.put("third", "download-paper", download("a"), "third")
+
+    assert memo.get("second", "download-paper", download("a")) is None
+    assert memo.get("first", "download-paper", download("a")) == "first"
+    assert memo.stats()["sessions"] == 2
@@ -0,0 +1,61 @@
+"""Background queries of the Streamlit app, run with Streamlit's AppTest."""
+
+import time
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import scientific_research_agent.workflow as workflow
+from conftest import SRC_DIR
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    secrets = tmp_path / ".streamlit" / "secrets.toml"
+    secrets.parent.mkdir()
+    secrets.write_text('[secrets]\nGOOGLE_API_KEY = "test"\nCORE_API_KEY = "test"\nTAVILY_API_KEY = "test"\n')
+    # The chat store is created in the working directory
+    monkeypatch.chdir(tmp_path)
+    st.cache_resource.clear()
+    yield AppTest.from_file(str(SRC_DIR / "streamlit_main.py"), default_timeout=60)
+    st.cache_resource.clear()
+
+
+def send_query(app: AppTest, query: str) -> AppTest:
+    app.text_input[0].input(query)
+    app.button(key="FormSubmitter:chat_form-Send").click().run()
+    return app
+
+
+def wait_for_queries(app: AppTest, timeout: float = 10) -> AppTest:
+    deadline = time.monotonic() + timeout
+    while app.session_state.pending_queries and time.monotonic() < deadline:
+        time.sleep(0.05)
+        app.run()
+    # The run collecting the finished queries stops at its rerun request
+    return app.run()
+
+
+def test_errors_of_background_queries_are_shown_on_the_page(app, monkeypatch):
+    failures = ["model unavailable"]
+
+    def stream(query, session_id=None):
+        yield {"type": "node", "node": "planning"}
+        if failures:
+            raise RuntimeError(failures.pop())
+        yield {"type": "done", "content": "Answer"}
+
+    # Imported once per process by load_research_agent
+    monkeypatch.setattr(workflow, "stream_research_workflow", stream)
+    app.run()
+    wait_for_queries(send_query(app, "What is attention?"))
+
+    assert not app.exception
+    assert [error.value for error in app.error] == ["Error processing query: model unavailable"]
+    assert app.session_state.messages[-1]["content"].startswith("I encountered an error")
+
+    # Dropped once the next query is sent
+    wait_for_queries(send_query(app, "What is a transformer?"))
+    assert not app.error
+    assert app.session_state.messages[-1]["content"] == "Answer"
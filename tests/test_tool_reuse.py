@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph.message import add_messages
+
+from scientific_research_agent import workflow
+from scientific_research_agent.summarization import SUMMARY_MARKER, needs_summarization
+
+
+class FakeDownloadTool:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, args):
+        self.calls.append(args["url"])
+        return f"Full text of the paper at {args['url']} " * 50
+
+
+@pytest.fixture
+def llm_calls():
+    calls = []
+
+    def factory(config):
+        return RunnableLambda(lambda messages: calls.append(config.model) or AIMessage(content=f"Summary {len(calls)}"))
+
+    workflow.node_llms.configure(factory=factory)
+    yield calls
+    workflow.node_llms.configure()
+
+
+def apply(state, update):
+    """Apply a node's state update the way the workflow graph reduces it."""
+    state["messages"] = add_messages(state["messages"], update.get("messages", []))
+    state["tool_results"] = {**state["tool_results"], **update.get("tool_results", {})}
+
+
+def download_calls(*urls):
+    tool_calls = [
+        {"name": "download-paper", "args": {"url": url}, "id": f"call-{i}-{url[-5:]}"}
+        for i, url in enumerate(urls)
+    ]
+    return AIMessage(content="", tool_calls=tool_calls)
+
+
+def test_repeated_download_after_summarization_is_not_summarized_again(monkeypatch, llm_calls):
+    download = FakeDownloadTool()
+    monkeypatch.setitem(workflow.tools_dict, "download-paper", download)
+    state = {"messages": [HumanMessage(content="Compare these two papers", id="query")], "tool_results": {}}
+
+    # First planning cycle: two downloads, then their summaries
+    state["messages"] = add_messages(state["messages"], [download_calls("https://a.org/1.pdf", "https://b.org/2.pdf")])
+    apply(state, workflow.tools_node(state))
+    assert needs_summarization(state["messages"])
+    apply(state, workflow.summarize_papers_node(state))
+    assert not needs_summarization(state["messages"])
+    llm_calls_after_first_cycle = len(llm_calls)
+    assert llm_calls_after_first_cycle == 3  # two summaries and the synthesis
+
+    # Second planning cycle: the agent asks for the first paper again
+    state["messages"] = add_messages(state["messages"], [download_calls("https://a.org/1.pdf")])
+    apply(state, workflow.tools_node(state))
+
+    reused = state["messages"][-1]
+    assert download.calls == ["https://a.org/1.pdf", "https://b.org/2.pdf"]
+    assert reused.additional_kwargs.get(SUMMARY_MARKER)
+    assert json.loads(reused.content).startswith("Summary")
+    assert not needs_summarization(state["messages"])
+    assert workflow.tools_router(state) == "agent"
+    assert len(llm_calls) == llm_calls_after_first_cycle
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from chiron_learning_agent import validation
+from chiron_learning_agent.pydantic_models import InContext, LearningCheckpoints
+
+
+def checkpoint(name: str) -> LearningCheckpoints:
+    return LearningCheckpoints(description=name, criteria=[f"Explains {name}"], verification=f"Explain {name}")
+
+
+class FakeValidator:
+    """Fake structured LLM, answering from the context whether the criteria are covered."""
+
+    def __init__(self, failing: str = None):
+        self.failing = failing
+        self.lock = threading.Lock()
+        self.active = self.max_active = 0
+
+    def __call__(self, messages):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            # Later checkpoints answer first, so the results come back out of order
+            prompt = messages[-1].content
+            time.sleep(0.05 if "first" in prompt else 0.01)
+            if self.failing and self.failing in prompt:
+                raise RuntimeError("quota exceeded")
+            return InContext(is_in_context="No" if "missing" in prompt else "Yes")
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_uncovered_checkpoints_keep_their_order_and_concurrency_is_bounded(monkeypatch):
+    monkeypatch.setattr(validation, "VALIDATION_CONCURRENCY", 3)
+    validator = FakeValidator()
+    checkpoints = [checkpoint(f"topic {i}") for i in range(8)]
+    chunks = [["the first chunk", "missing"] if i % 3 == 0 else ["covered"] for i in range(8)]
+
+    uncovered = validation.find_uncovered_checkpoints(RunnableLambda(validator), checkpoints, chunks)
+    assert [c.description for c in uncovered] == ["topic 0", "topic 3", "topic 6"]
+    assert 1 < validator.max_active <= 3
+
+
+def test_a_failed_validation_does_not_fail_the_others(capsys):
+    validator = FakeValidator(failing="second chunk")
+    checkpoints = [checkpoint("attention"), checkpoint("transformers"), checkpoint("rnn")]
+    chunks = [["the first chunk"], ["the second chunk"], ["missing"]]
+
+    uncovered = validation.find_uncovered_checkpoints(RunnableLambda(validator), checkpoints, chunks)
+    # The failed checkpoint is searched for, like the one missing from the context
+    assert [c.description for c in uncovered] == ["transformers", "rnn"]
+    assert "quota exceeded" in capsys.readouterr().out
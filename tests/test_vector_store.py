@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from chiron_learning_agent.vector_store import VectorStore
+
+
+def brute_force_top_k(vectors: np.ndarray, query: np.ndarray, k: int):
+    scores = [float(v @ query / (np.linalg.norm(v) * np.linalg.norm(query))) for v in vectors]
+    return sorted(range(len(vectors)), key=lambda i: -scores[i])[:k], scores
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(50, 16)).astype(np.float32)
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 80])
+def test_search_matches_brute_force_cosine(embeddings, k):
+    store = VectorStore(initial_capacity=4)
+    # Added in several batches, so the matrix grows
+    for start in range(0, len(embeddings), 7):
+        store.add([f"chunk {i}" for i in range(start, min(start + 7, len(embeddings)))], embeddings[start:start + 7])
+    queries = np.random.default_rng(1).normal(size=(3, 16)).astype(np.float32)
+
+    results = store.search(queries, k=k)
+    assert len(results) == 3
+    for query, found in zip(queries, results):
+        expected, scores = brute_force_top_k(embeddings, query, k)
+        assert [i for i, _ in found] == expected
+        assert [s for _, s in found] == pytest.approx([scores[i] for i in expected], abs=1e-5)
+    assert store.search_chunks(queries[0], k=2)[0] == [f"chunk {i}" for i in brute_force_top_k(embeddings, queries[0], 2)[0]]
+
+
+def test_empty_store_finds_nothing():
+    store = VectorStore()
+    assert store.search([1.0, 0.0], k=3) == [[]]
+    assert store.search([[1.0, 0.0], [0.0, 1.0]], k=3) == [[], []]
+    assert store.add([], []) == range(0, 0)
+    assert store.dim is None
+
+
+def test_mismatched_embeddings_are_rejected():
+    store = VectorStore()
+    store.add(["a"], [[1.0, 0.0]])
+    with pytest.raises(ValueError):
+        store.add(["b"], [[1.0, 0.0, 0.0]])
+    with pytest.raises(ValueError):
+        store.add(["b", "c"], [[1.0, 0.0]])
+
+
+def test_save_and_load_round_trip_through_memmap(tmp_path, embeddings):
+    store = VectorStore()
+    store.add([f"chunk {i}" for i in range(len(embeddings))], embeddings)
+    query = embeddings[3] + 0.01
+
+    loaded = VectorStore.load(store.save(tmp_path / "store"), mmap=True)
+    assert loaded.memory_mapped
+    assert loaded.chunks == store.chunks and loaded.dim == 16
+    np.testing.assert_array_equal(loaded.vectors, store.vectors)
+    assert loaded.search(query, k=4) == store.search(query, k=4)
+
+    # Adding copies the embeddings into memory, the files are left untouched
+    loaded.add(["new"], [embeddings[0]])
+    assert not loaded.memory_mapped and len(loaded) == len(embeddings) + 1
+    assert len(VectorStore.load(tmp_path / "store")) == len(embeddings)
+
+
+def test_empty_store_round_trip(tmp_path):
+    loaded = VectorStore.load(VectorStore().save(tmp_path / "store"))
+    assert len(loaded) == 0 and loaded.dim is None
+    loaded.add(["a"], [[1.0, 0.0, 0.0]])
+    assert loaded.search_chunks([1.0, 0.0, 0.0], k=5) == [["a"]]
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from chiron_learning_agent import web_search
+from chiron_learning_agent.web_search import cached_web_search, dedupe_search_docs, search_all
+
+
+class FakeSearch:
+    """Returns one result per query, waiting until `concurrent` searches run at the same time."""
+
+    def __init__(self, concurrent: int = 1):
+        self.queries = []
+        self._barrier = threading.Barrier(concurrent, timeout=5)
+        self._lock = threading.Lock()
+
+    def invoke(self, query: str):
+        with self._lock:
+            self.queries.append(query)
+        self._barrier.wait()
+        if query == "fail":
+            return "Error: rate limited"
+        return [{"url": f"https://example.org/{query}", "content": f"About {query}"}]
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache():
+    web_search.search_cache.clear()
+    yield
+    web_search.search_cache.clear()
+
+
+def test_repeated_queries_are_served_from_the_cache():
+    search = FakeSearch()
+    first = cached_web_search(search, "Gradient Descent")
+    assert cached_web_search(search, "  gradient   descent ") == first
+    assert search.queries == ["Gradient Descent"]
+
+
+def test_failed_searches_are_not_cached():
+    search = FakeSearch()
+    assert cached_web_search(search, "fail") == []
+    assert cached_web_search(search, "fail") == []
+    assert search.queries == ["fail", "fail"]
+
+
+def test_queries_run_concurrently_and_keep_their_order():
+    # Each search waits for the other, so running them one at a time would time out
+    search = FakeSearch(concurrent=2)
+    docs = search_all(search, ["first", "second"])
+    assert [doc["content"] for doc in docs] == ["About first", "About second"]
+
+
+def test_results_are_deduplicated_by_url_and_content():
+    docs = [
+        {"url": "https://Example.org/page/", "content": "Gradient descent"},
+        {"url": "https://example.org/page#intro", "content": "Another text"},
+        {"url": "https://other.org/copy", "content": "  gradient\n DESCENT "},
+        {"url": "https://example.org/page?print=1", "content": "Printable version"},
+        {"url": "", "content": ""},
+    ]
+    assert dedupe_search_docs(docs) == [docs[0], docs[3], docs[4]]
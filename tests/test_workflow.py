@@ -0,0 +1,123 @@
+import json
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from scientific_research_agent import prefetch, workflow
+from scientific_research_agent.pydantic_models import (
+    DecisionMakingOutput,
+    JudgeOutput,
+    NodeModelConfig,
+    PlannedStep,
+    StructuredPlan,
+)
+
+
+class ScriptedModel:
+    """Fake chat model of a node, answering with its scripted responses in turn."""
+
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.inputs = []
+
+    def with_structured_output(self, schema):
+        return self
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        self.inputs.append(list(messages))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def script(monkeypatch):
+    """Per-node responses of the fake models, e.g. script["agent"] = [AIMessage(...)]."""
+    monkeypatch.setattr(prefetch, "SPECULATIVE_SEARCH_ENABLED", False)
+    monkeypatch.setattr(workflow, "JUDGE_MODE", "full")
+    responses = {node: [] for node in workflow.node_llms.bindings}
+
+    def factory(config):
+        # Each node is configured with its own name as model, see below
+        return ScriptedModel(responses[config.model])
+
+    workflow.node_llms.configure(
+        factory=factory, configs={node: NodeModelConfig(model=node) for node in responses}
+    )
+    yield responses
+    workflow.node_llms.configure()
+
+
+def test_answers_are_streamed_before_the_judge_and_revised_after_a_rejection(script):
+    script["decision_making"] += [DecisionMakingOutput(requires_research=True)]
+    script["structured_planning"] += [StructuredPlan(plan="Answer from memory."), StructuredPlan(plan="Add sources.")]
+    script["agent"] += [AIMessage(content="First answer"), AIMessage(content="Second answer")]
+    script["judge"] += [
+        JudgeOutput(is_good_answer=False, feedback="Cite your sources."),
+        JudgeOutput(is_good_answer=True),
+    ]
+
+    events = list(workflow.stream_research_workflow("What is attention?"))
+    assert [(event["type"], event.get("node") or event.get("content") or event.get("feedback")) for event in events] == [
+        ("node", "decision_making"),
+        ("node", "planning"),
+        ("node", "agent"),
+        ("answer", "First answer"),
+        ("node", "judge"),
+        ("revising", "Cite your sources."),
+        ("node", "planning"),
+        ("node", "agent"),
+        ("answer", "Second answer"),
+        ("node", "judge"),
+        ("done", "Second answer"),
+    ]
+
+
+def test_direct_answers_are_done_without_a_candidate_answer(script):
+    script["decision_making"] += [DecisionMakingOutput(requires_research=False, answer="Hello!")]
+
+    events = list(workflow.stream_research_workflow("Hi"))
+    assert events == [{"type": "node", "node": "decision_making"}, {"type": "done", "content": "Hello!"}]
+
+
+class BarrierSearch:
+    """Fake search tool whose calls all wait for each other, so they only finish if run concurrently."""
+
+    def __init__(self, concurrent: int):
+        self.barrier = threading.Barrier(concurrent, timeout=5)
+        self.queries = []
+
+    def invoke(self, args):
+        self.queries.append(args["query"])
+        self.barrier.wait()
+        return f"* Title: A paper about {args['query']}"
+
+
+def test_planned_steps_run_concurrently_and_reach_the_agent_in_one_turn(script, monkeypatch):
+    search = BarrierSearch(concurrent=3)
+    monkeypatch.setitem(workflow.tools_dict, "search-paper", search)
+    steps = [PlannedStep(tool="search-paper", query=query) for query in ("attention", "transformers", "rnn")]
+    script["decision_making"] += [DecisionMakingOutput(requires_research=True)]
+    script["structured_planning"] += [StructuredPlan(plan="Search the three topics.", steps=steps)]
+    script["agent"] += [AIMessage(content="Answer")]
+    script["judge"] += [JudgeOutput(is_good_answer=True)]
+
+    events = list(workflow.stream_research_workflow("Compare attention, transformers and RNNs"))
+    assert [event["node"] for event in events if event["type"] == "node"] == [
+        "decision_making", "planning", "research_fan_out", "agent", "judge"
+    ]
+    assert sorted(search.queries) == ["attention", "rnn", "transformers"]
+
+    # The agent is called once, with the planned calls and all their results
+    (agent_input,) = workflow.node_llms.get("agent").inputs
+    request, results = agent_input[-4], agent_input[-3:]
+    assert [call["args"]["query"] for call in request.tool_calls] == ["attention", "transformers", "rnn"]
+    assert all(isinstance(result, ToolMessage) for result in results)
+    assert [result.tool_call_id for result in results] == [call["id"] for call in request.tool_calls]
+    assert [json.loads(result.content) for result in results] == [
+        "* Title: A paper about attention",
+        "* Title: A paper about transformers",
+        "* Title: A paper about rnn",
+    ]